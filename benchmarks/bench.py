@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""Offline benchmarks for the libvirt_vmcfg hot paths.
+
+Run from the top of the source tree:
+
+    python benchmarks/bench.py                        # print a table
+    python benchmarks/bench.py --json new.json        # also save results
+    python benchmarks/bench.py --compare old.json     # check for regressions
+    python benchmarks/bench.py -k attach              # only matching names
+
+Timings are the best per-call time out of several rounds, along with the
+median. Peak memory is measured with tracemalloc over one extra call, so it
+only covers allocations made by Python (not those made inside libxml2).
+
+With --compare, benchmarks more than --threshold slower (or using more
+memory) than the saved results are reported, and the exit status is 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Benchmark the source tree, not whatever happens to be installed.
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from lxml import etree  # noqa: E402
+
+from libvirt_vmcfg.dom import (  # noqa: E402
+    CompiledDomain, Domain, DomainTemplate, Slot, SlotType
+)
+from libvirt_vmcfg.dom.elements import Element, Name  # noqa: E402
+from libvirt_vmcfg.dom.elements.devices import (  # noqa: E402
+    BridgedInterface, Disk, DiskSourceBlockPath, DiskTargetDisk, Driver,
+    DriverOptions, DriverType, TargetBus, derive_mac
+)
+from libvirt_vmcfg.dom.profiles.linux_virtio import (  # noqa: E402
+    kvm_default_hardware
+)
+from libvirt_vmcfg.dom.util.disk import disk_letter  # noqa: E402
+from libvirt_vmcfg.fleet.store import FleetStore  # noqa: E402
+from libvirt_vmcfg.vol import (  # noqa: E402
+    BackingStore, Compat, Volume, VolumeFormat, emit_volumes
+)
+
+
+# A benchmark returns a setup function, run untimed before every call, and
+# the function to time, which is passed what setup returned.
+Setup = Callable[[], Any]
+Timed = Callable[[Any], Any]
+Benchmark = Callable[[], Tuple[Setup, Timed]]
+
+_benchmarks: Dict[str, Benchmark] = {}
+
+# Benchmarks whose timed function returns the time to record itself, such
+# as one measured by a child process. Their memory use isn't measured.
+_self_timed: Set[str] = set()
+
+SIZES = (1, 10, 100, 1000)
+
+
+def benchmark(name: str, self_timed: bool = False
+              ) -> Callable[[Benchmark], Benchmark]:
+    def register(func: Benchmark) -> Benchmark:
+        if name in _benchmarks:
+            raise ValueError("Duplicate benchmark", name)
+
+        _benchmarks[name] = func
+        if self_timed:
+            _self_timed.add(name)
+
+        return func
+
+    return register
+
+
+def _hardware(name: str = "bench") -> List[Element]:
+    # Fixed UUID, so output is comparable between runs
+    return kvm_default_hardware(name=name, vcpus=2, memory=2*(1024**3),
+                                uuid="6f1c1a4a-3c1f-4b8e-9d1e-2c5b7a0e9f11",
+                                boot_dev_order=["hd"])
+
+
+def _disks(count: int) -> List[Element]:
+    names = disk_letter("vd")
+    disks: List[Element] = []
+    for i in range(count):
+        dev = next(names)
+        disks.append(Disk(DiskSourceBlockPath(f"/dev/vg0/bench-{dev}"),
+                          DiskTargetDisk(dev, bus=TargetBus.VIRTIO),
+                          DriverOptions(Driver.QEMU, DriverType.RAW)))
+
+    return disks
+
+
+def _interfaces(count: int) -> List[Element]:
+    return [BridgedInterface("br0", mac=f"52:54:00:{i >> 16 & 0xff:02x}:"
+                                        f"{i >> 8 & 0xff:02x}:{i & 0xff:02x}")
+            for i in range(count)]
+
+
+def _nothing() -> None:
+    return None
+
+
+@benchmark("construct/kvm_default_hardware")
+def bench_construct() -> Tuple[Setup, Timed]:
+    return _nothing, lambda _: Domain(elements=_hardware())
+
+
+@benchmark("construct/elements")
+def bench_elements() -> Tuple[Setup, Timed]:
+    # The peak memory of this is the footprint of one VM's element objects;
+    # one list is extended, so copies of it don't count.
+    def construct(_: None) -> List[Element]:
+        elements = _hardware()
+        elements += _disks(4)
+        elements += _interfaces(2)
+        return elements
+
+    return _nothing, construct
+
+
+@benchmark("construct/elements_x100")
+def bench_elements_fleet() -> Tuple[Setup, Timed]:
+    # What 100 VMs' elements keep, as in a fleet kept in memory; divide the
+    # peak by 100 for the footprint per VM, without one-off allocations.
+    def construct(_: None) -> List[List[Element]]:
+        fleet = []
+        for i in range(100):
+            elements = _hardware(f"bench{i}")
+            elements += _disks(4)
+            elements += _interfaces(2)
+            fleet.append(elements)
+
+        return fleet
+
+    return _nothing, construct
+
+
+@benchmark("construct/template")
+def bench_template() -> Tuple[Setup, Timed]:
+    # The same domain as construct/kvm_default_hardware, stamped out from a
+    # template with only the name replaced.
+    template = DomainTemplate(_hardware("template"))
+    if (template.instantiate([Name("bench")]).emit_xml()
+            != Domain(elements=_hardware()).emit_xml()):
+        raise AssertionError("Template output differs from the profile's")
+
+    return _nothing, lambda _: template.instantiate([Name("bench")])
+
+
+def _attach(make: Callable[[int], List[Element]],
+            count: int) -> Tuple[Setup, Timed]:
+    elements = make(count)
+    base = Domain(elements=_hardware())
+
+    def attach(domain: Domain) -> None:
+        for element in elements:
+            domain.attach_element(element)
+
+    return base.clone, attach
+
+
+def _detach(make: Callable[[int], List[Element]],
+            count: int) -> Tuple[Setup, Timed]:
+    elements = make(count)
+    base = Domain(elements=_hardware())
+
+    def setup() -> Tuple[Domain, List[Any]]:
+        domain = base.clone()
+        return domain, [domain.attach_element(e) for e in elements]
+
+    def detach(state: Tuple[Domain, List[Any]]) -> None:
+        domain, datas = state
+        for data in datas:
+            domain.detach_element(data)
+
+    return setup, detach
+
+
+for _count in SIZES:
+    for _kind, _make in (("disk", _disks), ("interface", _interfaces)):
+        benchmark(f"attach/{_kind}/{_count}")(
+            lambda make=_make, count=_count: _attach(make, count))
+        benchmark(f"detach/{_kind}/{_count}")(
+            lambda make=_make, count=_count: _detach(make, count))
+
+
+def _emit(**kwargs: Any) -> Tuple[Setup, Timed]:
+    domain = Domain(elements=_hardware() + _disks(10) + _interfaces(2))
+    return _nothing, lambda _: domain.emit_xml(**kwargs)
+
+
+for _pretty in (False, True):
+    for _encoding in ("unicode", "utf-8"):
+        benchmark(f"emit_xml/{'pretty' if _pretty else 'compact'}/"
+                  f"{'str' if _encoding == 'unicode' else 'bytes'}")(
+            lambda pretty=_pretty, encoding=_encoding: _emit(
+                pretty_print=pretty, encoding=encoding))
+
+
+@benchmark("volume/emit_xml")
+def bench_volume() -> Tuple[Setup, Timed]:
+    volume = Volume("bench.qcow2", 20*(1024**3))
+    return _nothing, lambda _: volume.emit_xml()
+
+
+@benchmark("volume/emit_volumes/1000")
+def bench_volumes() -> Tuple[Setup, Timed]:
+    # Thin linked clones, as provisioned in bulk
+    backing = BackingStore("/var/lib/libvirt/images/base.qcow2",
+                           VolumeFormat.QCOW2)
+    volumes = [Volume(f"vm{i}.qcow2", 20*(1024**3), allocation=0,
+                      format=VolumeFormat.QCOW2, compat=Compat.V1_1,
+                      lazy_refcounts=True, backing_store=backing)
+               for i in range(1000)]
+    return _nothing, lambda _: sum(1 for _ in emit_volumes(volumes))
+
+
+def _compiled() -> Tuple[CompiledDomain, Dict[str, Any], bytes]:
+    # Also checks the compiled output matches emit_xml exactly.
+    name, uuid = Slot("name"), Slot("uuid", SlotType.UUID)
+    elements = kvm_default_hardware(name=name, uuid=uuid, vcpus=2,
+                                    memory=2*(1024**3))
+    compiled = CompiledDomain(Domain(elements=elements + _disks(10)),
+                              [name, uuid])
+
+    values = {"name": "vm<&>\"1\"",
+              "uuid": "6f1c1a4a-3c1f-4b8e-9d1e-2c5b7a0e9f11"}
+    expected = Domain(elements=kvm_default_hardware(
+        vcpus=2, memory=2*(1024**3), **values) + _disks(10))
+    xml = expected.emit_xml(encoding="utf-8")
+    assert isinstance(xml, bytes)
+    return compiled, values, xml
+
+
+@benchmark("compiled/render")
+def bench_compiled() -> Tuple[Setup, Timed]:
+    compiled, values, expected = _compiled()
+    if compiled.render(**values) != expected:
+        raise AssertionError("CompiledDomain output differs from emit_xml")
+
+    return _nothing, lambda _: compiled.render(**values)
+
+
+def _fleet(count: int) -> List[etree._Element]:
+    # Reproducible, but with a UUID and MAC of their own, like a real fleet
+    namespace = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+    trees = []
+    for i in range(count):
+        name = f"bench{i}"
+        elements = kvm_default_hardware(name=name, vcpus=2,
+                                        memory=2*(1024**3),
+                                        namespace=namespace)
+        elements += _disks(2)
+        elements.append(BridgedInterface(
+            "br0", mac=derive_mac(namespace, name)))
+        trees.append(Domain(elements=elements).root)
+
+    return trees
+
+
+@benchmark("store/add/1000")
+def bench_store_add() -> Tuple[Setup, Timed]:
+    # The peak memory of this is roughly the store's footprint.
+    trees = _fleet(1000)
+
+    def add(_: Any) -> FleetStore:
+        store = FleetStore()
+        for tree in trees:
+            store.add(tree)
+
+        return store
+
+    return _nothing, add
+
+
+@benchmark("store/emit_xml")
+def bench_store_emit() -> Tuple[Setup, Timed]:
+    store = FleetStore()
+    for tree in _fleet(100):
+        store.add(tree)
+
+    return _nothing, lambda _: store.emit_xml("bench50")
+
+
+def _import_time(module: str) -> float:
+    # Cumulative import time of module in a fresh interpreter, as reported
+    # by -X importtime (in microseconds, on stderr).
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                           f"import {module}"], env=env, check=True,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+    for line in proc.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+
+    raise RuntimeError("Module not in -X importtime output", module)
+
+
+for _module in ("libvirt_vmcfg.dom", "libvirt_vmcfg.dom.elements",
+                "libvirt_vmcfg.dom.elements.devices", "libvirt_vmcfg.fleet"):
+    benchmark(f"import/{_module}", self_timed=True)(
+        lambda module=_module: (_nothing, lambda _: _import_time(module)))
+
+
+def measure(func: Benchmark, min_time: float, rounds: int,
+            self_timed: bool = False) -> Dict[str, float]:
+    setup, timed = func()
+
+    def run(calls: int) -> Tuple[float, float]:
+        # Returns the wall time, and the time to record
+        wall = recorded = 0.0
+        for _ in range(calls):
+            state = setup()
+            start = perf_counter()
+            value = timed(state)
+            elapsed = perf_counter() - start
+            wall += elapsed
+            recorded += value if self_timed else elapsed
+
+        return wall, recorded
+
+    # Double the calls per round until a round takes long enough
+    calls = 1
+    while run(calls)[0] < min_time / rounds and calls < 1_000_000:
+        calls *= 2
+
+    results = [run(calls)[1] / calls for _ in range(rounds)]
+
+    peak = 0
+    if not self_timed:
+        state = setup()
+        tracemalloc.start()
+        try:
+            timed(state)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {"best": min(results), "median": statistics.median(results),
+            "calls": calls, "rounds": rounds, "peak_bytes": peak}
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+
+    return f"{seconds / 1e-9:8.2f} ns"
+
+
+def _format_bytes(count: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if count < 1024:
+            return f"{count:8.1f} {unit}"
+
+        count /= 1024
+
+    return f"{count:8.1f} GiB"
+
+
+def compare(old: Dict[str, Dict[str, float]],
+            new: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Print a comparison and return the names of regressed benchmarks."""
+    regressed = []
+    print(f"\n{'benchmark':40} {'time':>8} {'memory':>8}")
+    for name, result in new.items():
+        if name not in old:
+            print(f"{name:40} {'new':>8} {'new':>8}")
+            continue
+
+        time_ratio = result["best"] / old[name]["best"]
+        mem_ratio = (result["peak_bytes"] / old[name]["peak_bytes"]
+                     if old[name]["peak_bytes"] else 1.0)
+        flag = ""
+        if time_ratio > 1 + threshold or mem_ratio > 1 + threshold:
+            flag = "  REGRESSED"
+            regressed.append(name)
+
+        print(f"{name:40} {time_ratio:7.2f}x {mem_ratio:7.2f}x{flag}")
+
+    return regressed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="pattern", default="",
+                        help="only run benchmarks matching this regex")
+    parser.add_argument("--json", metavar="FILE",
+                        help="write results to FILE as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare against results saved with --json")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown treated as a regression "
+                             "(default: %(default)s, i.e. 25%%)")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="seconds to spend per benchmark "
+                             "(default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=5,
+                        help="rounds per benchmark (default: %(default)s)")
+    parser.add_argument("--list", action="store_true",
+                        help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    pattern = re.compile(args.pattern)
+    names = [n for n in _benchmarks if pattern.search(n)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'benchmark':40} {'best':>11} {'median':>11} {'peak':>12}")
+    for name in names:
+        result = measure(_benchmarks[name], args.min_time, args.rounds,
+                         name in _self_timed)
+        results[name] = result
+        print(f"{name:40} {_format_time(result['best'])} "
+              f"{_format_time(result['median'])} "
+              f"{_format_bytes(result['peak_bytes'])}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": platform.python_version(),
+                       "implementation": platform.python_implementation(),
+                       "lxml": ".".join(map(str, etree.LXML_VERSION)),
+                       "libxml2": ".".join(map(str, etree.LIBXML_VERSION)),
+                       "machine": platform.machine(),
+                       "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)["results"]
+
+        if compare(old, results, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
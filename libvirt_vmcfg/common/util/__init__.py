@@ -1 +1,7 @@
-from libvirt_vmcfg.common.util.string import bool_to_str
+from libvirt_vmcfg.common.util.lazy import lazy_attributes
+from libvirt_vmcfg.common.util.serialize import (FieldSerializer,
+                                                serializer)
+from libvirt_vmcfg.common.util.slots import slotted
+from libvirt_vmcfg.common.util.string import bool_to_str, intern_str
+from libvirt_vmcfg.common.util.xml import (outermost_tags, subtree_digest,
+                                          write_tree)
@@ -0,0 +1,43 @@
+import sys
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple
+
+
+def lazy_attributes(package: str, exports: Mapping[str, Sequence[str]]
+                    ) -> Tuple[Callable[[str], Any], Callable[[], List[str]],
+                               List[str]]:
+    """Return module __getattr__, __dir__ and __all__ (PEP 562).
+
+    exports maps module names (relative to package) to the names they
+    provide. Modules are imported when one of their names is first accessed,
+    and the names are then cached on the package.
+
+    __all__ holds the package's public names so far plus the exported ones,
+    so star imports still see everything (and import it all).
+
+    Usage, at the end of a package __init__:
+
+        __getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+            ".disk": ("Disk", "DiskTarget"),
+        })
+    """
+    names: Dict[str, str] = {name: module
+                             for module, provided in exports.items()
+                             for name in provided}
+
+    def __getattr__(name: str) -> Any:
+        module = names.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute "
+                                 f"{name!r}")
+
+        value = getattr(import_module(module, package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | names.keys())
+
+    public = [name for name in vars(sys.modules[package])
+              if not name.startswith("_")]
+    return __getattr__, __dir__, public + list(names)
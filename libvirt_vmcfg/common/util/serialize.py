@@ -0,0 +1,100 @@
+from dataclasses import fields
+from enum import Enum
+from functools import lru_cache
+from typing import (Any, Callable, Iterator, List, Sequence, Tuple, Type,
+                    Union, get_type_hints)
+
+from lxml import etree
+
+from libvirt_vmcfg.common.util.string import bool_to_str
+
+
+Coercer = Callable[[Any], Any]
+
+
+def _enum_value(value: Enum) -> Any:
+    return value.value
+
+
+def _unwrap_optional(hint: Any) -> Any:
+    # Optional[X] is Union[X, None]; typing.get_args is 3.8+ only.
+    if getattr(hint, "__origin__", None) is Union:
+        args = [a for a in hint.__args__ if a is not type(None)]
+        if len(args) == 1:
+            return args[0]
+
+    return hint
+
+
+def _coercer(hint: Any, bool_format: Callable[[bool], str]) -> Coercer:
+    unwrapped = _unwrap_optional(hint)
+    if not isinstance(unwrapped, type):
+        # Unions, generics and the like would need checking at runtime.
+        raise TypeError("Unsupported field type hint", hint)
+
+    hint = unwrapped
+    if issubclass(hint, bool):
+        return bool_format
+    elif issubclass(hint, Enum):
+        return _enum_value
+    elif issubclass(hint, int):
+        return str
+    else:
+        # Strings, and objects (such as features) left to the caller.
+        return lambda value: value
+
+
+class FieldSerializer:
+    """Precomputed rules for emitting the fields of a dataclass as XML.
+
+    The rules are worked out once from the field type hints: booleans go
+    through bool_format, enums become their values, and ints become strings.
+    Fields set to None are always omitted. Each hint must be a class, or
+    Optional of one; anything else raises TypeError. Use serializer() to get
+    one, as they are cached per dataclass.
+
+    rules: tuple of (field name, coercion function), in field order
+    """
+    __slots__ = ("cls", "rules")
+
+    def __init__(self, cls: Type[Any], *, exclude: Sequence[str] = (),
+                 bool_format: Callable[[bool], str] = bool_to_str):
+        self.cls = cls
+        hints = get_type_hints(cls)
+        self.rules: Tuple[Tuple[str, Coercer], ...] = tuple(
+            (f.name, _coercer(hints[f.name], bool_format))
+            for f in fields(cls) if f.name not in exclude
+        )
+
+    def values(self, obj: Any) -> List[Any]:
+        """Return the values of the fields that are set, uncoerced."""
+        return [value for value in (getattr(obj, name) for name, _ in
+                                    self.rules) if value is not None]
+
+    def items(self, obj: Any) -> Iterator[Tuple[str, Any]]:
+        """Yield (field name, coerced value) for the fields that are set."""
+        for name, coerce in self.rules:
+            value = getattr(obj, name)
+            if value is not None:
+                yield name, coerce(value)
+
+    def set_attributes(self, obj: Any, tag: etree._Element) -> None:
+        """Set the fields that are set as attributes of tag."""
+        for name, coerce in self.rules:
+            value = getattr(obj, name)
+            if value is not None:
+                tag.set(name, coerce(value))
+
+
+@lru_cache(maxsize=None)
+def serializer(cls: Type[Any], *, exclude: Tuple[str, ...] = (),
+               bool_format: Callable[[bool], str] = bool_to_str
+               ) -> FieldSerializer:
+    """Return the cached FieldSerializer for a dataclass.
+
+    Parameters:
+      cls: the dataclass
+      exclude: names of fields to leave out, as a tuple
+      bool_format: converts booleans to strings, yes/no by default
+    """
+    return FieldSerializer(cls, exclude=exclude, bool_format=bool_format)
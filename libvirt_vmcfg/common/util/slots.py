@@ -0,0 +1,28 @@
+from dataclasses import fields
+from typing import Type, TypeVar
+
+
+T = TypeVar("T")
+
+
+def slotted(cls: Type[T]) -> Type[T]:
+    """Class decorator giving a dataclass __slots__ for its fields.
+
+    This is dataclass(slots=True) for Pythons before 3.10. Apply it on top
+    of @dataclass. The class is recreated, as __slots__ can't be added to an
+    existing class.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = dict(cls.__dict__)
+    namespace["__slots__"] = names
+    # Field defaults are kept by the generated __init__, and would clash with
+    # the slot descriptors.
+    for name in names:
+        namespace.pop(name, None)
+
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+
+    new_cls = type(cls)(cls.__name__, cls.__bases__, namespace)
+    new_cls.__qualname__ = cls.__qualname__
+    return new_cls
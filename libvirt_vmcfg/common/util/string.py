@@ -1,5 +1,23 @@
+import sys
+from typing import TypeVar
+
+
+T = TypeVar("T")
+
+
 # NOTE: in 3.8+ this should be Literal["yes", "no"]
 def bool_to_str(val: bool) -> str:
     """Convert a boolean into a yes/no value."""
     return "yes" if val else "no"
 
+
+def intern_str(value: T) -> T:
+    """Intern a string, so equal ones kept by many objects share memory.
+
+    Anything else, including str subclasses (which can't be interned), is
+    returned as is.
+    """
+    if type(value) is str:
+        return sys.intern(value)  # type: ignore
+
+    return value
@@ -0,0 +1,62 @@
+from hashlib import blake2b
+from typing import BinaryIO, List, Sequence, Union
+
+from lxml import etree
+
+
+def write_tree(file: Union[str, BinaryIO], root: etree._Element, *,
+               pretty_print: bool = False, compression: int = 0) -> None:
+    """Serialize a tree as UTF-8 straight into a binary file or path.
+
+    The output is identical to etree.tostring with encoding="utf-8", but is
+    streamed to the file without building it in memory first. If compression
+    is nonzero, the output is gzipped with that level; writing several trees
+    to the same file gives a valid multi-member gzip stream.
+
+    The file is flushed, but not closed.
+    """
+    with etree.xmlfile(file, encoding="utf-8",
+                       compression=compression) as xf:
+        xf.write(root, pretty_print=pretty_print)
+
+
+def outermost_tags(tags: Sequence[etree._Element]) -> List[etree._Element]:
+    """Return the tags whose parent isn't among the given tags."""
+    tag_set = set(tags)
+    return [t for t in tags if t.getparent() not in tag_set]
+
+
+def subtree_digest(node: etree._Element) -> bytes:
+    """Return a digest of the content of a subtree.
+
+    Attribute order, formatting whitespace, and the order of differently
+    named siblings (which libvirt doesn't care about) don't affect the
+    digest. The order of same-named siblings does.
+    """
+    h = blake2b(digest_size=16)
+    if not isinstance(node.tag, str):
+        # Comments and processing instructions
+        h.update(b"#special\0")
+        h.update((node.text or "").encode("utf-8"))
+        return h.digest()
+
+    children = sorted((c for c in node if isinstance(c.tag, str)),
+                      key=lambda c: c.tag)
+    text = node.text or ""
+    if children:
+        text = text.strip()
+
+    h.update(node.tag.encode("utf-8"))
+    for attr, value in sorted(node.items()):
+        h.update(b"\0")
+        h.update(attr.encode("utf-8"))
+        h.update(b"=")
+        h.update(value.encode("utf-8"))
+
+    h.update(b"\1")
+    h.update(text.encode("utf-8"))
+    h.update(b"\1")
+    for child in children:
+        h.update(subtree_digest(child))
+
+    return h.digest()
@@ -1,2 +1,5 @@
 from libvirt_vmcfg.dom.domain import Domain, DomainType
 from libvirt_vmcfg.dom.elements import Element
+from libvirt_vmcfg.dom.template import DomainTemplate
+from libvirt_vmcfg.dom.compiled import CompiledDomain, Slot, SlotType
+from libvirt_vmcfg.dom.diff import DomainDiff, diff_domains
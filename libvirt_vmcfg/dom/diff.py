@@ -0,0 +1,119 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from libvirt_vmcfg.common.util import outermost_tags
+from libvirt_vmcfg.dom.domain import Domain, ElementData
+
+
+def element_digest(data: ElementData) -> bytes:
+    """Return a digest of the XML an attached element produced."""
+    return data.digest()
+
+
+# How devices are told apart, beyond their tag name.
+_device_keys: Dict[str, Tuple[str, str]] = {
+    "disk": ("target", "dev"),
+    "interface": ("mac", "address"),
+}
+
+
+def _identity(data: ElementData) -> Tuple[Tuple[str, ...], ...]:
+    # What an element is, as opposed to what it contains.
+    identity = []
+    for root in outermost_tags(data.tags):
+        tag = root.tag if isinstance(root.tag, str) else "#special"
+        key = _device_keys.get(tag)
+        parent = root.getparent()
+        if (key is not None and parent is not None
+                and parent.tag == "devices"):
+            child = root.find(key[0])
+            value = "" if child is None else child.get(key[1], "")
+            identity.append((tag, value))
+        elif tag == "controller":
+            identity.append((tag, root.get("type", ""),
+                             root.get("index", "")))
+        else:
+            identity.append((tag,))
+
+    return tuple(identity)
+
+
+@dataclass
+class DomainDiff:
+    """Differences between a current and a desired domain.
+
+    added: elements only in the desired domain
+    removed: elements only in the current domain
+    changed: elements in the current domain, mapped to their differing
+             counterpart in the desired domain
+    type_changed: whether the domain types differ
+    """
+    added: List[ElementData] = field(default_factory=list)
+    removed: List[ElementData] = field(default_factory=list)
+    changed: Dict[ElementData, ElementData] = field(default_factory=dict)
+    type_changed: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed
+                    or self.type_changed)
+
+
+def _digests(domain: Domain) -> Dict[ElementData, bytes]:
+    domain.materialize()
+    return {data: element_digest(data) for data in domain.elements}
+
+
+def _by_identity(datas: Iterable[ElementData]
+                 ) -> Dict[Tuple[Tuple[str, ...], ...], List[ElementData]]:
+    groups: Dict[Tuple[Tuple[str, ...], ...], List[ElementData]] = {}
+    for data in datas:
+        groups.setdefault(_identity(data), []).append(data)
+
+    return groups
+
+
+def diff_domains(current: Domain, desired: Domain) -> DomainDiff:
+    """Find the elements that differ between two domains.
+
+    Each element is hashed, and elements with a digest found on both sides
+    are skipped straight away. The remaining ones are paired up by identity
+    (tag names, plus disk target or interface MAC address), in order, to
+    tell changed elements from added and removed ones.
+    """
+    diff = DomainDiff(type_changed=current.type is not desired.type)
+
+    current_digests = _digests(current)
+    desired_digests = _digests(desired)
+
+    # Skip everything with a match on the other side.
+    unmatched: Dict[bytes, List[ElementData]] = {}
+    for data, digest in current_digests.items():
+        unmatched.setdefault(digest, []).append(data)
+
+    new: List[ElementData] = []
+    for data, digest in desired_digests.items():
+        candidates = unmatched.get(digest)
+        if candidates:
+            candidates.pop(0)
+        else:
+            new.append(data)
+
+    old = [data for datas in unmatched.values() for data in datas]
+    if not old and not new:
+        return diff
+
+    old_groups = _by_identity(old)
+    for identity, datas in _by_identity(new).items():
+        counterparts = old_groups.pop(identity, [])
+        for data in datas:
+            if counterparts:
+                diff.changed[counterparts.pop(0)] = data
+            else:
+                diff.added.append(data)
+
+        diff.removed.extend(counterparts)
+
+    for datas in old_groups.values():
+        diff.removed.extend(datas)
+
+    return diff
@@ -1,10 +1,21 @@
-from dataclasses import dataclass
+from copy import deepcopy
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional, Sequence, Union
+from hashlib import blake2b
+from time import perf_counter
+from typing import (TYPE_CHECKING, BinaryIO, Collection, Dict, Iterable,
+                    List, Optional, Sequence, Set, Tuple, Type, Union,
+                    cast)
 
 from lxml import etree
 
-from libvirt_vmcfg.dom.elements import Element
+from libvirt_vmcfg.common.util import (outermost_tags, subtree_digest,
+                                       write_tree)
+from libvirt_vmcfg.dom.elements import AnchorCache, Element, use_anchors
+from libvirt_vmcfg.dom.stats import RenderStats, current_stats
+
+if TYPE_CHECKING:
+    from libvirt_vmcfg.dom.elements.devices import Disk
 
 
 class DomainType(Enum):
@@ -13,43 +24,524 @@ class DomainType(Enum):
 
 
 # This is an implementation detail and should otherwise be ignored
-@dataclass
+# NB: eq=False keeps identity hashing, so these can be used as dict keys.
+@dataclass(eq=False)
 class ElementData:
     tags: Sequence[etree._Element]
     element: Element
+    # Cached digest of the tags, reset whenever they're rebuilt.
+    _digest: Optional[bytes] = field(default=None, repr=False)
+
+    def digest(self) -> bytes:
+        """Return a digest of the content of the element's tags."""
+        if self._digest is None:
+            h = blake2b(digest_size=16)
+            for tag in outermost_tags(self.tags):
+                h.update(subtree_digest(tag))
+
+            self._digest = h.digest()
+
+        return self._digest
+
+    def sort_key(self) -> Tuple[str, ...]:
+        # The tag names this element produced, which is all that decides
+        # where libvirt puts it.
+        return tuple(str(t.tag) for t in outermost_tags(self.tags))
+
+
+@dataclass
+class RenderTimings:
+    """Time spent by the last emit_xml or write_to call, in seconds.
+
+    build is only significant for lazy domains which had to (re)build their
+    tree; other domains build as elements are attached.
+    """
+    build: float = 0.0
+    serialize: float = 0.0
+
+
+# Where each element's tags and cached anchors are in a built tree, by
+# document order position. Used for cloning.
+@dataclass
+class _Layout:
+    elements: List[Tuple[Element, List[int]]]
+    anchors: Dict[str, int]
+    claims: Dict[Tuple[str, str], int]
 
 
 class Domain:
     """Root class for libvirt config"""
     def __init__(self, type: DomainType = DomainType.KVM,
-                 elements: Optional[Sequence[Element]] = None):
+                 elements: Optional[Sequence[Element]] = None, *,
+                 lazy: bool = False):
         self.type: DomainType = type
-        self.root: etree._Element = etree.Element("domain", type=type.value)
-        self.elements: List[ElementData] = []
+        self.lazy = lazy
+        self.timings = RenderTimings()
+
+        # In lazy mode, the tree is only built when needed.
+        self._root: Optional[etree._Element] = None
+        self._anchors: Optional[AnchorCache] = None
+        self._dirty = True
+        if not lazy:
+            self._new_root()
+
+        # Dicts are used as ordered sets here, so attach order is preserved
+        # and removal is O(1).
+        self._elements: Dict[ElementData, None] = {}
+        self._index: Dict[Type[Element], Dict[ElementData, None]] = {}
+        self._fingerprint: Optional[str] = None
+        self._stats: Optional[RenderStats] = None
 
         if elements:
             for element in elements:
                 self.attach_element(element)
 
+    @classmethod
+    def from_xml(cls, xml: Union[str, bytes, etree._Element], *,
+                 ignore: Collection[str] = (), lazy: bool = False) -> "Domain":
+        """Parse libvirt domain XML (such as virsh dumpxml output).
+
+        Anything no element can represent exactly is kept as an Opaque or
+        OpaqueDevice element. Child tags named in ignore (such as "address"
+        or "alias") may be dropped to allow parsing into elements.
+        """
+        # Deferred, as the parser needs every element class loaded.
+        from libvirt_vmcfg.dom.parse import parse_elements
+
+        root: etree._Element
+        if isinstance(xml, etree._Element):
+            root = xml
+        else:
+            if isinstance(xml, str):
+                xml = xml.encode("utf-8")
+
+            parser = etree.XMLParser(remove_blank_text=True)
+            root = etree.fromstring(xml, parser)
+
+        if root.tag != "domain":
+            raise ValueError("Not a domain", root.tag)
+
+        return cls(DomainType(root.get("type", "")),
+                   parse_elements(root, ignore=ignore), lazy=lazy)
+
+    def _new_root(self) -> None:
+        self._root = etree.Element("domain", type=self.type.value)
+        self._anchors = AnchorCache(self._root)
+        self._dirty = False
+
+    @property
+    def root(self) -> etree._Element:
+        """The root node of the tree, built first if the domain is lazy."""
+        return self.materialize()
+
+    @property
+    def elements(self) -> Tuple[ElementData, ...]:
+        """All attached elements, in the order they were attached.
+
+        This is a tuple, so attempts to change it fail rather than being
+        silently ignored.
+        """
+        return tuple(self._elements)
+
+    def find(self, cls: Type[Element]) -> Optional[ElementData]:
+        """Return the first attached element of exactly type cls, if any."""
+        bucket = self._index.get(cls)
+        if not bucket:
+            return None
+
+        return next(iter(bucket))
+
+    def find_all(self, cls: Type[Element]) -> List[ElementData]:
+        """Return all attached elements of exactly type cls."""
+        return list(self._index.get(cls, ()))
+
+    def materialize(self) -> etree._Element:
+        """Build the tree of a lazy domain, if it's out of date.
+
+        For non-lazy domains this just returns the root.
+        """
+        if not self._dirty:
+            return cast(etree._Element, self._root)
+
+        # Build into a fresh root, so a failing element leaves us dirty
+        # rather than half-built.
+        root = etree.Element("domain", type=self.type.value)
+        anchors = AnchorCache(root)
+        built = []
+        with use_anchors(anchors):
+            for data in self._elements:
+                built.append(self._build(data.element, root))
+
+        for data, tags in zip(self._elements, built):
+            data.tags = tags
+            data._digest = None
+
+        self._fingerprint = None
+
+        self._root = root
+        self._anchors = anchors
+        self._dirty = False
+        return root
+
+    def _recorders(self, stats: RenderStats) -> Tuple[RenderStats, ...]:
+        # Record to the active statistics, and our own for stats().
+        if self._stats is None:
+            self._stats = RenderStats()
+
+        return (stats, self._stats)
+
+    def _build(self, element: Element,
+               root: etree._Element) -> Sequence[etree._Element]:
+        stats = current_stats()
+        if stats is None:
+            return element.attach_xml(root)
+
+        start = perf_counter()
+        tags = element.attach_xml(root)
+        elapsed = perf_counter() - start
+        nodes = sum(1 for tag in outermost_tags(tags) for _ in tag.iter())
+        for recorder in self._recorders(stats):
+            recorder.record_attach(type(element), elapsed, nodes)
+
+        return tags
+
+    def _unbuild(self, data: ElementData) -> None:
+        # The anchors let devices find <devices> without searching for it.
+        with use_anchors(cast(AnchorCache, self._anchors)):
+            stats = current_stats()
+            if stats is None:
+                data.element.detach_xml(data.tags)
+                return
+
+            start = perf_counter()
+            data.element.detach_xml(data.tags)
+            elapsed = perf_counter() - start
+
+        for recorder in self._recorders(stats):
+            recorder.record_detach(type(data.element), elapsed)
+
+    def _record_emit(self, elapsed: float) -> None:
+        stats = current_stats()
+        if stats is not None:
+            for recorder in self._recorders(stats):
+                recorder.record_emit(elapsed)
+
+    def _attach_xml(self, element: Element) -> Sequence[etree._Element]:
+        with use_anchors(cast(AnchorCache, self._anchors)):
+            return self._build(element, cast(etree._Element, self._root))
+
     def attach_element(self, element: Element) -> ElementData:
-        if element.unique:
-            if any(e for e in self.elements if type(e) is type(element)):
-                raise ValueError("Element already attached", element)
+        if element.unique and self._index.get(type(element)):
+            raise ValueError("Element already attached", element)
+
+        tags: Sequence[etree._Element]
+        if self.lazy:
+            # Only bookkeeping, the tree gets rebuilt on demand.
+            tags = []
+            self._dirty = True
+        else:
+            tags = self._attach_xml(element)
 
-        tags: Sequence[etree._Element] = element.attach_xml(self.root)
         data = ElementData(tags, element)
-        self.elements.append(data)
+        self._elements[data] = None
+        self._fingerprint = None
+        self._index.setdefault(type(element), {})[data] = None
         return data
 
+    def disk_targets(self) -> Set[str]:
+        """Return the target device names used by the attached disks.
+
+        This includes disks kept as opaque XML. The names come from the
+        elements rather than the tree, so this works for lazy domains too.
+        """
+        from libvirt_vmcfg.dom.elements.devices import Disk
+        from libvirt_vmcfg.dom.elements.opaque import Opaque
+
+        targets = {cast(str, d.element.target.path)
+                   for d in self._index.get(Disk, ())}
+        for data in self._elements:
+            element = data.element
+            if isinstance(element, Opaque) and element.node.tag == "disk":
+                dev = element.node.find("target")
+                if dev is not None and dev.get("dev"):
+                    targets.add(cast(str, dev.get("dev")))
+
+        return targets
+
+    def attach_disks(self, disks: Iterable["Disk"]) -> List[ElementData]:
+        """Attach several disks at once, naming their targets if needed.
+
+        Disks whose target path is None are given the first free name for
+        their bus, such as "vdc" (see dom.util.disk.target_prefix); the disk
+        passed in is left alone, and a copy with the name is attached. All
+        names are checked for conflicts before anything is attached, and the
+        disks are built apart from the tree and only added once all of them
+        succeed, so if any fails the domain is left as it was. Lazy domains
+        build them too, so a bad disk fails here rather than in materialize.
+
+        Returns the ElementData for each disk, in order.
+        """
+        # Deferred, to keep the disk element lazily loaded.
+        from libvirt_vmcfg.dom.util.disk import (DiskNameAllocator,
+                                                 target_prefix)
+
+        disks = list(disks)
+        names = DiskNameAllocator.from_domain(self)
+        for disk in disks:
+            if disk.target.path is None:
+                continue
+
+            try:
+                names.claim(disk.target.path)
+            except ValueError:
+                raise ValueError("target device already attached",
+                                 disk.target.path) from None
+
+        named: List["Disk"] = []
+        for disk in disks:
+            if disk.target.path is None:
+                prefix = target_prefix(disk.target.device, disk.target.bus)
+                disk = disk.with_target_path(names.allocate(prefix))
+
+            named.append(disk)
+
+        # Built under a scratch root first, so a disk failing halfway leaves
+        # nothing behind. Lazy domains do this too, to fail here rather than
+        # in materialize.
+        scratch = etree.Element("domain", type=self.type.value)
+        scratch_anchors = AnchorCache(scratch)
+        tags: List[Sequence[etree._Element]] = []
+        with use_anchors(scratch_anchors):
+            for disk in named:
+                if self.lazy:
+                    disk.attach_xml(scratch)
+                else:
+                    tags.append(self._build(disk, scratch))
+
+        if self.lazy:
+            # Only bookkeeping, the tree gets rebuilt on demand.
+            tags = [[] for _ in named]
+            self._dirty = True
+        elif named:
+            root = cast(etree._Element, self._root)
+            anchors = cast(AnchorCache, self._anchors)
+            with use_anchors(anchors):
+                devices = named[0].get_devices_tag(root)
+
+            # Appending moves the nodes, so the tags stay valid.
+            devices.extend(list(named[0].get_devices_tag(scratch)))
+            anchors.claims.update(scratch_anchors.claims)
+
+        datas = [ElementData(t, disk) for disk, t in zip(named, tags)]
+        self._elements.update(dict.fromkeys(datas))
+        self._fingerprint = None
+        for data in datas:
+            self._index.setdefault(type(data.element), {})[data] = None
+
+        return datas
+
     def detach_element(self, data: ElementData) -> None:
-        data.element.detach_xml(data.tags)
-        self.elements.remove(data)
+        if data not in self._elements:
+            raise ValueError("Element not attached", data.element)
+
+        if self.lazy:
+            self._dirty = True
+        else:
+            self._unbuild(data)
+
+        del self._elements[data]
+        self._fingerprint = None
+
+        bucket = self._index[type(data.element)]
+        del bucket[data]
+        if not bucket:
+            del self._index[type(data.element)]
+
+    def replace_element(self, data: ElementData,
+                        element: Element) -> ElementData:
+        """Replace an attached element with another, keeping its place.
+
+        Returns the ElementData for the new element. If attaching the new
+        element fails, the old one is put back.
+        """
+        if data not in self._elements:
+            raise ValueError("Element not attached", data.element)
+
+        if (element.unique and type(element) is not type(data.element)
+                and self._index.get(type(element))):
+            raise ValueError("Element already attached", element)
+
+        new = ElementData([], element)
+        if self.lazy:
+            self._dirty = True
+        else:
+            # Remember where the old tags were, so the new ones can go there
+            # too. Tags nested deeper than the first one are left alone.
+            parent: Optional[etree._Element] = None
+            position = 0
+            if data.tags:
+                parent = data.tags[0].getparent()
+                if parent is not None:
+                    position = parent.index(data.tags[0])
+
+            self._unbuild(data)
+            try:
+                new.tags = self._attach_xml(element)
+            except Exception:
+                data.tags = self._attach_xml(data.element)
+                data._digest = None
+                self._move_tags(data.tags, parent, position)
+                raise
+
+            self._move_tags(new.tags, parent, position)
+
+        # Rebuild the bookkeeping so the new element takes the old one's
+        # place in attach order.
+        self._elements = {(new if d is data else d): None
+                          for d in self._elements}
+        self._fingerprint = None
+
+        bucket = self._index[type(data.element)]
+        if type(element) is type(data.element):
+            self._index[type(element)] = {(new if d is data else d): None
+                                          for d in bucket}
+        else:
+            del bucket[data]
+            if not bucket:
+                del self._index[type(data.element)]
+
+            self._index.setdefault(type(element), {})[new] = None
+
+        return new
+
+    @staticmethod
+    def _move_tags(tags: Sequence[etree._Element],
+                   parent: Optional[etree._Element], position: int) -> None:
+        if parent is None:
+            return
+
+        for tag in tags:
+            if tag.getparent() is parent:
+                parent.insert(position, tag)
+                position += 1
+
+    def _layout(self) -> "_Layout":
+        # Record where our nodes are in document order, which is the same in
+        # a deep copy of the tree. Only valid for built domains.
+        root = cast(etree._Element, self._root)
+        anchors = cast(AnchorCache, self._anchors)
+        positions = {node: i for i, node in enumerate(root.iter())}
+        return _Layout(
+            [(d.element, [positions[t] for t in d.tags if t in positions])
+             for d in self._elements],
+            {k: positions[v] for k, v in anchors.nodes.items()
+             if v in positions},
+            {k: positions[v] for k, v in anchors.claims.items()
+             if v in positions},
+        )
+
+    def _clone(self, layout: Optional["_Layout"]) -> "Domain":
+        clone = type(self)(self.type, lazy=True)
+        clone.lazy = self.lazy
+
+        datas: List[ElementData]
+        if layout is None:
+            # Nothing built yet, so there's nothing to copy.
+            datas = [ElementData([], d.element) for d in self._elements]
+        else:
+            new_root = deepcopy(cast(etree._Element, self._root))
+            nodes = list(new_root.iter())
+
+            # The copied tags have the same content, so digests carry over.
+            datas = [ElementData([nodes[i] for i in tags], element,
+                                 old._digest)
+                     for (element, tags), old in zip(layout.elements,
+                                                     self._elements)]
+
+            anchors = AnchorCache(new_root)
+            anchors.nodes = {k: nodes[i] for k, i in layout.anchors.items()}
+            anchors.claims = {k: nodes[i] for k, i in layout.claims.items()}
+
+            clone._root = new_root
+            clone._anchors = anchors
+            clone._dirty = False
+            clone._fingerprint = self._fingerprint
+
+        clone._elements = dict.fromkeys(datas)
+        for data in datas:
+            clone._index.setdefault(type(data.element), {})[data] = None
+
+        return clone
+
+    def clone(self) -> "Domain":
+        """Return a copy of this domain with its own copy of the tree.
+
+        This is much cheaper than attaching the elements again. The Element
+        objects themselves are shared, as they hold no per-domain state.
+        """
+        return self._clone(None if self._dirty else self._layout())
+
+    def fingerprint(self) -> str:
+        """Return a digest of the domain's configuration, as a hex string.
+
+        Attribute order, formatting whitespace and pretty printing don't
+        affect it, nor does the attach order of elements producing different
+        tags. Each element's digest is cached, so only elements attached
+        since the last call get hashed. Changes made to the tree directly
+        are not noticed.
+        """
+        if self._fingerprint is not None and not self._dirty:
+            return self._fingerprint
+
+        self.materialize()
+        h = blake2b(digest_size=32)
+        h.update(b"domain\0")
+        h.update(self.type.value.encode("utf-8"))
+        for data in sorted(self._elements, key=ElementData.sort_key):
+            h.update(data.digest())
+
+        self._fingerprint = h.hexdigest()
+        return self._fingerprint
 
     def emit_xml(self, *, pretty_print: bool = False,
                  encoding: str = "unicode") -> Union[str, bytes]:
-        return etree.tostring(self.root, pretty_print=pretty_print,
-                              encoding=encoding)
+        start = perf_counter()
+        root = self.materialize()
+        built = perf_counter()
+        xml = etree.tostring(root, pretty_print=pretty_print,
+                             encoding=encoding)
+        self.timings = RenderTimings(built - start, perf_counter() - built)
+        self._record_emit(self.timings.serialize)
+        return xml
+
+    def write_to(self, file: Union[str, BinaryIO], *,
+                 pretty_print: bool = False, compression: int = 0) -> None:
+        """Stream the XML to a binary file-like object or path as UTF-8.
+
+        This avoids building the document as a string in memory. Call this
+        repeatedly on the same file to render several domains into one
+        stream. If compression is nonzero, the output is gzipped with that
+        compression level.
+        """
+        start = perf_counter()
+        root = self.materialize()
+        built = perf_counter()
+        write_tree(file, root, pretty_print=pretty_print,
+                   compression=compression)
+        self.timings = RenderTimings(built - start, perf_counter() - built)
+        self._record_emit(self.timings.serialize)
+
+    def stats(self) -> RenderStats:
+        """Return a snapshot of the statistics recorded for this domain.
+
+        Statistics are only recorded while instrumentation is enabled, see
+        libvirt_vmcfg.dom.stats.instrument.
+        """
+        if self._stats is None:
+            return RenderStats()
+
+        return self._stats.copy()
 
     def __repr__(self):
-        return (f"Domain(type={self.type}, root={self.root}, "
-                f"elements={self.elements})")
+        return (f"Domain(type={self.type}, root={self._root}, "
+                f"elements={self.elements}, lazy={self.lazy})")
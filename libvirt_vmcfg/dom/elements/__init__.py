@@ -1,12 +1,163 @@
 from abc import abstractmethod, ABC
+from collections import OrderedDict
+from contextvars import ContextVar
 from enum import Enum
-from typing import Any, List, Sequence, cast
+from threading import Lock
+from typing import (TYPE_CHECKING, Any, Callable, Dict, Hashable, List,
+                    Optional, Sequence, Tuple, cast)
 
 from lxml import etree
 
+from libvirt_vmcfg.common.util import lazy_attributes
+
+
+# Compiled once; the node name is passed in as an XPath variable.
+_child_xpath = etree.XPath("/domain/*[name() = $name]")
+
+
+class AnchorCache:
+    """Cache of anchor nodes (such as ``<devices>``) for one root node.
+
+    A Domain owns one of these and makes it current while attaching elements,
+    so that elements don't have to search the tree for the nodes they attach
+    to. Cached nodes are checked before use, so nodes removed behind the
+    cache's back are simply looked up again.
+    """
+
+    def __init__(self, root: etree._Element):
+        self.root = root
+        self.nodes: Dict[str, etree._Element] = {}
+        self.claims: Dict[Tuple[str, str], etree._Element] = {}
+
+    def get(self, name: str) -> Optional[etree._Element]:
+        """Return the cached child node of root with the given name."""
+        node = self.nodes.get(name)
+        if node is None:
+            return None
+
+        if node.getparent() is not self.root:
+            # Stale, someone removed it.
+            del self.nodes[name]
+            return None
+
+        return node
+
+    def put(self, name: str, node: etree._Element) -> None:
+        self.nodes[name] = node
+
+    def claimed(self, kind: str, key: str) -> bool:
+        """Check if a key (such as a disk target name) is in use.
+
+        Claims whose node has since been removed from the tree are dropped.
+        """
+        node = self.claims.get((kind, key))
+        if node is None:
+            return False
+
+        for ancestor in node.iterancestors():
+            if ancestor is self.root:
+                return True
+
+        del self.claims[(kind, key)]
+        return False
+
+    def claim(self, kind: str, key: str, node: etree._Element) -> None:
+        """Record that node uses the given key."""
+        self.claims[(kind, key)] = node
+
+
+_current_anchors: ContextVar[Optional[AnchorCache]] = \
+    ContextVar("libvirt_vmcfg_anchors", default=None)
+
+
+def current_anchors(root: etree._Element) -> Optional[AnchorCache]:
+    """Return the active anchor cache for root, if there is one."""
+    cache = _current_anchors.get()
+    if cache is None or cache.root is not root:
+        return None
+
+    return cache
+
+
+class use_anchors:
+    """Make the given anchor cache current for the duration of the block.
+
+    A class rather than a @contextmanager generator, as it's entered for
+    every element attached.
+    """
+    __slots__ = ("cache", "_token")
+
+    def __init__(self, cache: AnchorCache):
+        self.cache = cache
+
+    def __enter__(self) -> AnchorCache:
+        self._token = _current_anchors.set(self.cache)
+        return self.cache
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _current_anchors.reset(self._token)
+
+
+class SubtreeCache:
+    """Bounded LRU cache of built element subtrees, by key.
+
+    Elements whose XML is the same in almost every domain (such as the
+    default clock) build it once here, and attach a copy each time; copying
+    a small subtree is cheaper than building it node by node. The key must
+    capture everything the subtree depends on, including the element type.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._trees: "OrderedDict[Hashable, etree._Element]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Optional[Hashable],
+            build: Callable[[], etree._Element]) -> etree._Element:
+        """Return a copy of the subtree for key, calling build on a miss.
+
+        build must return a new detached node. If key is None, the subtree
+        isn't cached, and build's node is returned as is.
+        """
+        if key is None:
+            return build()
+
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                self.hits += 1
+
+        if tree is None:
+            tree = build()
+            with self._lock:
+                self.misses += 1
+                self._trees[key] = tree
+                while len(self._trees) > self.maxsize:
+                    self._trees.popitem(last=False)
+
+        # lxml copies elements deeply either way; calling __copy__ directly
+        # skips the copy module's dispatch, which costs as much again.
+        return tree.__copy__()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._trees.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._trees)
+
+
+# Shared by all elements; set maxsize to 0 to disable caching.
+subtree_cache = SubtreeCache()
+
 
 class Element(ABC):
     """Base element class."""
+    __slots__ = ()
 
     # Required attribute
     unique: bool = False
@@ -14,11 +165,22 @@ class Element(ABC):
     # XXX - the arguments to etree.SubElement are too complicated to describe.
     def node_find_or_create(self, _root: etree._Element, _name: str,
                             **kwargs: Any) -> etree._Element:
-        nodelist = cast(List[etree._Element], _root.xpath(f"/domain/{_name}"))
+        cache = current_anchors(_root)
+        if cache is not None:
+            node = cache.get(_name)
+            if node is not None:
+                return node
+
+        nodelist = cast(List[etree._Element], _child_xpath(_root, name=_name))
         if nodelist:
-            return nodelist[0]
+            node = nodelist[0]
         else:
-            return etree.SubElement(_root, _name, **kwargs)
+            node = etree.SubElement(_root, _name, **kwargs)
+
+        if cache is not None:
+            cache.put(_name, node)
+
+        return node
 
     @abstractmethod
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
@@ -30,22 +192,50 @@ class Element(ABC):
             parent.remove(tag)
 
 
-# Exported implementation
-from libvirt_vmcfg.dom.elements.description import Description
-from libvirt_vmcfg.dom.elements.emulator import Emulator
-from libvirt_vmcfg.dom.elements.features import (
-    FeatureBase, FeatureEmpty, FeatureBooleanState, Features, PAE, NonPAE,
-    ACPI, APIC, HAP, Viridian, PVSpinlock, PMU, GIC, IOAPICDriver, HPTResizing,
-    CFPCValue, SBBCValue, IBSValue, SMM, IOAPIC, HPT, VMCoreInfo, HTM,
-    NestedHV, CCFAssist, CFPC, SBBC, IBS, KVMHidden, KVMHintDedicated,
-    KVMPollControl, KVMFeatureSet, KVM, HyperVRelaxed, HyperV_VAPIC,
-    HyperVSpinlocks, HyperV_VPIndex, HyperVRuntime, HyperVStimer, HyperVReset,
-    HyperV_VendorID, HyperVFrequencies, HyperVReenlightenment, HyperVTLBFlush,
-    HyperVIPI, HyperVEVMCS, HyperVFeatureSet, HyperV
-)
-from libvirt_vmcfg.dom.elements.memory import Memory
-from libvirt_vmcfg.dom.elements.metadata import Metadata
-from libvirt_vmcfg.dom.elements.name import Name
-from libvirt_vmcfg.dom.elements.osconfig import QemuOSConfig
-from libvirt_vmcfg.dom.elements.power_management import PowerManagement
-from libvirt_vmcfg.dom.elements.uuid import DomainUUID
+# Exported implementation, imported when first used to keep startup fast.
+# NB: keep this in sync with the TYPE_CHECKING imports below.
+__getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+    ".description": ("Description",),
+    ".emulator": ("Emulator",),
+    ".features": (
+        "FeatureBase", "FeatureEmpty", "FeatureBooleanState", "Features",
+        "PAE", "NonPAE", "ACPI", "APIC", "HAP", "Viridian", "PVSpinlock",
+        "PMU", "GIC", "IOAPICDriver", "HPTResizing", "CFPCValue",
+        "SBBCValue", "IBSValue", "SMM", "IOAPIC", "HPT", "VMCoreInfo", "HTM",
+        "NestedHV", "CCFAssist", "CFPC", "SBBC", "IBS", "KVMHidden",
+        "KVMHintDedicated", "KVMPollControl", "KVMFeatureSet", "KVM",
+        "HyperVRelaxed", "HyperV_VAPIC", "HyperVSpinlocks", "HyperV_VPIndex",
+        "HyperVRuntime", "HyperVStimer", "HyperVReset", "HyperV_VendorID",
+        "HyperVFrequencies", "HyperVReenlightenment", "HyperVTLBFlush",
+        "HyperVIPI", "HyperVEVMCS", "HyperVFeatureSet", "HyperV",
+    ),
+    ".memory": ("Memory",),
+    ".metadata": ("Metadata",),
+    ".name": ("Name",),
+    ".opaque": ("Opaque", "OpaqueDevice"),
+    ".osconfig": ("QemuOSConfig",),
+    ".power_management": ("PowerManagement",),
+    ".uuid": ("DomainUUID",),
+})
+
+if TYPE_CHECKING:
+    from libvirt_vmcfg.dom.elements.description import Description
+    from libvirt_vmcfg.dom.elements.emulator import Emulator
+    from libvirt_vmcfg.dom.elements.features import (
+        FeatureBase, FeatureEmpty, FeatureBooleanState, Features, PAE,
+        NonPAE, ACPI, APIC, HAP, Viridian, PVSpinlock, PMU, GIC, IOAPICDriver,
+        HPTResizing, CFPCValue, SBBCValue, IBSValue, SMM, IOAPIC, HPT,
+        VMCoreInfo, HTM, NestedHV, CCFAssist, CFPC, SBBC, IBS, KVMHidden,
+        KVMHintDedicated, KVMPollControl, KVMFeatureSet, KVM, HyperVRelaxed,
+        HyperV_VAPIC, HyperVSpinlocks, HyperV_VPIndex, HyperVRuntime,
+        HyperVStimer, HyperVReset, HyperV_VendorID, HyperVFrequencies,
+        HyperVReenlightenment, HyperVTLBFlush, HyperVIPI, HyperVEVMCS,
+        HyperVFeatureSet, HyperV
+    )
+    from libvirt_vmcfg.dom.elements.memory import Memory
+    from libvirt_vmcfg.dom.elements.metadata import Metadata
+    from libvirt_vmcfg.dom.elements.name import Name
+    from libvirt_vmcfg.dom.elements.opaque import Opaque, OpaqueDevice
+    from libvirt_vmcfg.dom.elements.osconfig import QemuOSConfig
+    from libvirt_vmcfg.dom.elements.power_management import PowerManagement
+    from libvirt_vmcfg.dom.elements.uuid import DomainUUID
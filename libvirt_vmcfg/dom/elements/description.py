@@ -6,6 +6,8 @@ from libvirt_vmcfg.dom.elements import Element
 
 
 class Description(Element):
+    __slots__ = ("description",)
+
     unique: bool = True
 
     def __init__(self, description: str):
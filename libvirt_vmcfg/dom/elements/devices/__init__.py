@@ -1,17 +1,19 @@
-from typing import List, Sequence, cast
+from typing import TYPE_CHECKING, List, Sequence, cast
 
 from lxml import etree
 
-from libvirt_vmcfg.dom.elements import Element
+from libvirt_vmcfg.common.util import lazy_attributes
+from libvirt_vmcfg.dom.elements import Element, current_anchors
+
+
+_devices_xpath = etree.XPath("/domain/devices")
 
 
 class Device(Element):
+    __slots__ = ()
+
     def get_devices_tag(self, root: etree._Element) -> etree._Element:
-        nodes = cast(List[etree._Element], root.xpath("/domain/devices"))
-        if nodes:
-            return nodes[0]
-        else:
-            return etree.SubElement(root, "devices")
+        return self.node_find_or_create(root, "devices")
 
     def detach_xml(self, tags: Sequence[etree._Element]) -> None:
         if not tags:
@@ -27,10 +29,17 @@ class Device(Element):
         # This should clean up our tags
         super().detach_xml(tags)
 
-        # Clean up the device node, if we have to.
-        nodes = cast(List[etree._Element], root.xpath("/domain/devices"))
+        # Clean up the device node, if we have to. When detached via a
+        # Domain, its cache knows where the node is; otherwise search for it.
+        cache = current_anchors(root)
+        node = cache.get("devices") if cache is not None else None
+        if node is not None:
+            nodes = [node]
+        else:
+            nodes = cast(List[etree._Element], _devices_xpath(root))
+
         for node in nodes:
-            if not list(node):
+            if next(iter(node), None) is None:
                 # Spurious type warning about parent possibly being None
                 # This can't happen (HOPEFULLY), so disregard it.
                 # If this invariant doesn't hold true, well, we're fucked
@@ -39,23 +48,55 @@ class Device(Element):
                 parent.remove(node)
 
 
-# Imported here to prevent circular dependency
-from libvirt_vmcfg.dom.elements.devices.channel import QemuAgentChannel
-from libvirt_vmcfg.dom.elements.devices.clock import (
-    TimerType, TickPolicy, Offset, Basis, RTCTrack, TSCMode, Adjustment,
-    Timer, TimerRTC, TimerTSC, TimerPIT, TimerHPET, TimerKVMClock,
-    TimerHyperVClock, TimerARMV, Clock
-)
-from libvirt_vmcfg.dom.elements.devices.console import ConsolePTY
-from libvirt_vmcfg.dom.elements.devices.cpu import CPU
-from libvirt_vmcfg.dom.elements.devices.disk import (
-    DeviceAttachment, TargetBus, Driver, DriverType, DriverCache, DriverIO,
-    DriverErrorPolicy, DriverDiscard, DriverDetectZeroes, DriverOptions,
-    IOTuneOptions, DiskSource, DiskSourceBlockPath, DiskSourceNetHTTP,
-    DiskTarget, DiskTargetCDROM, DiskTargetDisk, DiskTargetFloppy, Tray, Disk
-)
-from libvirt_vmcfg.dom.elements.devices.interface import BridgedInterface
-from libvirt_vmcfg.dom.elements.devices.memballoon import VirtIOMemballoon
-from libvirt_vmcfg.dom.elements.devices.rng import RNGModel, RNG
-from libvirt_vmcfg.dom.elements.devices.serial import VirtIOSerialController
-from libvirt_vmcfg.dom.elements.devices.usb import QemuXHCIUSBController
+# Imported when first used; this also prevents circular deps.
+# NB: keep this in sync with the TYPE_CHECKING imports below.
+__getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+    ".channel": ("QemuAgentChannel",),
+    ".clock": (
+        "TimerType", "TickPolicy", "Offset", "Basis", "RTCTrack", "TSCMode",
+        "Adjustment", "Timer", "TimerRTC", "TimerTSC", "TimerPIT",
+        "TimerHPET", "TimerKVMClock", "TimerHyperVClock", "TimerARMV",
+        "Clock",
+    ),
+    ".console": ("ConsolePTY",),
+    ".cpu": ("CPU",),
+    ".disk": (
+        "DeviceAttachment", "TargetBus", "Driver", "DriverType",
+        "DriverCache", "DriverIO", "DriverErrorPolicy", "DriverDiscard",
+        "DriverDetectZeroes", "DriverOptions", "IOTuneOptions", "DiskSource",
+        "DiskSourceBlockPath", "DiskSourceNetHTTP", "DiskTarget",
+        "DiskTargetCDROM", "DiskTargetDisk", "DiskTargetFloppy", "Tray",
+        "Disk",
+    ),
+    ".interface": ("derive_mac", "MacPool", "BridgedInterface"),
+    ".memballoon": ("VirtIOMemballoon",),
+    ".rng": ("RNGModel", "RNG"),
+    ".serial": ("VirtIOSerialController",),
+    ".usb": ("QemuXHCIUSBController",),
+})
+
+if TYPE_CHECKING:
+    from libvirt_vmcfg.dom.elements.devices.channel import QemuAgentChannel
+    from libvirt_vmcfg.dom.elements.devices.clock import (
+        TimerType, TickPolicy, Offset, Basis, RTCTrack, TSCMode, Adjustment,
+        Timer, TimerRTC, TimerTSC, TimerPIT, TimerHPET, TimerKVMClock,
+        TimerHyperVClock, TimerARMV, Clock
+    )
+    from libvirt_vmcfg.dom.elements.devices.console import ConsolePTY
+    from libvirt_vmcfg.dom.elements.devices.cpu import CPU
+    from libvirt_vmcfg.dom.elements.devices.disk import (
+        DeviceAttachment, TargetBus, Driver, DriverType, DriverCache,
+        DriverIO, DriverErrorPolicy, DriverDiscard, DriverDetectZeroes,
+        DriverOptions, IOTuneOptions, DiskSource, DiskSourceBlockPath,
+        DiskSourceNetHTTP, DiskTarget, DiskTargetCDROM, DiskTargetDisk,
+        DiskTargetFloppy, Tray, Disk
+    )
+    from libvirt_vmcfg.dom.elements.devices.interface import (
+        derive_mac, MacPool, BridgedInterface
+    )
+    from libvirt_vmcfg.dom.elements.devices.memballoon import VirtIOMemballoon
+    from libvirt_vmcfg.dom.elements.devices.rng import RNGModel, RNG
+    from libvirt_vmcfg.dom.elements.devices.serial import (
+        VirtIOSerialController
+    )
+    from libvirt_vmcfg.dom.elements.devices.usb import QemuXHCIUSBController
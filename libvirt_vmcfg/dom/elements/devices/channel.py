@@ -2,18 +2,28 @@ from typing import Sequence
 
 from lxml import etree
 
+from libvirt_vmcfg.dom.elements import subtree_cache
 from libvirt_vmcfg.dom.elements.devices import Device
 
 
 class QemuAgentChannel(Device):
+    __slots__ = ()
+
     unique: bool = True
 
+    @staticmethod
+    def _build() -> etree._Element:
+        channel_tag = etree.Element("channel", type="unix")
+        etree.SubElement(channel_tag, "source", mode="bind")
+        etree.SubElement(channel_tag, "target", type="virtio",
+                         name="org.qemu.guest_agent.0")
+        return channel_tag
+
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
         devices_tag = self.get_devices_tag(root)
-        channel_tag = etree.SubElement(devices_tag, "channel", type="unix")
-        source_tag = etree.SubElement(channel_tag, "source", mode="bind")
-        target_tag = etree.SubElement(channel_tag, "target", type="virtio",
-                                      name="org.qemu.guest_agent.0")
+        channel_tag = subtree_cache.get(type(self), self._build)
+        devices_tag.append(channel_tag)
+        source_tag, target_tag = channel_tag
         return [channel_tag, source_tag, target_tag]
 
     def __repr__(self):
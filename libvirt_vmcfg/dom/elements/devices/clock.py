@@ -1,10 +1,11 @@
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Dict, NewType, Optional, Sequence, Tuple, Union
+from typing import (Dict, Hashable, NewType, Optional, Sequence, Tuple,
+                    Type, Union)
 
 from lxml import etree
 
-from libvirt_vmcfg.dom.elements import Element
+from libvirt_vmcfg.dom.elements import Element, subtree_cache
 
 
 class TimerType(Enum):
@@ -63,6 +64,8 @@ class Timer(ABC):
     """
     The base timer interface.
     """
+    __slots__ = ("present", "tickpolicy", "threshold", "slew", "limit")
+
     type: TimerType
 
     def __init__(self, present: bool = True,
@@ -113,14 +116,36 @@ class Timer(ABC):
     def attach_xml(self, clock_tag: etree._Element) -> None:
         raise NotImplementedError
 
+    def subtree_key(self) -> Optional[Hashable]:
+        """Return a key telling this timer's XML apart, for caching.
+
+        None (the default) means the XML is not to be cached, nor is that of
+        any clock containing the timer. Only timers whose key covers all of
+        their state may return one.
+        """
+        return None
+
+    def _common_key(self, cls: Type["Timer"],
+                    *extra: Hashable) -> Optional[Hashable]:
+        # Only for exactly cls, as subclasses may add state the key misses.
+        if type(self) is not cls:
+            return None
+
+        return (cls, bool(self.present), self.tickpolicy, self.threshold,
+                self.slew, self.limit, *extra)
+
 
 class _NormalTimer(Timer):
     # A largely sufficient class for implementing most timers.
+    __slots__ = ()
+
     def attach_xml(self, clock_tag: etree._Element) -> None:
         self.setup_timer_common(clock_tag)
 
 
 class TimerRTC(Timer):
+    __slots__ = ("track",)
+
     type: TimerType = TimerType.RTC
 
     def __init__(self, *, present: bool = True,
@@ -139,8 +164,13 @@ class TimerRTC(Timer):
         if self.track:
             timer_tag.attrib["track"] = self.track.value
 
+    def subtree_key(self) -> Optional[Hashable]:
+        return self._common_key(TimerRTC, self.track)
+
 
 class TimerTSC(Timer):
+    __slots__ = ("mode", "frequency")
+
     type: TimerType = TimerType.TSC
 
     def __init__(self, *, present: bool = True,
@@ -164,28 +194,65 @@ class TimerTSC(Timer):
         if self.mode is not None:
             timer_tag.attrib["mode"] = self.mode.value
 
+    def subtree_key(self) -> Optional[Hashable]:
+        return self._common_key(TimerTSC, self.mode, self.frequency)
+
 
 class TimerPIT(_NormalTimer):
+    __slots__ = ()
+
     type: TimerType = TimerType.PIT
 
+    def subtree_key(self) -> Optional[Hashable]:
+        return self._common_key(TimerPIT)
+
 
 class TimerHPET(_NormalTimer):
+    __slots__ = ()
+
     type: TimerType = TimerType.HPET
 
+    def subtree_key(self) -> Optional[Hashable]:
+        return self._common_key(TimerHPET)
+
 
 class TimerKVMClock(_NormalTimer):
+    __slots__ = ()
+
     type: TimerType = TimerType.KVMCLOCK
 
+    def subtree_key(self) -> Optional[Hashable]:
+        return self._common_key(TimerKVMClock)
+
 
 class TimerHyperVClock(_NormalTimer):
+    __slots__ = ()
+
     type: TimerType = TimerType.HYPERVCLOCK
 
+    def subtree_key(self) -> Optional[Hashable]:
+        return self._common_key(TimerHyperVClock)
+
 
 class TimerARMV(_NormalTimer):
+    __slots__ = ()
+
     type: TimerType = TimerType.ARMVTIMER
 
+    def subtree_key(self) -> Optional[Hashable]:
+        return self._common_key(TimerARMV)
+
+
+_default_timers: Sequence[Timer] = (
+    TimerRTC(tickpolicy=TickPolicy.CATCHUP),
+    TimerPIT(tickpolicy=TickPolicy.DELAY),
+    TimerHPET(present=False),
+)
+
 
 class Clock(Element):
+    __slots__ = ("offset", "timezone", "adjustment", "basis", "timers")
+
     unique: bool = True
 
     def __init__(self, *, offset: Optional[Offset] = None,
@@ -194,11 +261,8 @@ class Clock(Element):
                  basis: Optional[Basis] = None,
                  timers: Optional[Sequence[Timer]] = None):
         if timers is None:
-            timers = (
-                TimerRTC(tickpolicy=TickPolicy.CATCHUP),
-                TimerPIT(tickpolicy=TickPolicy.DELAY),
-                TimerHPET(present=False),
-            )
+            # Shared by every clock using them; replace them to change them.
+            timers = _default_timers
 
         # Do sanity checking of the arguments
         # Based on libvirt documentation 11 Feb 2021
@@ -237,8 +301,8 @@ class Clock(Element):
         self.basis = basis
         self.timers = timers
 
-    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
-        clock_tag = etree.SubElement(root, "clock")
+    def _build(self) -> etree._Element:
+        clock_tag = etree.Element("clock")
         if self.offset is not None:
             # Set up offset parameters
             clock_tag.attrib["offset"] = self.offset.value
@@ -259,6 +323,19 @@ class Clock(Element):
         for timer in self.timers:
             timer.attach_xml(clock_tag)
 
+        return clock_tag
+
+    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
+        # The defaults are the same in nearly every domain, so the tree is
+        # cached by value.
+        timer_keys = tuple(timer.subtree_key() for timer in self.timers)
+        key: Optional[Hashable] = None
+        if None not in timer_keys:
+            key = (type(self), self.offset, self.timezone, self.adjustment,
+                   self.basis, timer_keys)
+
+        clock_tag = subtree_cache.get(key, self._build)
+        root.append(clock_tag)
         return [clock_tag]
 
     def __repr__(self):
@@ -6,6 +6,8 @@ from libvirt_vmcfg.dom.elements.devices import Device
 
 
 class ConsolePTY(Device):
+    __slots__ = ()
+
     unique: bool = True
 
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
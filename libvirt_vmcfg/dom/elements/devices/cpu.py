@@ -2,15 +2,18 @@ from typing import Sequence
 
 from lxml import etree
 
+from libvirt_vmcfg.common.util import intern_str
 from libvirt_vmcfg.dom.elements import Element
 
 
 class CPU(Element):
+    __slots__ = ("vcpus", "mode")
+
     unique: bool = True
 
     def __init__(self, vcpus: int, mode: str = "host-model"):
         self.vcpus = vcpus
-        self.mode = mode
+        self.mode = intern_str(mode)
 
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
         vcpu_tag = etree.SubElement(root, "vcpu")
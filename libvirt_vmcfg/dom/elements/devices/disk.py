@@ -1,14 +1,19 @@
 from abc import ABC, abstractmethod
-from dataclasses import asdict, astuple, dataclass
+from dataclasses import dataclass
 from enum import Enum
 from typing import Any, Dict, Optional, Sequence, cast
 from urllib.parse import urlparse
 
 from lxml import etree
 
+from libvirt_vmcfg.common.util import intern_str, serializer, slotted
+from libvirt_vmcfg.dom.elements import current_anchors
 from libvirt_vmcfg.dom.elements.devices import Device
 
 
+_target_xpath = etree.XPath("/domain/devices/disk/target[@dev = $dev]")
+
+
 class DeviceAttachment(Enum):
     DISK = "disk"
     CDROM = "cdrom"
@@ -79,6 +84,7 @@ class DriverDetectZeroes(Enum):
     UNMAP = "unmap"
 
 
+@slotted
 @dataclass
 class DriverOptions:
     """Basic driver data.
@@ -107,6 +113,7 @@ class DriverOptions:
             raise ValueError("rerror_policy cannot be ENOSPACE")
 
 
+@slotted
 @dataclass
 class IOTuneOptions:
     """Basic iotune options.
@@ -180,6 +187,8 @@ class DiskSource(ABC):
     Sources can be incredibly complex, so we use a special object that can help
     us construct it.
     """
+    __slots__ = ()
+
     @abstractmethod
     def attach_xml(self, disk_tag: etree._Element) -> None:
         # Implement this method in your subclass.
@@ -192,6 +201,8 @@ class DiskSource(ABC):
 
 class DiskSourceBlockPath(DiskSource):
     """Block source for disk."""
+    __slots__ = ("path",)
+
     def __init__(self, path: str):
         self.path = path
 
@@ -205,6 +216,9 @@ class DiskSourceBlockPath(DiskSource):
 
 class DiskSourceNetHTTP(DiskSource):
     """HTTP(S) source for disk."""
+    __slots__ = ("url", "cookies", "readahead", "timeout", "ssl_verify",
+                 "protocol", "path", "host", "port", "query")
+
     def __init__(self, url: str, *,
                  cookies: Optional[Dict[str, str]] = None, readahead: int = 0,
                  timeout: int = 0, ssl_verify: Optional[bool] = None):
@@ -269,6 +283,8 @@ class DiskSourceNetHTTP(DiskSource):
 
 class DiskSourceVolume(DiskSource):
     """libvirt volume storage for disks."""
+    __slots__ = ("pool", "volume", "mode")
+
     def __init__(self, pool: str, volume: str,
                  mode: Optional[SourceVolumeMode] = None):
         self.pool = pool
@@ -290,9 +306,11 @@ class DiskTarget:
     Class for disk targets.
 
     These are much simpler than disk sources, so this does not require an
-    interface.
+    interface. path may be None, for Domain.attach_disks to fill in.
     """
-    def __init__(self, device: DeviceAttachment, path: str, *,
+    __slots__ = ("device", "path", "bus", "tray", "removable")
+
+    def __init__(self, device: DeviceAttachment, path: Optional[str], *,
                  bus: Optional[TargetBus] = None, tray: Optional[Tray] = None,
                  removable: Optional[bool] = None):
         if device not in (DeviceAttachment.CDROM, DeviceAttachment.FLOPPY):
@@ -309,7 +327,8 @@ class DiskTarget:
         # TODO: validate the dev parameter
 
         self.device = device
-        self.path = path
+        # Names like vda repeat in every domain.
+        self.path = intern_str(path)
         self.bus = bus
         self.tray = tray
         self.removable = removable
@@ -335,7 +354,19 @@ def DiskTargetFloppy(path: str, **kwargs) -> DiskTarget:
     return DiskTarget(DeviceAttachment.FLOPPY, path, **kwargs)
 
 
+def _on_off(value: bool) -> str:
+    return "on" if value else "off"
+
+
+# driver is the name attribute, set when the tag is created
+_driver_serializer = serializer(DriverOptions, exclude=("driver",),
+                                bool_format=_on_off)
+_iotune_serializer = serializer(IOTuneOptions)
+
+
 class Disk(Device):
+    __slots__ = ("source", "target", "driver_opts", "readonly", "iotune_opts")
+
     unique: bool = False
 
     def __init__(self, source: DiskSource, target: DiskTarget,
@@ -347,36 +378,32 @@ class Disk(Device):
         self.readonly = readonly
         self.iotune_opts = iotune_opts
 
+    def with_target_path(self, path: str) -> "Disk":
+        """Return a copy of this disk with another target device name."""
+        target = self.target
+        return Disk(self.source,
+                    DiskTarget(target.device, path, bus=target.bus,
+                               tray=target.tray, removable=target.removable),
+                    self.driver_opts, self.readonly, self.iotune_opts)
+
     def _populate_driver_tag(self, driver_tag: etree._Element) -> None:
-        # This is a quick and dirty hack for iterating over the driver_opts
-        # items. This helps facilitate my laziness. ;p --Elizafox
-        driver_dict = asdict(self.driver_opts)
-        for attr, value in driver_dict.items():
-            if attr == "driver" or value is None:
-                # XXX hack!
-                continue
-
-            # Coerce into correct type
-            if isinstance(value, bool):
-                value = ("on" if value else "off")
-            elif isinstance(value, int):
-                value = str(value)
-            elif isinstance(value, Enum):
-                value = value.value
-            elif isinstance(value, str):
-                pass
-            else:
-                # Really shouldn't happen.
-                raise ValueError("Unexpected value type", type(value))
-
-            # At this point, we should certainly have a value
-            driver_tag.set(attr, value)
+        _driver_serializer.set_attributes(self.driver_opts, driver_tag)
 
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
         # Check for existing target, to avoid conflicts.
         # Do this before actual tag creation, to avoid making a mess.
-        xpstr = f"/domain/devices/disk/target[@dev='{self.target.path}']"
-        if root.xpath(xpstr):
+        # When attached via a Domain, its cache tracks the targets in use;
+        # otherwise fall back to searching the tree.
+        if self.target.path is None:
+            raise ValueError("Disk target has no device name", self.target)
+
+        cache = current_anchors(root)
+        if cache is not None:
+            conflict = cache.claimed("disk-target", self.target.path)
+        else:
+            conflict = bool(_target_xpath(root, dev=self.target.path))
+
+        if conflict:
             raise ValueError("target device already attached")
 
         devices_tag = self.get_devices_tag(root)
@@ -412,28 +439,26 @@ class Disk(Device):
             target_tag.set("bus", self.target.bus.value)
 
         if self.target.tray is not None:
-            print("tray", self.target.tray)
             target_tag.set("tray", self.target.tray.value)
 
         if self.target.removable is not None:
-            print("removable", self.target.removable)
             target_tag.set("removable",
                            ("yes" if self.target.removable else "no"))
 
         # Any iotune options?
-        if (self.iotune_opts is not None
-                and astuple(self.iotune_opts).count(None) > 0):
-            iotune_tag = etree.SubElement(disk_tag, "iotune")
-            for attr, value in asdict(self.iotune_opts).items():
-                if value is None:
-                    continue
-
-                tag = etree.SubElement(iotune_tag, attr)
-                tag.text = str(value)
+        if self.iotune_opts is not None:
+            iotune = list(_iotune_serializer.items(self.iotune_opts))
+            if iotune:
+                iotune_tag = etree.SubElement(disk_tag, "iotune")
+                for attr, value in iotune:
+                    etree.SubElement(iotune_tag, attr).text = value
 
         if self.readonly:
             etree.SubElement(disk_tag, "readonly")
 
+        if cache is not None:
+            cache.claim("disk-target", self.target.path, target_tag)
+
         # lxml will clean up the rest :3
         return [disk_tag]
 
@@ -1,8 +1,11 @@
+from hashlib import blake2b
 from os import urandom
-from typing import Optional, Sequence
+from typing import Iterable, Optional, Sequence, Set, Tuple, Union
+from uuid import UUID
 
 from lxml import etree
 
+from libvirt_vmcfg.common.util import intern_str
 from libvirt_vmcfg.dom.elements.devices import Device
 
 
@@ -14,14 +17,195 @@ def gen_mac() -> str:
     return ":".join(f"{octet:0{2}x}" for octet in seq)
 
 
+# Bits of the first octet, in a MAC address as a 48-bit int
+_GROUP_BIT = 0x01 << 40
+_LOCAL_BIT = 0x02 << 40
+
+
+def _mac_to_int(mac: str) -> int:
+    octets = mac.split(":")
+    if len(octets) != 6 or not all(len(o) == 2 for o in octets):
+        raise ValueError("Invalid MAC address", mac)
+
+    return int("".join(octets), 16)
+
+
+def _int_to_mac(value: int) -> str:
+    return "%02x:%02x:%02x:%02x:%02x:%02x" % tuple(value.to_bytes(6, "big"))
+
+
+def _parse_prefix(prefix: Optional[str]) -> Tuple[int, int]:
+    # Returns the prefix as the top bits of a MAC address int, and how many
+    # bytes are left to fill in.
+    octets = [] if prefix is None else prefix.split(":")
+    if len(octets) > 5 or not all(len(o) == 2 for o in octets):
+        raise ValueError("Invalid MAC prefix", prefix)
+
+    free = 6 - len(octets)
+    base = int("".join(octets), 16) << (8 * free) if octets else 0
+    if base & _GROUP_BIT:
+        raise ValueError("MAC prefix is multicast", prefix)
+
+    return base, free
+
+
+def _fill(base: int, free: int, value: int) -> int:
+    # Put value under the prefix; without one, make it locally administered
+    # unicast.
+    value |= base
+    if free == 6:
+        value = (value & ~_GROUP_BIT) | _LOCAL_BIT
+
+    return value
+
+
+def derive_mac(namespace: Union[UUID, str], name: str, index: int = 0, *,
+               prefix: Optional[str] = None) -> str:
+    """Derive a MAC address for a domain's interface.
+
+    The address is a keyed hash of the domain name and the interface's
+    index, keyed with the namespace (a UUID), so the same arguments always
+    give the same address. This makes output reproducible, but the
+    addresses are no less likely to collide than random ones.
+    """
+    key = UUID(str(namespace)).bytes
+    base, free = _parse_prefix(prefix)
+    digest = blake2b(f"{name}\0{index}".encode("utf-8"), digest_size=free,
+                     key=key).digest()
+    return _int_to_mac(_fill(base, free, int.from_bytes(digest, "big")))
+
+
+class MacPool:
+    """A source of random MAC addresses which never repeats itself.
+
+    Without a prefix, addresses are locally administered unicast ones, like
+    gen_mac makes. With a prefix (such as the "52:54:00" OUI QEMU uses), the
+    rest of each address is random.
+
+    Random bytes are read from the OS in batches rather than per address,
+    and every address issued or added is remembered, so a pool shared by a
+    whole fleet never issues the same address twice. Add the addresses
+    already in use with the preload parameter or add().
+
+    Parameters:
+      prefix: leading octets every address has, such as "52:54:00"
+      preload: addresses already in use, which won't be issued
+      batch: number of addresses to read random bytes for at a time
+    """
+    __slots__ = ("prefix", "batch", "_base", "_random_bytes", "_issued",
+                 "_in_range", "_buffer", "_offset")
+
+    def __init__(self, prefix: Optional[str] = None, *,
+                 preload: Iterable[str] = (), batch: int = 256):
+        self.prefix = prefix
+        self.batch = batch
+        self._base, self._random_bytes = _parse_prefix(prefix)
+
+        self._issued: Set[int] = set()
+        # Addresses issued which fall under the prefix, to detect running
+        # out of them.
+        self._in_range = 0
+        self._buffer = b""
+        self._offset = 0
+
+        for mac in preload:
+            self.add(mac)
+
+    def _capacity(self) -> int:
+        if self.prefix is None:
+            # The group and local bits are fixed.
+            return 1 << 46
+
+        return 1 << (8 * self._random_bytes)
+
+    def _in_prefix(self, value: int) -> bool:
+        if self.prefix is None:
+            return value & (_GROUP_BIT | _LOCAL_BIT) == _LOCAL_BIT
+
+        return value >> (8 * self._random_bytes) == \
+            self._base >> (8 * self._random_bytes)
+
+    def _random(self) -> int:
+        size = self._random_bytes
+        if self._offset + size > len(self._buffer):
+            self._buffer = urandom(size * self.batch)
+            self._offset = 0
+
+        start = self._offset
+        self._offset += size
+        return int.from_bytes(self._buffer[start:self._offset], "big")
+
+    def allocate(self) -> str:
+        """Return a MAC address that hasn't been issued or added before."""
+        if self._in_range >= self._capacity():
+            raise ValueError("MAC pool exhausted", self.prefix)
+
+        while True:
+            value = _fill(self._base, self._random_bytes, self._random())
+
+            if value not in self._issued:
+                break
+
+        self._issued.add(value)
+        self._in_range += 1
+        return _int_to_mac(value)
+
+    def add(self, mac: str) -> None:
+        """Record that an address is in use, so it won't be issued."""
+        value = _mac_to_int(mac)
+        if value in self._issued:
+            return
+
+        self._issued.add(value)
+        if self._in_prefix(value):
+            self._in_range += 1
+
+    def release(self, mac: str) -> None:
+        """Allow an address to be issued again."""
+        value = _mac_to_int(mac)
+        if value not in self._issued:
+            raise ValueError("MAC address not in pool", mac)
+
+        self._issued.remove(value)
+        if self._in_prefix(value):
+            self._in_range -= 1
+
+    def __contains__(self, mac: object) -> bool:
+        if not isinstance(mac, str):
+            return False
+
+        try:
+            return _mac_to_int(mac) in self._issued
+        except ValueError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self._issued)
+
+    def __repr__(self):
+        return f"MacPool(prefix={self.prefix!r}, {len(self)} addresses)"
+
+
 class BridgedInterface(Device):
+    __slots__ = ("interface", "mac", "model")
+
     unique: bool = False
 
     def __init__(self, interface: str, mac: Optional[str] = None,
-                 model: str = "virtio"):
-        self.interface = interface
-        self.mac = gen_mac() if mac is None else mac
-        self.model = model
+                 model: str = "virtio", *, pool: Optional[MacPool] = None):
+        # Bridges and models repeat in every domain.
+        self.interface = intern_str(interface)
+        if mac is None:
+            mac = gen_mac() if pool is None else pool.allocate()
+        elif pool is not None:
+            # Another interface has it, or will be given it.
+            if mac in pool:
+                raise ValueError("MAC address already in pool", mac)
+
+            pool.add(mac)
+
+        self.mac = mac
+        self.model = intern_str(model)
 
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
         devices_tag = self.get_devices_tag(root)
@@ -2,15 +2,21 @@ from typing import Sequence
 
 from lxml import etree
 
+from libvirt_vmcfg.dom.elements import subtree_cache
 from libvirt_vmcfg.dom.elements.devices import Device
 
 
 class VirtIOMemballoon(Device):
+    __slots__ = ()
+
     unique: bool = True
 
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
         devices_tag = self.get_devices_tag(root)
-        return [etree.SubElement(devices_tag, "memballoon", model="virtio")]
+        memballoon_tag = subtree_cache.get(
+            type(self), lambda: etree.Element("memballoon", model="virtio"))
+        devices_tag.append(memballoon_tag)
+        return [memballoon_tag]
 
     def __repr__(self):
         return f"VirtIOMemballoon()"
@@ -3,6 +3,8 @@ from typing import Sequence
 
 from lxml import etree
 
+from libvirt_vmcfg.common.util import intern_str
+from libvirt_vmcfg.dom.elements import subtree_cache
 from libvirt_vmcfg.dom.elements.devices import Device
 
 
@@ -11,19 +13,27 @@ class RNGModel(Enum):
 
 
 class RNG(Device):
+    __slots__ = ("model", "backend_dev")
+
     unique: bool = False
 
     def __init__(self, model: RNGModel = RNGModel.VIRTIO,
                  backend_dev: str = "/dev/urandom"):
         self.model = model
-        self.backend_dev = backend_dev
+        self.backend_dev = intern_str(backend_dev)
 
-    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
-        devices_tag = self.get_devices_tag(root)
-        rng_tag = etree.SubElement(devices_tag, "rng", model=self.model.value)
+    def _build(self) -> etree._Element:
+        rng_tag = etree.Element("rng", model=self.model.value)
         backend_tag = etree.SubElement(rng_tag, "backend", model="random")
         backend_tag.text = self.backend_dev
-        return [rng_tag, backend_tag]
+        return rng_tag
+
+    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
+        devices_tag = self.get_devices_tag(root)
+        rng_tag = subtree_cache.get(
+            (type(self), self.model, self.backend_dev), self._build)
+        devices_tag.append(rng_tag)
+        return [rng_tag, rng_tag[0]]
 
     def __repr__(self):
         return f"RNG(model={self.model}, backend_dev={self.backend_dev!r})"
@@ -2,10 +2,13 @@ from typing import Sequence
 
 from lxml import etree
 
+from libvirt_vmcfg.dom.elements import subtree_cache
 from libvirt_vmcfg.dom.elements.devices import Device
 
 
 class QemuXHCIUSBController(Device):
+    __slots__ = ("ports",)
+
     unique: bool = False
 
     def __init__(self, ports: int = 15):
@@ -13,8 +16,13 @@ class QemuXHCIUSBController(Device):
 
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
         devices_tag = self.get_devices_tag(root)
-        return [etree.SubElement(devices_tag, "controller", type="usb",
-                                 model="qemu-xhci", ports=str(self.ports))]
+        ports = str(self.ports)
+        controller_tag = subtree_cache.get(
+            (type(self), ports),
+            lambda: etree.Element("controller", type="usb",
+                                  model="qemu-xhci", ports=ports))
+        devices_tag.append(controller_tag)
+        return [controller_tag]
 
     def __repr__(self):
         return f"QemuXHCIUSBController(ports={self.ports})"
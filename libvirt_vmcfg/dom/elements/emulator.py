@@ -2,14 +2,17 @@ from typing import Sequence
 
 from lxml import etree
 
+from libvirt_vmcfg.common.util import intern_str
 from libvirt_vmcfg.dom.elements.devices import Device
 
 
 class Emulator(Device):
+    __slots__ = ("emulator_path",)
+
     unique: bool = True
 
     def __init__(self, emulator_path: str):
-        self.emulator_path = emulator_path
+        self.emulator_path = intern_str(emulator_path)
 
     def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
         devices_tag = self.get_devices_tag(root)
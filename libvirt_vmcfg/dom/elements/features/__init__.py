@@ -1,15 +1,31 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Optional, Sequence, Union
+from typing import (TYPE_CHECKING, Hashable, Optional, Sequence, Set, Type,
+                    TypeVar, Union)
 
 from lxml import etree
 
-from libvirt_vmcfg.common.util import bool_to_str
-from libvirt_vmcfg.dom.elements import Element
+from libvirt_vmcfg.common.util import bool_to_str, lazy_attributes
+from libvirt_vmcfg.dom.elements import Element, subtree_cache
+
+
+# Feature types whose subtree_key covers all their state. Only exactly these
+# are keyed, as subclasses may add state of their own.
+_keyed_types: Set[type] = set()
+
+_F = TypeVar("_F", bound=Type["FeatureBase"])
+
+
+def subtree_keyed(cls: _F) -> _F:
+    """Class decorator opting a feature type in to its subtree_key."""
+    _keyed_types.add(cls)
+    return cls
 
 
 class FeatureBase(ABC):
+    __slots__ = ()
+
     parent: Optional[Union[FeatureBase, str]] = None
     name: str
 
@@ -17,21 +33,49 @@ class FeatureBase(ABC):
     def xml_tag(self) -> etree._Element:
         raise NotImplementedError
 
+    def subtree_key(self) -> Optional[Hashable]:
+        """Return a key telling this feature's XML apart, for caching.
+
+        None (the default) means the XML is not to be cached, nor is that of
+        any Features containing it. Types returning a key must cover all of
+        their state with it, and only do so for types marked with
+        subtree_keyed.
+        """
+        return None
+
 
 class FeatureEmpty(FeatureBase):
+    __slots__ = ()
+
     def xml_tag(self) -> etree._Element:
         return etree.Element(self.name)
 
+    def subtree_key(self) -> Optional[Hashable]:
+        if type(self) not in _keyed_types:
+            return None
+
+        return (type(self), self.name)
+
 
 class FeatureBooleanState(FeatureBase): 
+    __slots__ = ("state",)
+
     def __init__(self, state: bool):
         self.state = state
 
     def xml_tag(self) -> etree._Element:
         return etree.Element(self.name, state=bool_to_str(self.state))
 
+    def subtree_key(self) -> Optional[Hashable]:
+        if type(self) not in _keyed_types:
+            return None
+
+        return (type(self), self.name, bool_to_str(self.state))
+
 
 class Features(Element):
+    __slots__ = ("features",)
+
     unique = True
 
     def __init__(self, features: Sequence[FeatureBase]):
@@ -43,23 +87,48 @@ class Features(Element):
 
         self.features = features
 
-    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
-        features_tag = etree.SubElement(root, "features")
+    def _build(self) -> etree._Element:
+        features_tag = etree.Element("features")
         for feature in self.features:
             features_tag.append(feature.xml_tag())
 
+        return features_tag
+
+    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
+        keys = tuple(feature.subtree_key() for feature in self.features)
+        key = None if None in keys else (type(self), keys)
+        features_tag = subtree_cache.get(key, self._build)
+        root.append(features_tag)
         return [features_tag]
 
 
-# Delayed import to prevent circular deps
-from libvirt_vmcfg.dom.elements.features.common import (
-    PAE, NonPAE, ACPI, APIC, HAP, Viridian, PVSpinlock, PMU, GIC
-)
-from libvirt_vmcfg.dom.elements.features.kvm import (
-    IOAPICDriver, HPTResizing, CFPCValue, SBBCValue, IBSValue, SMM, IOAPIC,
-    HPT, VMCoreInfo, HTM, NestedHV, CCFAssist, CFPC, SBBC, IBS, KVMHidden,
-    KVMHintDedicated, KVMPollControl, KVMFeatureSet, KVM, HyperVRelaxed,
-    HyperV_VAPIC, HyperVSpinlocks, HyperV_VPIndex, HyperVRuntime, HyperVStimer,
-    HyperVReset, HyperV_VendorID, HyperVFrequencies, HyperVReenlightenment,
-    HyperVTLBFlush, HyperVIPI, HyperVEVMCS, HyperVFeatureSet, HyperV
-)
+# Imported when first used; this also prevents circular deps.
+# NB: keep this in sync with the TYPE_CHECKING imports below.
+__getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+    ".common": ("PAE", "NonPAE", "ACPI", "APIC", "HAP", "Viridian",
+                "PVSpinlock", "PMU", "GIC"),
+    ".kvm": (
+        "IOAPICDriver", "HPTResizing", "CFPCValue", "SBBCValue", "IBSValue",
+        "SMM", "IOAPIC", "HPT", "VMCoreInfo", "HTM", "NestedHV", "CCFAssist",
+        "CFPC", "SBBC", "IBS", "KVMHidden", "KVMHintDedicated",
+        "KVMPollControl", "KVMFeatureSet", "KVM", "HyperVRelaxed",
+        "HyperV_VAPIC", "HyperVSpinlocks", "HyperV_VPIndex", "HyperVRuntime",
+        "HyperVStimer", "HyperVReset", "HyperV_VendorID", "HyperVFrequencies",
+        "HyperVReenlightenment", "HyperVTLBFlush", "HyperVIPI", "HyperVEVMCS",
+        "HyperVFeatureSet", "HyperV",
+    ),
+})
+
+if TYPE_CHECKING:
+    from libvirt_vmcfg.dom.elements.features.common import (
+        PAE, NonPAE, ACPI, APIC, HAP, Viridian, PVSpinlock, PMU, GIC
+    )
+    from libvirt_vmcfg.dom.elements.features.kvm import (
+        IOAPICDriver, HPTResizing, CFPCValue, SBBCValue, IBSValue, SMM,
+        IOAPIC, HPT, VMCoreInfo, HTM, NestedHV, CCFAssist, CFPC, SBBC, IBS,
+        KVMHidden, KVMHintDedicated, KVMPollControl, KVMFeatureSet, KVM,
+        HyperVRelaxed, HyperV_VAPIC, HyperVSpinlocks, HyperV_VPIndex,
+        HyperVRuntime, HyperVStimer, HyperVReset, HyperV_VendorID,
+        HyperVFrequencies, HyperVReenlightenment, HyperVTLBFlush, HyperVIPI,
+        HyperVEVMCS, HyperVFeatureSet, HyperV
+    )
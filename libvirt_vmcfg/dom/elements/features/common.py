@@ -1,26 +1,37 @@
-from typing import Optional
+from typing import Hashable, Optional
 
 from lxml import etree
 
 from libvirt_vmcfg.common.util import bool_to_str
 from libvirt_vmcfg.dom.elements.features import (
-    FeatureBase, FeatureEmpty, FeatureBooleanState
+    FeatureBase, FeatureEmpty, FeatureBooleanState, subtree_keyed
 )
 
 
+@subtree_keyed
 class PAE(FeatureEmpty):
+    __slots__ = ()
+
     name = "pae"
 
 
+@subtree_keyed
 class NonPAE(FeatureEmpty):
+    __slots__ = ()
+
     name = "nonpae"
 
 
+@subtree_keyed
 class ACPI(FeatureEmpty):
+    __slots__ = ()
+
     name = "acpi"
 
 
 class APIC(FeatureBase):
+    __slots__ = ("eoi",)
+
     name = "apic"
 
     def __init__(self, eoi: Optional[bool] = None):
@@ -33,24 +44,46 @@ class APIC(FeatureBase):
 
         return apic_tag
 
+    def subtree_key(self) -> Optional[Hashable]:
+        # Subclasses may add state the key misses.
+        if type(self) is not APIC:
+            return None
+
+        return (APIC, self.name,
+                None if self.eoi is None else bool_to_str(self.eoi))
+
 
+@subtree_keyed
 class HAP(FeatureBooleanState):
+    __slots__ = ()
+
     name = "hap"
 
 
+@subtree_keyed
 class Viridian(FeatureEmpty):
+    __slots__ = ()
+
     name = "viridian"
 
 
+@subtree_keyed
 class PVSpinlock(FeatureBooleanState):
+    __slots__ = ()
+
     name = "pvspinlock"
 
 
+@subtree_keyed
 class PMU(FeatureBooleanState):
+    __slots__ = ()
+
     name = "pmu"
 
 
 class GIC(FeatureBase):
+    __slots__ = ("state", "version")
+
     name = "gic"
 
     def __init__(self, state: bool, version: Optional[int] = None):
@@ -1,12 +1,12 @@
-from dataclasses import astuple, dataclass, field
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Optional
 
 from lxml import etree
 
-from libvirt_vmcfg.common.util import bool_to_str
+from libvirt_vmcfg.common.util import bool_to_str, serializer, slotted
 from libvirt_vmcfg.dom.elements.features import (
-    FeatureBase, FeatureEmpty, FeatureBooleanState
+    FeatureBase, FeatureEmpty, FeatureBooleanState, subtree_keyed
 )
 
 
@@ -43,6 +43,8 @@ class IBSValue(Enum):
 
 
 class SMM(FeatureBase):
+    __slots__ = ("state", "tseg", "unit")
+
     name = "smm"
 
     def __init__(self, state: bool, tseg: Optional[int] = None,
@@ -65,6 +67,8 @@ class SMM(FeatureBase):
 
 
 class IOAPIC(FeatureBase):
+    __slots__ = ("driver",)
+
     name = "ioapic"
 
     def __init__(self, driver: IOAPICDriver):
@@ -75,6 +79,8 @@ class IOAPIC(FeatureBase):
 
 
 class HPT(FeatureBase):
+    __slots__ = ("resizing", "maxpagesize", "unit")
+
     name = "hpt"
 
     def __init__(self, resizing: Optional[HPTResizing] = None,
@@ -96,23 +102,37 @@ class HPT(FeatureBase):
         return hpt_tag
 
 
+@subtree_keyed
 class VMCoreInfo(FeatureEmpty):
+    __slots__ = ()
+
     name = "vmcoreinfo"
 
 
+@subtree_keyed
 class HTM(FeatureBooleanState):
+    __slots__ = ()
+
     name = "htm"
 
 
+@subtree_keyed
 class NestedHV(FeatureBooleanState):
+    __slots__ = ()
+
     name = "nested-hv"
 
 
+@subtree_keyed
 class CCFAssist(FeatureBooleanState):
+    __slots__ = ()
+
     name = "ccf-assist"
 
 
 class CFPC(FeatureBase):
+    __slots__ = ("value",)
+
     name = "cfpc"
 
     def __init__(self, value: CFPCValue):
@@ -123,6 +143,8 @@ class CFPC(FeatureBase):
 
 
 class SBBC(FeatureBase):
+    __slots__ = ("value",)
+
     name = "sbbc"
 
     def __init__(self, value: SBBCValue):
@@ -133,6 +155,10 @@ class SBBC(FeatureBase):
 
 
 class IBS(FeatureBase):
+    __slots__ = ("value",)
+
+    name = "ibs"
+
     def __init__(self, value: IBSValue):
         self.value = value
 
@@ -144,21 +170,31 @@ class IBS(FeatureBase):
 # KVM tag specific features #
 #############################
 
+@subtree_keyed
 class KVMHidden(FeatureBooleanState):
+    __slots__ = ()
+
     name = "hidden"
     parent = "kvm"
 
 
+@subtree_keyed
 class KVMHintDedicated(FeatureBooleanState):
+    __slots__ = ()
+
     name = "hint-dedicated"
     parent = "kvm"
 
 
+@subtree_keyed
 class KVMPollControl(FeatureBooleanState):
+    __slots__ = ()
+
     name = "poll-control"
     parent = "kvm"
 
 
+@slotted
 @dataclass
 class KVMFeatureSet:
     hidden: Optional[KVMHidden] = None
@@ -166,12 +202,16 @@ class KVMFeatureSet:
     poll_control: Optional[KVMPollControl] = None
 
 
+_kvm_serializer = serializer(KVMFeatureSet)
+
+
 class KVM(FeatureBase):
+    __slots__ = ("features",)
+
     name = "kvm"
 
     def __init__(self, features: KVMFeatureSet):
-        features_tuple = astuple(features)
-        if features_tuple == (None,) * len(features_tuple):
+        if not _kvm_serializer.values(features):
             raise ValueError("No feature bits set")
 
         self.features = features
@@ -179,7 +219,7 @@ class KVM(FeatureBase):
     def xml_tag(self) -> etree._Element:
         kvm_tag = etree.Element(self.name)
 
-        for feature in astuple(self.features):
+        for feature in _kvm_serializer.values(self.features):
             assert feature.parent == self.name
             kvm_tag.append(feature.xml_tag())
 
@@ -190,17 +230,25 @@ class KVM(FeatureBase):
 # HyperV-specific options (QEMU/KVM) #
 ######################################
 
+@subtree_keyed
 class HyperVRelaxed(FeatureBooleanState):
+    __slots__ = ()
+
     name = "relaxed"
     parent = "hyperv"
 
 
+@subtree_keyed
 class HyperV_VAPIC(FeatureBooleanState):
+    __slots__ = ()
+
     name = "vapic"
     parent = "hyperv"
 
 
 class HyperVSpinlocks(FeatureBase):
+    __slots__ = ("state", "retries")
+
     name = "spinlocks"
     parent = "hyperv"
 
@@ -220,22 +268,33 @@ class HyperVSpinlocks(FeatureBase):
         return spinlocks_tag
 
 
+@subtree_keyed
 class HyperV_VPIndex(FeatureBooleanState):
+    __slots__ = ()
+
     name = "vpindex"
     parent = "hyperv"
 
 
+@subtree_keyed
 class HyperVRuntime(FeatureBooleanState):
+    __slots__ = ()
+
     name = "runtime"
     parent = "hyperv"
 
 
+@subtree_keyed
 class HyperVSynIC(FeatureBooleanState):
+    __slots__ = ()
+
     name = "synic"
     parent = "hyperv"
 
 
 class HyperVStimer(FeatureBase):
+    __slots__ = ("state", "direct")
+
     name = "stimer"
     parent = "hyperv"
 
@@ -253,12 +312,17 @@ class HyperVStimer(FeatureBase):
         return stimer_tag
 
 
+@subtree_keyed
 class HyperVReset(FeatureBooleanState):
+    __slots__ = ()
+
     name = "reset"
     parent = "hyperv"
 
 
 class HyperV_VendorID(FeatureBase):
+    __slots__ = ("state", "value")
+
     name = "vendor_id"
     parent = "hyperv"
 
@@ -278,31 +342,47 @@ class HyperV_VendorID(FeatureBase):
         return vendor_id_tag
 
 
+@subtree_keyed
 class HyperVFrequencies(FeatureBooleanState):
+    __slots__ = ()
+
     name = "frequencies"
     parent = "hyperv"
 
 
+@subtree_keyed
 class HyperVReenlightenment(FeatureBooleanState):
+    __slots__ = ()
+
     name = "reenlightenment"
     parent = "hyperv"
 
 
+@subtree_keyed
 class HyperVTLBFlush(FeatureBooleanState):
+    __slots__ = ()
+
     name = "tlbflush"
     parent = "hyperv"
 
 
+@subtree_keyed
 class HyperVIPI(FeatureBooleanState):
+    __slots__ = ()
+
     name = "ipi"
     parent = "hyperv"
 
 
+@subtree_keyed
 class HyperVEVMCS(FeatureBooleanState):
+    __slots__ = ()
+
     name = "evmcs"
     parent = "hyperv"
 
 
+@slotted
 @dataclass
 class HyperVFeatureSet:
     # NB: lambda is used to create factories for these objects.
@@ -336,12 +416,16 @@ class HyperVFeatureSet:
         field(default_factory=lambda: HyperVEVMCS(True))
 
 
+_hyperv_serializer = serializer(HyperVFeatureSet)
+
+
 class HyperV(FeatureBase):
+    __slots__ = ("features",)
+
     name = "hyperv"
 
     def __init__(self, features: HyperVFeatureSet):
-        features_tuple = astuple(features)
-        if features_tuple == (None,) * len(features_tuple):
+        if not _hyperv_serializer.values(features):
             raise ValueError("No feature bits set")
 
         self.features = features
@@ -349,7 +433,7 @@ class HyperV(FeatureBase):
     def xml_tag(self) -> etree._Element:
         hyperv_tag = etree.Element(self.name)
 
-        for feature in astuple(self.features):
+        for feature in _hyperv_serializer.values(self.features):
             assert feature.parent == self.name
             hyperv_tag.append(feature.xml_tag())
 
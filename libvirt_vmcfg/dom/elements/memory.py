@@ -6,6 +6,8 @@ from libvirt_vmcfg.dom.elements import Element
 
 
 class Memory(Element):
+    __slots__ = ("memory", "current_memory")
+
     unique: bool = True
 
     def __init__(self, memory: int, current_memory: Optional[int] = None):
@@ -6,6 +6,8 @@ from libvirt_vmcfg.dom.elements import Element
 
 
 class Metadata(Element):
+    __slots__ = ("metadata",)
+
     unique: bool = True
 
     def __init__(self, metadata: etree._Element):
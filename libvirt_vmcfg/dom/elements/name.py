@@ -6,6 +6,8 @@ from libvirt_vmcfg.dom.elements import Element
 
 
 class Name(Element):
+    __slots__ = ("name",)
+
     unique: bool = True
 
     def __init__(self, name: str):
@@ -0,0 +1,53 @@
+from copy import deepcopy
+from typing import Sequence
+
+from lxml import etree
+
+from libvirt_vmcfg.dom.elements import Element, current_anchors
+from libvirt_vmcfg.dom.elements.devices import Device
+
+
+class Opaque(Element):
+    """An XML subtree kept as is, such as one no element understands."""
+    __slots__ = ("node",)
+
+    unique: bool = False
+
+    def __init__(self, node: etree._Element):
+        self.node = node
+
+    def _copy(self) -> etree._Element:
+        node = deepcopy(self.node)
+        node.tail = None
+        return node
+
+    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
+        node = self._copy()
+        root.append(node)
+        return [node]
+
+    def __repr__(self):
+        return f"{type(self).__name__}(node={self.node})"
+
+
+class OpaqueDevice(Opaque, Device):
+    """An XML subtree kept as is inside the devices tag."""
+    __slots__ = ()
+
+    unique: bool = False
+
+    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
+        devices_tag = self.get_devices_tag(root)
+        node = self._copy()
+        devices_tag.append(node)
+
+        # Claim the target of opaque disks too, so disks attached later
+        # can't reuse it.
+        cache = current_anchors(root)
+        target = node.find("target") if node.tag == "disk" else None
+        if cache is not None and target is not None:
+            dev = target.get("dev")
+            if dev:
+                cache.claim("disk-target", dev, target)
+
+        return [node]
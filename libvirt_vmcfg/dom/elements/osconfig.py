@@ -3,18 +3,22 @@ from typing import Optional, Sequence
 
 from lxml import etree
 
+from libvirt_vmcfg.common.util import intern_str
 from libvirt_vmcfg.dom.elements import Element
 
 
 class QemuOSConfig(Element):
+    __slots__ = ("arch", "machine", "boot_dev_order")
+
     unique: bool = True
 
     def __init__(self, arch: str, machine: str,
                  boot_dev_order: Optional[Sequence[str]] = None):
-        self.arch = arch
-        self.machine = machine
+        self.arch = intern_str(arch)
+        self.machine = intern_str(machine)
         if boot_dev_order is None:
-            boot_dev_order = []
+            # Shared, rather than an empty list per domain.
+            boot_dev_order = ()
         self.boot_dev_order = boot_dev_order
 
     def attach_xml(self, root):
@@ -3,10 +3,12 @@ from typing import Sequence
 from lxml import etree
 
 from libvirt_vmcfg.common.util import bool_to_str
-from libvirt_vmcfg.dom.elements import Element
+from libvirt_vmcfg.dom.elements import Element, subtree_cache
 
 
 class PowerManagement(Element):
+    __slots__ = ("suspend_to_mem", "suspend_to_disk")
+
     unique: bool = True
 
     def __init__(self, suspend_to_mem: bool = False,
@@ -14,12 +16,19 @@ class PowerManagement(Element):
         self.suspend_to_mem = suspend_to_mem
         self.suspend_to_disk = suspend_to_disk
 
-    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
-        pm_tag = etree.SubElement(root, "pm")
+    def _build(self) -> etree._Element:
+        pm_tag = etree.Element("pm")
         etree.SubElement(pm_tag, "suspend-to-mem",
                          enabled=bool_to_str(self.suspend_to_mem))
         etree.SubElement(pm_tag, "suspend-to-disk",
                          enabled=bool_to_str(self.suspend_to_disk))
+        return pm_tag
+
+    def attach_xml(self, root: etree._Element) -> Sequence[etree._Element]:
+        key = (type(self), bool_to_str(self.suspend_to_mem),
+               bool_to_str(self.suspend_to_disk))
+        pm_tag = subtree_cache.get(key, self._build)
+        root.append(pm_tag)
         return [pm_tag]
 
     def __repr__(self):
@@ -7,6 +7,8 @@ from libvirt_vmcfg.dom.elements import Element
 
 
 class DomainUUID(Element):
+    __slots__ = ("uuid",)
+
     unique: bool = True
 
     def __init__(self, uuid: Union[UUID, str]):
@@ -0,0 +1,616 @@
+from copy import deepcopy
+from dataclasses import fields
+from typing import (Any, Callable, Collection, Dict, FrozenSet, List,
+                    Optional, Tuple, Type, Union)
+
+from lxml import etree
+
+from libvirt_vmcfg.dom.elements import (
+    Element, Description, Emulator, FeatureBase, FeatureBooleanState,
+    FeatureEmpty, Features, APIC, GIC, SMM, IOAPIC, IOAPICDriver, HPT,
+    HPTResizing, CFPC, CFPCValue, SBBC, SBBCValue, IBS, IBSValue, KVM,
+    KVMFeatureSet, HyperV, HyperVFeatureSet, HyperVSpinlocks, HyperVStimer,
+    HyperV_VendorID, PAE, NonPAE, ACPI, HAP, Viridian, PVSpinlock, PMU,
+    VMCoreInfo, HTM, NestedHV, CCFAssist, KVMHidden, KVMHintDedicated,
+    KVMPollControl, HyperVRelaxed, HyperV_VAPIC, HyperV_VPIndex,
+    HyperVRuntime, HyperVReset, HyperVFrequencies, HyperVReenlightenment,
+    HyperVTLBFlush, HyperVIPI, HyperVEVMCS, Memory, Metadata, Name, Opaque,
+    OpaqueDevice, QemuOSConfig, PowerManagement, DomainUUID
+)
+from libvirt_vmcfg.dom.elements.devices import (
+    Device, QemuAgentChannel, TickPolicy, Offset, Basis, RTCTrack, TSCMode,
+    Adjustment, Timer, TimerRTC, TimerTSC, TimerPIT, TimerHPET, TimerKVMClock,
+    TimerHyperVClock, TimerARMV, Clock, ConsolePTY, CPU, DeviceAttachment,
+    TargetBus, Driver, DriverType, DriverCache, DriverIO, DriverErrorPolicy,
+    DriverDiscard, DriverDetectZeroes, DriverOptions, IOTuneOptions,
+    DiskSource, DiskSourceBlockPath, DiskSourceNetHTTP, DiskTarget, Tray,
+    Disk, BridgedInterface, VirtIOMemballoon, RNGModel, RNG,
+    VirtIOSerialController, QemuXHCIUSBController
+)
+from libvirt_vmcfg.dom.elements.devices.disk import DiskSourceVolume
+
+
+class _Unparseable(ValueError):
+    # Raised by handlers for XML they can't represent.
+    pass
+
+
+class _Parser:
+    # Per-document parsing state.
+    def __init__(self, root: etree._Element, ignore: Collection[str]):
+        self.root = root
+        self.ignore = frozenset(ignore)
+        self.consumed: Dict[etree._Element, None] = {}
+        self.taken: List[etree._Element] = []
+
+    def take(self, tag: str) -> Optional[etree._Element]:
+        """Consume a later sibling node needed by the current handler."""
+        node = self.root.find(tag)
+        if node is not None and node not in self.consumed:
+            self.taken.append(node)
+            return node
+
+        return None
+
+
+Handler = Callable[[_Parser, etree._Element], Element]
+
+
+########################
+# Value helpers        #
+########################
+
+def _require(node: etree._Element, attr: str) -> str:
+    value = node.get(attr)
+    if value is None:
+        raise _Unparseable("Missing attribute", node.tag, attr)
+
+    return value
+
+
+def _text(node: Optional[etree._Element]) -> str:
+    if node is None or node.text is None:
+        raise _Unparseable("Missing text", node)
+
+    return node.text
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def _bool(value: Optional[str]) -> Optional[bool]:
+    if value is None:
+        return None
+    elif value in ("yes", "on"):
+        return True
+    elif value in ("no", "off"):
+        return False
+
+    raise _Unparseable("Invalid boolean", value)
+
+
+def _state(node: etree._Element) -> bool:
+    return bool(_bool(_require(node, "state")))
+
+
+_memory_units: Dict[str, int] = {
+    "b": 1, "bytes": 1,
+    "KB": 1000, "k": 1024, "KiB": 1024,
+    "MB": 1000 ** 2, "M": 1024 ** 2, "MiB": 1024 ** 2,
+    "GB": 1000 ** 3, "G": 1024 ** 3, "GiB": 1024 ** 3,
+    "TB": 1000 ** 4, "T": 1024 ** 4, "TiB": 1024 ** 4,
+}
+
+
+def _kib(node: etree._Element) -> int:
+    # Memory elements are emitted without a unit, which is KiB.
+    unit = node.get("unit", "KiB")
+    if unit not in _memory_units:
+        raise _Unparseable("Unknown memory unit", unit)
+
+    value, rem = divmod(int(_text(node)) * _memory_units[unit], 1024)
+    if rem:
+        raise _Unparseable("Memory not a multiple of KiB", node.text, unit)
+
+    return value
+
+
+########################
+# Top level handlers   #
+########################
+
+def _parse_name(parser: _Parser, node: etree._Element) -> Element:
+    return Name(_text(node))
+
+
+def _parse_uuid(parser: _Parser, node: etree._Element) -> Element:
+    return DomainUUID(_text(node))
+
+
+def _parse_description(parser: _Parser, node: etree._Element) -> Element:
+    return Description(node.text or "")
+
+
+def _parse_metadata(parser: _Parser, node: etree._Element) -> Element:
+    return Metadata(deepcopy(node))
+
+
+def _parse_memory(parser: _Parser, node: etree._Element) -> Element:
+    current = parser.take("currentMemory")
+    memory = _kib(node)
+    return Memory(memory, memory if current is None else _kib(current))
+
+
+def _parse_vcpu(parser: _Parser, node: etree._Element) -> Element:
+    cpu = parser.take("cpu")
+    if cpu is None:
+        raise _Unparseable("vcpu without cpu")
+
+    return CPU(int(_text(node)), _require(cpu, "mode"))
+
+
+def _parse_os(parser: _Parser, node: etree._Element) -> Element:
+    type_tag = node.find("type")
+    if type_tag is None:
+        raise _Unparseable("os without type")
+
+    return QemuOSConfig(_require(type_tag, "arch"),
+                        _require(type_tag, "machine"),
+                        [_require(boot, "dev") for boot in node.iter("boot")])
+
+
+def _parse_pm(parser: _Parser, node: etree._Element) -> Element:
+    mem = node.find("suspend-to-mem")
+    disk = node.find("suspend-to-disk")
+    return PowerManagement(
+        bool(_bool(None if mem is None else mem.get("enabled"))),
+        bool(_bool(None if disk is None else disk.get("enabled"))),
+    )
+
+
+_timer_classes: Dict[str, Type[Timer]] = {
+    cls.type.value: cls for cls in (
+        TimerRTC, TimerTSC, TimerPIT, TimerHPET, TimerKVMClock,
+        TimerHyperVClock, TimerARMV
+    )
+}
+
+
+def _parse_timer(node: etree._Element) -> Timer:
+    cls = _timer_classes.get(_require(node, "name"))
+    if cls is None:
+        raise _Unparseable("Unknown timer", node.get("name"))
+
+    kwargs: Dict[str, Any] = {}
+    present = _bool(node.get("present"))
+    if present is not None:
+        kwargs["present"] = present
+
+    tickpolicy = node.get("tickpolicy")
+    if tickpolicy is not None:
+        kwargs["tickpolicy"] = TickPolicy(tickpolicy)
+
+    catchup = node.find("catchup")
+    if catchup is not None:
+        for attr in ("threshold", "slew", "limit"):
+            kwargs[attr] = _int(catchup.get(attr))
+
+    if cls is TimerRTC and node.get("track") is not None:
+        kwargs["track"] = RTCTrack(node.get("track"))
+    elif cls is TimerTSC:
+        if node.get("mode") is not None:
+            kwargs["mode"] = TSCMode(node.get("mode"))
+
+        kwargs["frequency"] = _int(node.get("frequency"))
+
+    return cls(**kwargs)
+
+
+def _parse_clock(parser: _Parser, node: etree._Element) -> Element:
+    offset = node.get("offset")
+    basis = node.get("basis")
+
+    adjustment: Union[int, None, Adjustment] = None
+    if node.get("adjustment") == Adjustment.RESET.value:
+        adjustment = Adjustment.RESET
+    else:
+        adjustment = _int(node.get("adjustment"))
+
+    return Clock(offset=None if offset is None else Offset(offset),
+                 timezone=node.get("timezone"),
+                 adjustment=adjustment,
+                 basis=None if basis is None else Basis(basis),
+                 timers=tuple(_parse_timer(t)
+                              for t in node.iter("timer")))
+
+
+def _parse_feature_set(node: etree._Element, cls: Type[Any],
+                       children: Dict[str, Callable[[etree._Element], Any]]
+                       ) -> Any:
+    # Unset everything first, HyperVFeatureSet defaults to enabling all.
+    values: Dict[str, Any] = {f.name: None for f in fields(cls)}
+    for child in node:
+        parse = children.get(child.tag)
+        if parse is None:
+            raise _Unparseable("Unknown feature", node.tag, child.tag)
+
+        values[child.tag.replace("-", "_")] = parse(child)
+
+    return cls(**values)
+
+
+def _state_feature(cls: Type[FeatureBooleanState]
+                   ) -> Callable[[etree._Element], FeatureBase]:
+    return lambda node: cls(_state(node))
+
+
+def _empty_feature(cls: Type[FeatureEmpty]
+                   ) -> Callable[[etree._Element], FeatureBase]:
+    return lambda node: cls()
+
+
+def _parse_gic(node: etree._Element) -> FeatureBase:
+    version = node.get("version")
+    return GIC(_state(node),
+               0 if version == "host" else _int(version))
+
+
+def _parse_smm(node: etree._Element) -> FeatureBase:
+    tseg = node.find("tseg")
+    if tseg is None:
+        return SMM(_state(node))
+
+    return SMM(_state(node), int(_text(tseg)), tseg.get("unit"))
+
+
+def _parse_hpt(node: etree._Element) -> FeatureBase:
+    maxpagesize = node.find("maxpagesize")
+    return HPT(HPTResizing(_require(node, "resizing")),
+               None if maxpagesize is None else int(_text(maxpagesize)),
+               None if maxpagesize is None else maxpagesize.get("unit"))
+
+
+_kvm_features: Dict[str, Callable[[etree._Element], Any]] = {
+    cls.name: _state_feature(cls)
+    for cls in (KVMHidden, KVMHintDedicated, KVMPollControl)
+}
+
+_hyperv_features: Dict[str, Callable[[etree._Element], Any]] = {
+    cls.name: _state_feature(cls)
+    for cls in (HyperVRelaxed, HyperV_VAPIC, HyperV_VPIndex, HyperVRuntime,
+                HyperVReset, HyperVFrequencies, HyperVReenlightenment,
+                HyperVTLBFlush, HyperVIPI, HyperVEVMCS)
+}
+_hyperv_features.update({
+    "spinlocks": lambda node: HyperVSpinlocks(_state(node),
+                                              _int(node.get("retries"))),
+    "stimer": lambda node: HyperVStimer(
+        _state(node),
+        None if node.find("direct") is None else _state(node.find("direct"))
+    ),
+    "vendor_id": lambda node: HyperV_VendorID(_state(node),
+                                              node.get("value")),
+})
+
+_features: Dict[str, Callable[[etree._Element], FeatureBase]] = {
+    cls.name: _empty_feature(cls)
+    for cls in (PAE, NonPAE, ACPI, Viridian, VMCoreInfo)
+}
+_features.update({
+    cls.name: _state_feature(cls)
+    for cls in (HAP, PVSpinlock, PMU, HTM, NestedHV, CCFAssist)
+})
+_features.update({
+    APIC.name: lambda node: APIC(_bool(node.get("eoi"))),
+    GIC.name: _parse_gic,
+    SMM.name: _parse_smm,
+    IOAPIC.name: lambda node: IOAPIC(IOAPICDriver(_require(node, "driver"))),
+    HPT.name: _parse_hpt,
+    CFPC.name: lambda node: CFPC(CFPCValue(_require(node, "value"))),
+    SBBC.name: lambda node: SBBC(SBBCValue(_require(node, "value"))),
+    IBS.name: lambda node: IBS(IBSValue(_require(node, "value"))),
+    KVM.name: lambda node: KVM(
+        _parse_feature_set(node, KVMFeatureSet, _kvm_features)
+    ),
+    HyperV.name: lambda node: HyperV(
+        _parse_feature_set(node, HyperVFeatureSet, _hyperv_features)
+    ),
+})
+
+
+def _parse_features(parser: _Parser, node: etree._Element) -> Element:
+    features = []
+    for child in node:
+        parse = _features.get(child.tag)
+        if parse is None:
+            raise _Unparseable("Unknown feature", child.tag)
+
+        features.append(parse(child))
+
+    return Features(tuple(features))
+
+
+########################
+# Device handlers      #
+########################
+
+def _parse_emulator(parser: _Parser, node: etree._Element) -> Element:
+    return Emulator(_text(node))
+
+
+def _parse_disk_source(disk_type: Optional[str],
+                       source: etree._Element) -> DiskSource:
+    if disk_type == "block":
+        return DiskSourceBlockPath(_require(source, "dev"))
+    elif disk_type == "volume":
+        return DiskSourceVolume(_require(source, "pool"),
+                                _require(source, "volume"))
+    elif disk_type == "network":
+        protocol = _require(source, "protocol")
+        host = source.find("host")
+        if host is None:
+            raise _Unparseable("Network disk without host")
+
+        netloc = _require(host, "name")
+        if host.get("port") is not None:
+            netloc += f":{host.get('port')}"
+
+        url = f"{protocol}://{netloc}/{source.get('name', '')}"
+        if host.get("query") is not None:
+            url += f"?{host.get('query')}"
+
+        readahead = source.find("readahead")
+        timeout = source.find("timeout")
+        ssl = source.find("ssl")
+        return DiskSourceNetHTTP(
+            url,
+            readahead=0 if readahead is None else int(readahead.get("size")),
+            timeout=0 if timeout is None else int(timeout.get("seconds")),
+            ssl_verify=None if ssl is None else _bool(ssl.get("verify")),
+        )
+
+    raise _Unparseable("Unknown disk type", disk_type)
+
+
+def _parse_driver(driver: etree._Element) -> DriverOptions:
+    enums = {
+        "type": DriverType, "cache": DriverCache, "io": DriverIO,
+        "error_policy": DriverErrorPolicy, "rerror_policy": DriverErrorPolicy,
+        "discard": DriverDiscard, "detect_zeroes": DriverDetectZeroes,
+    }
+    kwargs: Dict[str, Any] = {}
+    for attr, value in driver.items():
+        if attr == "name":
+            continue
+        elif attr in enums:
+            kwargs[attr] = enums[attr](value)
+        elif attr in ("ioeventfd", "event_idx", "copy_on_read"):
+            kwargs[attr] = _bool(value)
+        elif attr == "queues":
+            kwargs[attr] = int(value)
+        else:
+            raise _Unparseable("Unknown driver option", attr)
+
+    return DriverOptions(Driver(_require(driver, "name")), **kwargs)
+
+
+_iotune_fields: FrozenSet[str] = frozenset(f.name
+                                           for f in fields(IOTuneOptions))
+
+
+def _parse_iotune(iotune: etree._Element) -> IOTuneOptions:
+    kwargs: Dict[str, Any] = {}
+    for child in iotune:
+        if child.tag not in _iotune_fields:
+            raise _Unparseable("Unknown iotune option", child.tag)
+
+        if child.tag == "group_name":
+            kwargs[child.tag] = _text(child)
+        else:
+            kwargs[child.tag] = int(_text(child))
+
+    return IOTuneOptions(**kwargs)
+
+
+def _parse_disk(parser: _Parser, node: etree._Element) -> Element:
+    source = node.find("source")
+    target = node.find("target")
+    driver = node.find("driver")
+    if source is None or target is None or driver is None:
+        raise _Unparseable("Incomplete disk")
+
+    bus = target.get("bus")
+    tray = target.get("tray")
+    iotune = node.find("iotune")
+    return Disk(
+        _parse_disk_source(node.get("type"), source),
+        DiskTarget(DeviceAttachment(node.get("device", "disk")),
+                   _require(target, "dev"),
+                   bus=None if bus is None else TargetBus(bus),
+                   tray=None if tray is None else Tray(tray),
+                   removable=_bool(target.get("removable"))),
+        _parse_driver(driver),
+        node.find("readonly") is not None,
+        None if iotune is None else _parse_iotune(iotune),
+    )
+
+
+def _parse_interface(parser: _Parser, node: etree._Element) -> Element:
+    if node.get("type") != "bridge":
+        raise _Unparseable("Unsupported interface type", node.get("type"))
+
+    source = node.find("source")
+    mac = node.find("mac")
+    model = node.find("model")
+    if source is None or mac is None or model is None:
+        raise _Unparseable("Incomplete interface")
+
+    return BridgedInterface(_require(source, "bridge"),
+                            _require(mac, "address"),
+                            _require(model, "type"))
+
+
+def _parse_channel(parser: _Parser, node: etree._Element) -> Element:
+    # The verification step makes sure it's really the agent channel.
+    return QemuAgentChannel()
+
+
+def _parse_console(parser: _Parser, node: etree._Element) -> Element:
+    return ConsolePTY()
+
+
+def _parse_memballoon(parser: _Parser, node: etree._Element) -> Element:
+    return VirtIOMemballoon()
+
+
+def _parse_rng(parser: _Parser, node: etree._Element) -> Element:
+    backend = node.find("backend")
+    return RNG(RNGModel(_require(node, "model")), _text(backend))
+
+
+def _parse_controller(parser: _Parser, node: etree._Element) -> Element:
+    controller_type = node.get("type")
+    if controller_type == "usb":
+        return QemuXHCIUSBController(int(_require(node, "ports")))
+    elif controller_type == "virtio-serial":
+        return VirtIOSerialController()
+
+    raise _Unparseable("Unknown controller type", controller_type)
+
+
+_domain_handlers: Dict[str, Handler] = {
+    "name": _parse_name,
+    "uuid": _parse_uuid,
+    "description": _parse_description,
+    "metadata": _parse_metadata,
+    "memory": _parse_memory,
+    "vcpu": _parse_vcpu,
+    "os": _parse_os,
+    "pm": _parse_pm,
+    "clock": _parse_clock,
+    "features": _parse_features,
+}
+
+_device_handlers: Dict[str, Handler] = {
+    "emulator": _parse_emulator,
+    "disk": _parse_disk,
+    "interface": _parse_interface,
+    "channel": _parse_channel,
+    "console": _parse_console,
+    "memballoon": _parse_memballoon,
+    "rng": _parse_rng,
+    "controller": _parse_controller,
+}
+
+
+########################
+# Verification         #
+########################
+
+# Attributes whose value is what you get when they're left out.
+_default_attrs: Dict[Tuple[str, str], str] = {
+    ("memory", "unit"): "KiB",
+    ("currentMemory", "unit"): "KiB",
+    ("vcpu", "placement"): "static",
+}
+
+Canonical = Tuple[Any, ...]
+
+
+def _canonical(node: etree._Element, ignore: FrozenSet[str],
+               top: bool = False) -> Canonical:
+    # A comparable form of a node, ignoring attribute order, formatting
+    # whitespace, and the order of differently named siblings (which libvirt
+    # doesn't care about). The order of same-named siblings is kept.
+    if not isinstance(node.tag, str):
+        # Comments and processing instructions
+        return ("#special", node.text)
+
+    attrs = {k: v for k, v in node.items()
+             if _default_attrs.get((node.tag, k)) != v}
+    children = [c for c in node if c.tag not in ignore]
+    text = node.text or ""
+    if children:
+        text = text.strip()
+
+    if top and node.tag in ("memory", "currentMemory"):
+        attrs.pop("unit", None)
+        try:
+            text = str(_kib(node))
+        except ValueError:
+            pass
+
+    groups: Dict[str, List[Canonical]] = {}
+    for child in children:
+        key = child.tag if isinstance(child.tag, str) else "#special"
+        groups.setdefault(key, []).append(_canonical(child, ignore))
+
+    return (node.tag, frozenset(attrs.items()), text,
+            tuple(sorted((k, tuple(v)) for k, v in groups.items())))
+
+
+def _verify(parser: _Parser, element: Element,
+            sources: List[etree._Element]) -> bool:
+    # Make sure the element gives back what it was parsed from.
+    scratch = etree.Element("domain")
+    try:
+        element.attach_xml(scratch)
+    except Exception:
+        return False
+
+    produced = list(scratch)
+    if isinstance(element, Device):
+        produced = list(produced[0]) if produced else []
+
+    def key(nodes: List[etree._Element]) -> List[Canonical]:
+        return sorted((_canonical(n, parser.ignore, True) for n in nodes),
+                      key=repr)
+
+    return key(produced) == key(sources)
+
+
+def _handle(parser: _Parser, handlers: Dict[str, Handler],
+            node: etree._Element, opaque: Type[Opaque]) -> Element:
+    parser.taken = []
+    handler = handlers.get(node.tag) if isinstance(node.tag, str) else None
+    if handler is not None:
+        try:
+            element = handler(parser, node)
+        except (ValueError, TypeError):
+            element = None
+
+        if (element is not None
+                and _verify(parser, element, [node] + parser.taken)):
+            for taken in parser.taken:
+                parser.consumed[taken] = None
+
+            return element
+
+    return opaque(node)
+
+
+def parse_elements(root: etree._Element, *,
+                   ignore: Collection[str] = ()) -> List[Element]:
+    """Parse a libvirt domain tree into a list of elements.
+
+    Nodes are mapped to elements by tag. Anything which can't be represented
+    exactly by an element is kept as an Opaque (or OpaqueDevice) element.
+    Child tags named in ignore (such as "address") are dropped wherever they
+    would otherwise stop a node being parsed into an element.
+    """
+    parser = _Parser(root, ignore)
+    elements: List[Element] = []
+    for node in root:
+        if node in parser.consumed:
+            continue
+
+        parser.consumed[node] = None
+        if node.tag == "devices":
+            for device in node:
+                elements.append(_handle(parser, _device_handlers, device,
+                                        OpaqueDevice))
+        else:
+            elements.append(_handle(parser, _domain_handlers, node, Opaque))
+
+    return elements
@@ -1,11 +1,13 @@
 from collections.abc import Sequence
-from typing import List, Optional, Union
-from uuid import UUID, uuid4
+from typing import List, Optional, Union, cast
+from uuid import UUID, uuid4, uuid5
 from warnings import warn
 
 from lxml import etree
 
-from libvirt_vmcfg.dom import Domain, Element
+from libvirt_vmcfg.dom import Domain, DomainTemplate, Element
+from libvirt_vmcfg.dom.domain import ElementData
+from libvirt_vmcfg.dom.compiled import CompiledDomain, Slot, SlotType
 
 from libvirt_vmcfg.dom.elements import Emulator
 from libvirt_vmcfg.dom.elements import Features, ACPI, APIC
@@ -24,11 +26,29 @@ from libvirt_vmcfg.dom.elements.devices import RNG
 from libvirt_vmcfg.dom.elements.devices import QemuXHCIUSBController
 
 
+# Elements that don't depend on any arguments, shared by every domain made
+# here rather than made again each time. As with Domain.clone, this relies on
+# elements being left alone once attached.
+_emulator = Emulator("/usr/bin/qemu-system-x86_64")
+_power_management = PowerManagement()
+_agent_channel = QemuAgentChannel()
+_clock = Clock()
+_console = ConsolePTY()
+_memballoon = VirtIOMemballoon()
+_rng = RNG()
+_usb_controller = QemuXHCIUSBController()
+_x86_features = Features((ACPI(), APIC()))
+
+
 def kvm_default_hardware(**kwargs) -> List[Element]:
     """
     Return a list containing the default elements of a typical libvirt VM.
 
     Two major things not included: interfaces or disks.
+
+    Elements that don't depend on the arguments (such as the clock) are the
+    same objects in every list returned, so replace them rather than
+    changing them.
     """
     try:
         # Mandatory args
@@ -42,15 +62,22 @@ def kvm_default_hardware(**kwargs) -> List[Element]:
     arch: str = kwargs.get("arch", "x86_64")
     boot_dev_order: Optional[Sequence[str]] = kwargs.get("boot_dev_order",
                                                          None)
-    emulator_path: str = kwargs.get("emulator_path",
-                                    "/usr/bin/qemu-system-x86_64")
+    emulator_path: Optional[str] = kwargs.get("emulator_path", None)
     current_memory: int = kwargs.get("current_memory", memory)
-    uuid: Union[str, UUID] = str(kwargs.get("uuid", uuid4()))
+    namespace: Optional[Union[str, UUID]] = kwargs.get("namespace", None)
+    uuid: Union[str, UUID]
+    if "uuid" in kwargs:
+        uuid = str(kwargs["uuid"])
+    elif namespace is not None:
+        # Reproducible: the same name always gets the same UUID.
+        uuid = str(uuid5(UUID(str(namespace)), name))
+    else:
+        uuid = str(uuid4())
     metadata: Optional[etree._Element] = kwargs.get("metadata", None)
 
     features: Union[Features, None]
     if arch in ("x86", "x86_64"):
-        features = Features((ACPI(), APIC()))
+        features = _x86_features
     else:
         features = None
         warn(f"Unknown architecture {arch}, features block may be "
@@ -58,19 +85,19 @@ def kvm_default_hardware(**kwargs) -> List[Element]:
 
     # Begin construction
     devtree = [
-        Emulator(emulator_path),
+        (_emulator if emulator_path is None else Emulator(emulator_path)),
         Memory(memory, current_memory),
         Name(name),
         QemuOSConfig(arch, "q35", boot_dev_order),
-        PowerManagement(),
+        _power_management,
         DomainUUID(uuid),
-        QemuAgentChannel(),
-        Clock(),
-        ConsolePTY(),
+        _agent_channel,
+        _clock,
+        _console,
         CPU(vcpus),
-        VirtIOMemballoon(),
-        RNG(),
-        QemuXHCIUSBController(),
+        _memballoon,
+        _rng,
+        _usb_controller,
     ]
 
     if features is not None:
@@ -80,3 +107,63 @@ def kvm_default_hardware(**kwargs) -> List[Element]:
         devtree.append(Metadata(metadata))
 
     return devtree
+
+
+def kvm_default_template(**kwargs) -> DomainTemplate:
+    """
+    Return a DomainTemplate of the default elements of a typical libvirt VM.
+
+    This takes the same arguments as kvm_default_hardware. Unless a uuid is
+    given, each instance gets its own UUID: derived from the instance's name
+    if a namespace is given, otherwise random.
+    """
+    per_instance = []
+    derived = []
+    namespace = kwargs.get("namespace")
+    if "uuid" not in kwargs and namespace is not None:
+        namespace = UUID(str(namespace))
+
+        def derive_uuid(domain: Domain) -> DomainUUID:
+            # From the instance's own name, not the template's.
+            name = cast(Name, cast(ElementData, domain.find(Name)).element)
+            return DomainUUID(uuid5(namespace, str(name.name)))
+
+        derived.append(derive_uuid)
+    elif "uuid" not in kwargs:
+        per_instance.append(lambda: DomainUUID(uuid4()))
+
+    return DomainTemplate(kvm_default_hardware(**kwargs),
+                          per_instance=per_instance, derived=derived)
+
+
+def kvm_default_compiled(extra: Sequence[Element] = (),
+                         extra_slots: Sequence[Slot] = (), *,
+                         pretty_print: bool = False,
+                         **kwargs) -> CompiledDomain:
+    """
+    Return kvm_default_hardware compiled into a CompiledDomain.
+
+    This takes the same arguments as kvm_default_hardware. Any of name, uuid,
+    memory and vcpus not given become slots of the same name, except that the
+    uuid is derived when both name and namespace are given. Elements in
+    extra (such as disks and interfaces) are attached after the defaults, and
+    any slots they use must be passed in extra_slots.
+    """
+    given = set(kwargs)
+    if "name" in given and "namespace" in given:
+        given.add("uuid")
+
+    slots = [Slot(name, type) for name, type in (
+        ("name", SlotType.TEXT),
+        ("uuid", SlotType.UUID),
+        ("memory", SlotType.INT),
+        ("vcpus", SlotType.INT),
+    ) if name not in given]
+    for slot in slots:
+        kwargs[slot.name] = slot
+
+    elements = kvm_default_hardware(**kwargs)
+    elements.extend(extra)
+    return CompiledDomain(Domain(elements=elements),
+                          slots + list(extra_slots),
+                          pretty_print=pretty_print)
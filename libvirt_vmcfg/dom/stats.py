@@ -0,0 +1,132 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from copy import deepcopy
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional, Type
+
+from libvirt_vmcfg.dom.elements import Element
+
+
+@dataclass
+class ElementStats:
+    """Statistics for one Element subclass.
+
+    attach_calls, attach_time: number of attach_xml calls, and total seconds
+    nodes: number of nodes in the tags returned by attach_xml
+    detach_calls, detach_time: number of detach_xml calls, and total seconds
+    """
+    attach_calls: int = 0
+    attach_time: float = 0.0
+    nodes: int = 0
+    detach_calls: int = 0
+    detach_time: float = 0.0
+
+    def merge(self, other: "ElementStats") -> None:
+        self.attach_calls += other.attach_calls
+        self.attach_time += other.attach_time
+        self.nodes += other.nodes
+        self.detach_calls += other.detach_calls
+        self.detach_time += other.detach_time
+
+
+@dataclass
+class RenderStats:
+    """Statistics recorded while instrumentation was enabled.
+
+    elements: per Element subclass statistics
+    emit_calls, emit_time: number of emit_xml and write_to calls, and total
+                           seconds spent serializing
+    """
+    elements: Dict[Type[Element], ElementStats] = field(default_factory=dict)
+    emit_calls: int = 0
+    emit_time: float = 0.0
+
+    def element(self, cls: Type[Element]) -> ElementStats:
+        """Return the statistics for an Element subclass."""
+        stats = self.elements.get(cls)
+        if stats is None:
+            stats = self.elements[cls] = ElementStats()
+
+        return stats
+
+    def record_attach(self, cls: Type[Element], elapsed: float,
+                      nodes: int) -> None:
+        stats = self.element(cls)
+        stats.attach_calls += 1
+        stats.attach_time += elapsed
+        stats.nodes += nodes
+
+    def record_detach(self, cls: Type[Element], elapsed: float) -> None:
+        stats = self.element(cls)
+        stats.detach_calls += 1
+        stats.detach_time += elapsed
+
+    def record_emit(self, elapsed: float) -> None:
+        self.emit_calls += 1
+        self.emit_time += elapsed
+
+    def merge(self, other: "RenderStats") -> None:
+        """Add another set of statistics to this one."""
+        for cls, stats in other.elements.items():
+            self.element(cls).merge(stats)
+
+        self.emit_calls += other.emit_calls
+        self.emit_time += other.emit_time
+
+    def copy(self) -> "RenderStats":
+        return deepcopy(self)
+
+    def as_metrics(self, prefix: str = "libvirt_vmcfg"
+                   ) -> Dict[str, float]:
+        """Flatten the statistics into metric names and values.
+
+        Names look like "<prefix>.element.Disk.attach_time", or
+        "<prefix>.emit_time", which suits most metrics systems.
+        """
+        metrics: Dict[str, float] = {
+            f"{prefix}.emit_calls": self.emit_calls,
+            f"{prefix}.emit_time": self.emit_time,
+        }
+        for cls, stats in self.elements.items():
+            base = f"{prefix}.element.{cls.__name__}"
+            metrics[f"{base}.attach_calls"] = stats.attach_calls
+            metrics[f"{base}.attach_time"] = stats.attach_time
+            metrics[f"{base}.nodes"] = stats.nodes
+            metrics[f"{base}.detach_calls"] = stats.detach_calls
+            metrics[f"{base}.detach_time"] = stats.detach_time
+
+        return metrics
+
+
+_current_stats: ContextVar[Optional[RenderStats]] = \
+    ContextVar("libvirt_vmcfg_stats", default=None)
+
+
+def current_stats() -> Optional[RenderStats]:
+    """Return the statistics being recorded to, if instrumentation is on."""
+    return _current_stats.get()
+
+
+@contextmanager
+def instrument(hook: Optional[Callable[[RenderStats], None]] = None, *,
+               merge: bool = True) -> Iterator[RenderStats]:
+    """Record statistics for everything done in the block.
+
+    The statistics are yielded, and passed to hook (if given) when the block
+    exits, for pushing to a metrics system. When blocks are nested, the inner
+    block's statistics are added to the outer block's on exit, unless merge
+    is false. RenderStats aren't thread-safe, so a block in another thread
+    should not merge, and leave that to the thread owning the outer block.
+    """
+    outer = _current_stats.get()
+    stats = RenderStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        if outer is not None and merge:
+            outer.merge(stats)
+
+        if hook is not None:
+            hook(stats)
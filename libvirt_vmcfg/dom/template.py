@@ -0,0 +1,75 @@
+from typing import Callable, Sequence, Set, Type
+
+from libvirt_vmcfg.dom.domain import Domain, DomainType
+from libvirt_vmcfg.dom.elements import Element
+
+
+class DomainTemplate:
+    """A prebuilt domain to stamp out near-identical domains from.
+
+    The shared elements are attached once. Each instance is a clone of the
+    prebuilt tree, with per-domain elements applied on top.
+    """
+
+    def __init__(self, elements: Sequence[Element],
+                 type: DomainType = DomainType.KVM, *,
+                 per_instance: Sequence[Callable[[], Element]] = (),
+                 derived: Sequence[Callable[[Domain], Element]] = ()):
+        """
+        Create a domain template.
+
+        Parameters:
+          elements: elements shared by every instance
+          type: type of the domains
+          per_instance: factories for elements that must differ between
+                        instances (such as UUIDs), called for each instance
+                        unless overridden
+          derived: factories for elements computed from the finished
+                   instance (such as a UUID derived from its name), called
+                   with the domain after the instance's elements are
+                   applied, unless overridden
+        """
+        self.per_instance = per_instance
+        self.derived = derived
+
+        # Private, so the layout can't go stale.
+        self._prototype = Domain(type, elements)
+        self._layout = self._prototype._layout()
+
+    def _apply(self, domain: Domain, element: Element) -> None:
+        existing = domain.find(type(element)) if element.unique else None
+        if existing is not None:
+            domain.replace_element(existing, element)
+        else:
+            domain.attach_element(element)
+
+    def instantiate(self, elements: Sequence[Element] = ()) -> Domain:
+        """
+        Stamp out a new domain from the template.
+
+        Unique elements (such as Name or Memory) replace the template's
+        element of the same type, in place. Others (such as disks and
+        interfaces) are attached in addition to the template's.
+        """
+        domain = self._prototype._clone(self._layout)
+
+        overridden: Set[Type[Element]] = {type(e) for e in elements}
+        for factory in self.per_instance:
+            element = factory()
+            if type(element) not in overridden:
+                self._apply(domain, element)
+
+        for element in elements:
+            self._apply(domain, element)
+
+        for derive in self.derived:
+            element = derive(domain)
+            if type(element) not in overridden:
+                self._apply(domain, element)
+
+        return domain
+
+    def __repr__(self):
+        return (f"DomainTemplate(prototype={self._prototype!r}, "
+                f"per_instance={self.per_instance!r}, "
+                f"derived={self.derived!r})")
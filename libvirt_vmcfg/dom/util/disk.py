@@ -1,7 +1,31 @@
+"""Disk utilities for libvirt_vmcfg."""
+
+import re
 from string import ascii_lowercase
-from typing import Dict, Generator
+from typing import (TYPE_CHECKING, Dict, Generator, Iterable, Optional, Set,
+                    Tuple)
 
-"""Disk utilities for libvirt_vmcfg."""
+from libvirt_vmcfg.dom.elements.devices.disk import (DeviceAttachment,
+                                                     TargetBus)
+
+if TYPE_CHECKING:
+    from libvirt_vmcfg.dom.domain import Domain
+
+
+# The prefixes libvirt itself understands in letter-style names.
+_disk_name = re.compile(r"(xvd|ubd|fd|hd|vd|sd)([a-z]+)")
+
+
+# Target device name prefixes by bus. Without a bus, libvirt guesses it from
+# the name, so vd gets virtio.
+_bus_prefixes: Dict[Optional[TargetBus], str] = {
+    None: "vd",
+    TargetBus.VIRTIO: "vd",
+    TargetBus.SCSI: "sd",
+    TargetBus.SATA: "sd",
+    TargetBus.USB: "sd",
+    TargetBus.IDE: "hd",
+}
 
 
 def base26(value: int) -> str:
@@ -18,6 +42,31 @@ def base26(value: int) -> str:
     return "".join(reversed(string))
 
 
+def from_base26(string: str) -> int:
+    """Convert a base26 string back into a value, the inverse of base26."""
+    if not string or not string.isalpha() or not string.islower():
+        raise ValueError("Not a base26 string", string)
+
+    value = -1
+    for char in string:
+        value = (value + 1) * 26 + ord(char) - ord("a")
+
+    return value
+
+
+def parse_disk_name(name: str) -> Tuple[str, int]:
+    """Split a disk name made by disk_letter into its prefix and number.
+
+    For example, "vdaa" gives ("vd", 26). Raises ValueError for names that
+    libvirt wouldn't recognise, such as "sr0".
+    """
+    match = _disk_name.fullmatch(name)
+    if match is None:
+        raise ValueError("Not a disk name", name)
+
+    return match.group(1), from_base26(match.group(2))
+
+
 def disk_letter(prefix: str, start: int = 0) -> Generator[str, None, None]:
     """A generator that generates disk names derived from letters.
 
@@ -36,3 +85,128 @@ def disk_number(prefix: str, start: int = 0) -> Generator[str, None, None]:
     while True:
         yield f"{prefix}{start}"
         start += 1
+
+
+def target_prefix(device: DeviceAttachment,
+                  bus: Optional[TargetBus]) -> str:
+    """Return the target device name prefix for a disk, such as "vd".
+
+    Names are made from these with disk_letter. Raises ValueError for buses
+    with no conventional name.
+    """
+    if device == DeviceAttachment.FLOPPY:
+        return "fd"
+
+    try:
+        return _bus_prefixes[bus]
+    except KeyError:
+        raise ValueError("No target device names for bus", bus) from None
+
+
+# Numbers from here on aren't kept in the bitmaps, so a single huge name
+# (such as "vdzzzzzzz") can't make them huge too. That's "vdamk", far beyond
+# any real domain.
+_BITMAP_SIZE = 1024
+
+
+class DiskNameAllocator:
+    """Keeps track of the target device names in use, by prefix.
+
+    Names are handed out lowest first, like disk_letter does, so released
+    names get reused. Each prefix is a bitmap (an int) of the numbers in
+    use, so allocating and releasing don't depend on how many names are in
+    use, for any sensible number of disks. The bitmaps only cover the first
+    _BITMAP_SIZE numbers; names beyond them, and names that parse_disk_name
+    can't handle, may still be claimed, they're just kept in a set.
+    """
+    __slots__ = ("_bitmaps", "_other")
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._bitmaps: Dict[str, int] = {}
+        self._other: Set[str] = set()
+        for name in names:
+            self.claim(name)
+
+    @classmethod
+    def from_domain(cls, domain: "Domain") -> "DiskNameAllocator":
+        """Create an allocator with the names used by a domain's disks."""
+        return cls(domain.disk_targets())
+
+    @staticmethod
+    def _parse(name: str) -> Optional[Tuple[str, int]]:
+        # The prefix and number of names kept in the bitmaps, None for the
+        # others.
+        try:
+            prefix, number = parse_disk_name(name)
+        except ValueError:
+            return None
+
+        if number >= _BITMAP_SIZE:
+            return None
+
+        return prefix, number
+
+    def allocate(self, prefix: str) -> str:
+        """Claim and return the lowest free name with the given prefix."""
+        bits = self._bitmaps.get(prefix, 0)
+        # The lowest clear bit: adding 1 carries into it.
+        free = (~bits & (bits + 1)).bit_length() - 1
+        if free < _BITMAP_SIZE:
+            self._bitmaps[prefix] = bits | (1 << free)
+            return f"{prefix}{base26(free)}"
+
+        # All of the bitmap is in use, which no real domain gets to.
+        for name in disk_letter(prefix, _BITMAP_SIZE):
+            if name not in self._other:
+                self._other.add(name)
+                return name
+
+        raise AssertionError("disk_letter never ends")
+
+    def claim(self, name: str) -> None:
+        """Mark a name as in use. Raises ValueError if it already is."""
+        parsed = self._parse(name)
+        if parsed is None:
+            if name in self._other:
+                raise ValueError("Disk name already in use", name)
+
+            self._other.add(name)
+            return
+
+        prefix, number = parsed
+        bits = self._bitmaps.get(prefix, 0)
+        if bits >> number & 1:
+            raise ValueError("Disk name already in use", name)
+
+        self._bitmaps[prefix] = bits | (1 << number)
+
+    def release(self, name: str) -> None:
+        """Mark a name as free again. Raises ValueError if it isn't in use."""
+        if name not in self:
+            raise ValueError("Disk name not in use", name)
+
+        parsed = self._parse(name)
+        if parsed is None:
+            self._other.remove(name)
+            return
+
+        prefix, number = parsed
+        self._bitmaps[prefix] &= ~(1 << number)
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+
+        parsed = self._parse(name)
+        if parsed is None:
+            return name in self._other
+
+        prefix, number = parsed
+        return bool(self._bitmaps.get(prefix, 0) >> number & 1)
+
+    def __len__(self) -> int:
+        return (sum(bin(bits).count("1") for bits in self._bitmaps.values())
+                + len(self._other))
+
+    def __repr__(self):
+        return f"DiskNameAllocator({len(self)} names in use)"
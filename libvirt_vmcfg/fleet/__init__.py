@@ -0,0 +1,217 @@
+"""Render many domains from a fleet spec, using all cores."""
+
+import json
+import os
+from enum import Enum
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from itertools import islice
+from typing import (Any, Dict, Iterable, Iterator, List, Mapping, Optional,
+                    Tuple, Type)
+
+from lxml import etree
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Element
+from libvirt_vmcfg.dom.elements.devices import (
+    BridgedInterface, DeviceAttachment, Disk, DiskSource, DiskSourceBlockPath,
+    DiskSourceNetHTTP, DiskTarget, Driver, DriverCache, DriverDiscard,
+    DriverIO, DriverOptions, DriverType, TargetBus, derive_mac
+)
+from libvirt_vmcfg.dom.elements.devices.disk import DiskSourceVolume
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+
+
+def _disk_source(spec: Mapping[str, Any]) -> DiskSource:
+    if "path" in spec:
+        return DiskSourceBlockPath(spec["path"])
+    elif "url" in spec:
+        return DiskSourceNetHTTP(spec["url"])
+    elif "pool" in spec:
+        return DiskSourceVolume(spec["pool"], spec["volume"])
+
+    raise ValueError("Disk needs a path, url, or pool and volume", spec)
+
+
+def _disk(spec: Mapping[str, Any]) -> Disk:
+    bus = spec.get("bus")
+    target = DiskTarget(DeviceAttachment(spec.get("device", "disk")),
+                        spec["target"],
+                        bus=None if bus is None else TargetBus(bus))
+
+    def option(key: str, enum: Type[Enum]) -> Any:
+        value = spec.get(key)
+        return None if value is None else enum(value)
+
+    driver_opts = DriverOptions(Driver(spec.get("driver", "qemu")),
+                                type=option("format", DriverType),
+                                cache=option("cache", DriverCache),
+                                io=option("io", DriverIO),
+                                discard=option("discard", DriverDiscard))
+    return Disk(_disk_source(spec), target, driver_opts,
+                readonly=spec.get("readonly", False))
+
+
+def _interface(spec: Mapping[str, Any], domain: Mapping[str, Any],
+               index: int) -> BridgedInterface:
+    mac = spec.get("mac")
+    if mac is None and domain.get("namespace") is not None:
+        mac = derive_mac(domain["namespace"], domain["name"], index)
+
+    return BridgedInterface(spec["bridge"], mac=mac,
+                            model=spec.get("model", "virtio"))
+
+
+def spec_elements(spec: Mapping[str, Any]) -> List[Element]:
+    """Return the elements for one domain of a fleet spec.
+
+    A spec holds kvm_default_hardware keyword arguments (with metadata as
+    an XML string), plus optional lists of disks and interfaces:
+
+    disks: objects with target and one of path, url, or pool and volume;
+           optionally device, bus, driver, format, cache, io, discard and
+           readonly, using the values libvirt uses
+    interfaces: objects with bridge, and optionally mac and model
+
+    If the spec has a namespace (a UUID), the domain's UUID and interface
+    MACs not given are derived from it and the name rather than random, so
+    rendering the spec again gives the same XML.
+    """
+    kwargs: Dict[str, Any] = {k: v for k, v in spec.items()
+                              if k not in ("disks", "interfaces")}
+    if isinstance(kwargs.get("metadata"), str):
+        kwargs["metadata"] = etree.fromstring(kwargs["metadata"])
+
+    elements = kvm_default_hardware(**kwargs)
+    elements.extend(_disk(d) for d in spec.get("disks", ()))
+    elements.extend(_interface(i, spec, n)
+                    for n, i in enumerate(spec.get("interfaces", ())))
+    return elements
+
+
+@dataclass
+class RenderResult:
+    """The outcome of rendering one line of a fleet spec.
+
+    line: line number in the spec, starting at 1
+    name: name of the domain, if the spec got that far
+    xml: the rendered XML as UTF-8, unless it was written to a file
+    path: the file the XML was written to, if any
+    error: why rendering failed, if it did
+    """
+    line: int
+    name: Optional[str] = None
+    xml: Optional[bytes] = None
+    path: Optional[str] = None
+    error: Optional[str] = None
+
+
+def render_line(numbered: Tuple[int, str], *, pretty_print: bool = False,
+                directory: Optional[str] = None,
+                validate: bool = False) -> RenderResult:
+    """Render one line of a fleet spec.
+
+    If directory is given, the XML is written to <name>.xml in it instead of
+    being returned. If validate is set, the domain is checked against
+    libvirt's schema first. Errors are returned rather than raised, so one
+    bad spec doesn't stop the rest of the fleet.
+    """
+    line, text = numbered
+    result = RenderResult(line)
+    try:
+        spec = json.loads(text)
+        if not isinstance(spec, dict):
+            raise ValueError("Spec must be a JSON object")
+
+        result.name = spec.get("name")
+        domain = Domain(elements=spec_elements(spec))
+        if validate:
+            # Deferred, so the schema is only looked for when it's wanted.
+            from libvirt_vmcfg.validate import validation_errors
+
+            errors = validation_errors(domain)
+            if errors:
+                raise ValueError("; ".join(errors))
+
+        if directory is None:
+            xml = domain.emit_xml(pretty_print=pretty_print,
+                                  encoding="utf-8")
+            assert isinstance(xml, bytes)
+            result.xml = xml
+        else:
+            name = str(result.name)
+            if os.sep in name or name in (".", ".."):
+                raise ValueError("Name can't be used as a file name", name)
+
+            result.path = os.path.join(directory, f"{name}.xml")
+            domain.write_to(result.path, pretty_print=pretty_print)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+
+    return result
+
+
+def _numbered_lines(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    # Skip blank lines, but keep line numbers right for error messages
+    for line, text in enumerate(lines, 1):
+        if text.strip():
+            yield line, text
+
+
+def render_fleet(lines: Iterable[str], *, jobs: Optional[int] = None,
+                 pretty_print: bool = False, directory: Optional[str] = None,
+                 chunksize: int = 64, validate: bool = False,
+                 executor: Optional[Executor] = None
+                 ) -> Iterator[RenderResult]:
+    """Render a fleet spec (one JSON object per line) in parallel.
+
+    Results are yielded in the same order as the spec. Workers are sent the
+    spec lines themselves rather than trees, and only a bounded window of
+    lines is in flight at a time, so the spec can be streamed.
+
+    Parameters:
+      lines: the lines of the spec, blank lines are skipped
+      jobs: number of worker processes, defaults to the number of CPUs;
+            if 1, everything is rendered in this process
+      pretty_print: whether or not to pretty print the XML
+      directory: if given, write each domain to <name>.xml in it
+      chunksize: number of lines sent to a worker at a time
+      validate: whether or not to check domains against libvirt's schema;
+                each worker compiles the schema once
+      executor: use this executor rather than creating a process pool
+    """
+    render = partial(render_line, pretty_print=pretty_print,
+                     directory=directory, validate=validate)
+    numbered = _numbered_lines(lines)
+
+    if executor is None and jobs == 1:
+        yield from map(render, numbered)
+        return
+
+    own_executor = executor is None
+    if executor is None:
+        executor = ProcessPoolExecutor(jobs)
+
+    # Executor.map submits everything at once, so feed it windows of lines.
+    # The next window is submitted before the current one is drained, to
+    # keep the workers busy.
+    window = chunksize * (jobs or os.cpu_count() or 1) * 4
+    try:
+        pending: Optional[Iterator[RenderResult]] = None
+        while True:
+            batch = list(islice(numbered, window))
+            if not batch:
+                break
+
+            results = executor.map(render, batch, chunksize=chunksize)
+            if pending is not None:
+                yield from pending
+
+            pending = results
+
+        if pending is not None:
+            yield from pending
+    finally:
+        if own_executor:
+            executor.shutdown()
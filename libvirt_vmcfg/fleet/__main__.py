@@ -0,0 +1,6 @@
+import sys
+
+from libvirt_vmcfg.fleet.cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,70 @@
+"""Command line interface for rendering fleet specs."""
+
+import argparse
+import os
+import sys
+from typing import BinaryIO, List, Optional
+
+from libvirt_vmcfg.fleet import render_fleet
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="libvirt-vmcfg-fleet",
+        description="Render libvirt domain XML for a fleet of VMs. The spec "
+                    "has one JSON object per line, holding "
+                    "kvm_default_hardware arguments plus optional disks and "
+                    "interfaces lists.")
+    parser.add_argument("spec", nargs="?", default="-",
+                        help="fleet spec file, or - for stdin (default)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("-o", "--output", default="-",
+                        help="write all domains to this file in spec order, "
+                             "or - for stdout (default)")
+    output.add_argument("-d", "--directory",
+                        help="write each domain to <name>.xml in this "
+                             "directory instead")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes "
+                             "(default: number of CPUs)")
+    parser.add_argument("--chunksize", type=int, default=64,
+                        help="spec lines sent to a worker at a time "
+                             "(default: %(default)s)")
+    parser.add_argument("-p", "--pretty", action="store_true",
+                        help="pretty print the XML")
+    parser.add_argument("--validate", action="store_true",
+                        help="check each domain against libvirt's RelaxNG "
+                             "schema, and report failures as errors")
+    args = parser.parse_args(argv)
+
+    if args.directory is not None:
+        os.makedirs(args.directory, exist_ok=True)
+
+    spec = (sys.stdin if args.spec == "-"
+            else open(args.spec, encoding="utf-8"))
+    out: Optional[BinaryIO] = None
+    if args.directory is None:
+        out = (sys.stdout.buffer if args.output == "-"
+               else open(args.output, "wb"))
+
+    failed = 0
+    try:
+        for result in render_fleet(spec, jobs=args.jobs,
+                                   pretty_print=args.pretty,
+                                   directory=args.directory,
+                                   chunksize=args.chunksize,
+                                   validate=args.validate):
+            if result.error is not None:
+                failed += 1
+                print(f"{args.spec}:{result.line}: {result.name or '?'}: "
+                      f"{result.error}", file=sys.stderr)
+            elif out is not None and result.xml is not None:
+                out.write(result.xml)
+                out.write(b"\n")
+    finally:
+        if spec is not sys.stdin:
+            spec.close()
+        if out is not None and out is not sys.stdout.buffer:
+            out.close()
+
+    return 1 if failed else 0
@@ -0,0 +1,75 @@
+"""A stand-in for a libvirt connection, for testing define pipelines."""
+
+import asyncio
+from typing import Dict, Union
+
+from lxml import etree
+
+
+class FakeLibvirt:
+    """Accepts domain XML like virConnect.defineXML, without a hypervisor.
+
+    Domains are kept by name, as parsed trees. Like libvirt, defining a
+    domain again with the same name and UUID replaces it, while reusing a
+    name or UUID of a different domain is an error.
+
+    The number of define calls in progress is tracked, so tests can check
+    concurrency limits are respected.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Create an empty fake connection.
+
+        Parameters:
+          latency: seconds each define call takes
+        """
+        self.latency = latency
+        self.domains: Dict[str, etree._Element] = {}
+        self._uuids: Dict[str, str] = {}
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def define_xml(self, xml: Union[str, bytes]) -> str:
+        """Define (or redefine) a domain, returning its name."""
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            if isinstance(xml, str):
+                xml = xml.encode("utf-8")
+
+            root = etree.fromstring(xml)
+            if root.tag != "domain":
+                raise ValueError("Not a domain", root.tag)
+
+            name = root.findtext("name")
+            if not name:
+                raise ValueError("Domain has no name")
+
+            uuid = root.findtext("uuid")
+            if uuid is not None:
+                owner = self._uuids.get(uuid)
+                if owner is not None and owner != name:
+                    raise ValueError("UUID already used by another domain",
+                                     uuid, owner)
+
+            old = self.domains.get(name)
+            if old is not None and old.findtext("uuid") != uuid:
+                raise ValueError("Name already used by another domain", name)
+
+            self.domains[name] = root
+            if uuid is not None:
+                self._uuids[uuid] = name
+
+            return name
+        finally:
+            self.in_flight -= 1
+
+    def __repr__(self):
+        return (f"FakeLibvirt(latency={self.latency!r}, "
+                f"domains={len(self.domains)})")
@@ -0,0 +1,155 @@
+"""Render domains and hand them to an async consumer, such as defineXML."""
+
+import asyncio
+import collections.abc
+import contextvars
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import (Any, AsyncIterable, AsyncIterator, Awaitable, Callable,
+                    Dict, Iterable, Optional, Set, Tuple, Union, cast)
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.stats import RenderStats, current_stats, instrument
+
+
+# Something like a defineXML wrapper: takes UTF-8 XML, returns anything.
+Consumer = Callable[[bytes], Awaitable[Any]]
+
+
+@dataclass
+class DefineResult:
+    """The outcome of rendering and consuming one domain.
+
+    index: position of the domain in the input, starting at 0
+    domain: the domain itself
+    xml: the rendered XML as UTF-8, if rendering succeeded
+    result: what the consumer returned
+    error: the exception raised by rendering or the consumer, if any
+    """
+    index: int
+    domain: Domain
+    xml: Optional[bytes] = None
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+def _emit(domain: Domain, pretty_print: bool) -> bytes:
+    xml = domain.emit_xml(pretty_print=pretty_print, encoding="utf-8")
+    assert isinstance(xml, bytes)
+    return xml
+
+
+def _render(domain: Domain, pretty_print: bool
+            ) -> Tuple[bytes, Optional[RenderStats]]:
+    # Run in a copy of the caller's context, so instrumentation carries over
+    # to the executor's threads. The statistics are recorded separately and
+    # merged by the caller, as threads can't share them safely.
+    if current_stats() is None:
+        return _emit(domain, pretty_print), None
+
+    with instrument(merge=False) as stats:
+        return _emit(domain, pretty_print), stats
+
+
+async def _aiter(domains: Union[Iterable[Domain], AsyncIterable[Domain]]
+                 ) -> AsyncIterator[Domain]:
+    if isinstance(domains, collections.abc.AsyncIterable):
+        async for domain in domains:
+            yield domain
+    else:
+        for domain in domains:
+            yield domain
+
+
+async def define_domains(
+        domains: Union[Iterable[Domain], AsyncIterable[Domain]],
+        consumer: Consumer, *, concurrency: int = 8,
+        executor: Optional[Executor] = None, pretty_print: bool = False,
+        ordered: bool = False) -> AsyncIterator[DefineResult]:
+    """Render domains in an executor and pass the XML to an async consumer.
+
+    Up to concurrency domains are being rendered or consumed at once, so
+    rendering one domain overlaps with consuming others, and the event loop
+    never blocks on rendering. New domains are only taken from the input as
+    results are taken from this generator, so a slow consumer (or caller)
+    holds everything back rather than letting work pile up.
+
+    Results are yielded as they complete, or in input order if ordered is
+    set. Failures are reported in the results rather than raised. Rendering
+    is instrumented if the caller is, see libvirt_vmcfg.dom.stats.
+
+    Parameters:
+      domains: the domains, as a plain or async iterable
+      consumer: coroutine function called with each domain's XML
+      concurrency: maximum number of domains in flight
+      executor: executor to render in, defaults to the loop's default
+                executor; domains can't be pickled, so this must be a
+                thread pool
+      pretty_print: whether or not to pretty print the XML
+      ordered: whether or not to yield results in input order
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1", concurrency)
+
+    loop = asyncio.get_running_loop()
+
+    async def process(index: int, domain: Domain) -> DefineResult:
+        result = DefineResult(index, domain)
+        try:
+            context = contextvars.copy_context()
+            result.xml, stats = await loop.run_in_executor(
+                executor, context.run, _render, domain, pretty_print)
+            if stats is not None:
+                cast(RenderStats, current_stats()).merge(stats)
+
+            result.result = await consumer(result.xml)
+        except Exception as e:
+            result.error = e
+
+        return result
+
+    source = _aiter(domains)
+    pending: Set["asyncio.Future[DefineResult]"] = set()
+    # Finished out of order, waiting for earlier ones (ordered mode only).
+    # These count towards concurrency, so they can't pile up either.
+    held: Dict[int, DefineResult] = {}
+    next_index = 0
+    next_yield = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) + len(held) < concurrency:
+                try:
+                    domain = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+
+                pending.add(asyncio.ensure_future(process(next_index,
+                                                          domain)))
+                next_index += 1
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if not ordered:
+                    yield result
+                    continue
+
+                held[result.index] = result
+
+            while next_yield in held:
+                yield held.pop(next_yield)
+                next_yield += 1
+    finally:
+        for future in pending:
+            future.cancel()
+
+        if pending:
+            await asyncio.wait(pending)
+
+        await source.aclose()
@@ -0,0 +1,287 @@
+"""Keep a large fleet of domains in memory, sharing identical subtrees."""
+
+import sys
+from collections import OrderedDict
+from typing import (Any, BinaryIO, Dict, Iterator, List, Optional, Tuple,
+                    Union, cast)
+
+from lxml import etree
+
+from libvirt_vmcfg.common.util import write_tree
+from libvirt_vmcfg.dom import Domain
+
+
+# Tags of nodes that aren't elements; these can't clash with real tags.
+_COMMENT = "#comment"
+_PI = "#pi"
+
+# An interned node is one flat tuple, as most of the memory is in the nodes
+# unique to each domain:
+#   (tag, text, tail, namespace declarations, attribute count,
+#    name, value, name, value, ..., child id, child id, ...)
+# Attribute and child order are kept, so trees come back out exactly as they
+# went in.
+_Node = Tuple[Any, ...]
+_FIXED = 5
+
+
+class FleetStore:
+    """Domains kept as shared, hash-consed subtrees rather than lxml trees.
+
+    Each distinct node (with everything below it) is stored once, and
+    referred to by id from every domain containing it. Most of a fleet's
+    XML, such as the clock, features and default devices, is the same from
+    one domain to the next, so a domain usually costs only its few unique
+    nodes (name, UUID, disk sources, MACs and their parents). Trees are
+    rebuilt on demand, and fragments no domain uses any more are freed.
+
+    Domains are kept by name. Adding a domain with a name already in the
+    store replaces it.
+    """
+
+    def __init__(self, *, cache_size: int = 256):
+        """
+        Create an empty store.
+
+        Parameters:
+          cache_size: how many shared subtrees to keep built as lxml trees,
+                      which are copied rather than rebuilt node by node
+        """
+        self._ids: Dict[_Node, int] = {}
+        self._nodes: List[Optional[_Node]] = []
+        self._refs: List[int] = []
+        self._free: List[int] = []
+        # Roots hold the name, so they're never shared, and aren't interned.
+        self._roots: Dict[str, _Node] = {}
+        self.cache_size = cache_size
+        self._trees: "OrderedDict[int, etree._Element]" = OrderedDict()
+
+    def _key(self, node: etree._Element,
+             parent_nsmap: Dict[Optional[str], str]) -> _Node:
+        # Children are interned on the way.
+        tag = node.tag
+        if tag is etree.Comment:
+            key: _Node = (_COMMENT, node.text, node.tail, (), 0)
+        elif tag is etree.ProcessingInstruction:
+            key = (_PI, node.text, node.tail, (), 1, "target",
+                   cast(str, node.target))
+        elif isinstance(tag, str):
+            nsmap = node.nsmap
+            declared = tuple((prefix, uri) for prefix, uri in nsmap.items()
+                             if parent_nsmap.get(prefix) != uri)
+            attrib = node.attrib
+            flat: List[str] = []
+            for name, value in attrib.items():
+                # Unique nodes still mostly repeat names and values, such as
+                # type="file".
+                flat.append(sys.intern(name))
+                flat.append(sys.intern(value))
+
+            children = [self._intern(child, nsmap) for child in node]
+            key = (sys.intern(tag), node.text, node.tail, declared,
+                   len(attrib), *flat, *children)
+        else:
+            raise ValueError("Can't store node", node)
+
+        return key
+
+    @staticmethod
+    def _children(key: _Node) -> Tuple[int, ...]:
+        return key[_FIXED + 2 * key[4]:]
+
+    def _intern(self, node: etree._Element,
+                parent_nsmap: Dict[Optional[str], str]) -> int:
+        key = self._key(node, parent_nsmap)
+        node_id = self._ids.get(key)
+        if node_id is not None:
+            self._refs[node_id] += 1
+            # Our children were counted again, but a known node holds one
+            # reference to each of them however many parents it has.
+            for child_id in self._children(key):
+                self._refs[child_id] -= 1
+
+            return node_id
+
+        if self._free:
+            node_id = self._free.pop()
+            self._nodes[node_id] = key
+            self._refs[node_id] = 1
+        else:
+            node_id = len(self._nodes)
+            self._nodes.append(key)
+            self._refs.append(1)
+
+        self._ids[key] = node_id
+        return node_id
+
+    def _release(self, root: _Node) -> None:
+        stack = list(self._children(root))
+        while stack:
+            node_id = stack.pop()
+            self._refs[node_id] -= 1
+            if self._refs[node_id]:
+                continue
+
+            key = cast(_Node, self._nodes[node_id])
+            del self._ids[key]
+            self._trees.pop(node_id, None)
+            self._nodes[node_id] = None
+            self._free.append(node_id)
+            stack.extend(self._children(key))
+
+    def add(self, domain: Union[Domain, etree._Element]) -> str:
+        """Store a domain or domain tree, returning its name.
+
+        The tree is copied into the store, so the domain may be changed or
+        dropped afterwards.
+        """
+        root = domain.root if isinstance(domain, Domain) else domain
+        if root.tag != "domain":
+            raise ValueError("Not a domain", root.tag)
+
+        name = root.findtext("name")
+        if not name:
+            raise ValueError("Domain has no name")
+
+        # Checked up front, as failing halfway would leave nodes interned
+        # with nothing referring to them.
+        entity = next(root.iter(etree.Entity), None)
+        if entity is not None:
+            raise ValueError("Can't store entity references", entity)
+
+        key = self._key(root, {})
+        # Release the old version last, so the fragments it shares with the
+        # new one aren't freed and interned again.
+        old = self._roots.get(name)
+        self._roots[name] = key
+        if old is not None:
+            self._release(old)
+
+        return name
+
+    def remove(self, name: str) -> None:
+        """Drop a domain from the store."""
+        self._release(self._roots.pop(name))
+
+    def _build(self, key: _Node,
+               parent: Optional[etree._Element]) -> etree._Element:
+        tag, text, tail, declared, nattrs = key[:_FIXED]
+        node: etree._Element
+        if tag == _COMMENT:
+            node = etree.Comment(text)
+        elif tag == _PI:
+            node = etree.ProcessingInstruction(key[_FIXED + 1], text)
+        else:
+            end = _FIXED + 2 * nattrs
+            attrib = dict(zip(key[_FIXED:end:2], key[_FIXED + 1:end:2]))
+            # Made in place under the parent, so namespaces declared further
+            # up keep their prefixes.
+            nsmap = dict(declared) if declared else None
+            if parent is None:
+                node = etree.Element(tag, attrib, nsmap=nsmap)
+            else:
+                node = etree.SubElement(parent, tag, attrib, nsmap=nsmap)
+
+            node.text = text
+            node.tail = tail
+            for child_id in key[end:]:
+                self._build_child(child_id, node)
+
+            return node
+
+        node.tail = tail
+        if parent is not None:
+            parent.append(node)
+
+        return node
+
+    def _plain(self, key: _Node) -> bool:
+        # Whether a subtree uses no namespaces. Only these can be built on
+        # their own and copied in, as a detached subtree can't use prefixes
+        # declared by its ancestors.
+        end = _FIXED + 2 * key[4]
+        if key[3] or key[0][0] == "{":
+            return False
+        elif any(name[0] == "{" for name in key[_FIXED:end:2]):
+            return False
+
+        return all(self._plain(cast(_Node, self._nodes[child_id]))
+                   for child_id in key[end:])
+
+    def _build_child(self, node_id: int, parent: etree._Element) -> None:
+        tree = self._trees.get(node_id)
+        if tree is not None:
+            self._trees.move_to_end(node_id)
+            parent.append(tree.__copy__())
+            return
+
+        key = cast(_Node, self._nodes[node_id])
+        # Only worth it for shared nodes.
+        if (self._refs[node_id] < 2 or self.cache_size <= 0 or
+                not self._plain(key)):
+            self._build(key, parent)
+            return
+
+        tree = self._build(key, None)
+        self._trees[node_id] = tree
+        while len(self._trees) > self.cache_size:
+            self._trees.popitem(last=False)
+
+        parent.append(tree.__copy__())
+
+    def tree(self, name: str) -> etree._Element:
+        """Return a new lxml tree of the named domain."""
+        return self._build(self._roots[name], None)
+
+    def domain(self, name: str, *, lazy: bool = False) -> Domain:
+        """Return the named domain, parsed back into elements.
+
+        See Domain.from_xml; anything no element represents exactly is kept
+        as opaque XML.
+        """
+        return Domain.from_xml(self.tree(name), lazy=lazy)
+
+    def emit_xml(self, name: str, *, pretty_print: bool = False,
+                 encoding: str = "unicode") -> Union[str, bytes]:
+        """
+        Emit the libvirt XML of the named domain.
+
+        Parameters:
+          name: name of the domain
+          pretty_print: whether or not to pretty print the result
+          encoding: encoding of the resulting data, set to "unicode" for UTF-8
+        """
+        return etree.tostring(self.tree(name), pretty_print=pretty_print,
+                              encoding=encoding)
+
+    def write_to(self, name: str, file: Union[str, BinaryIO], *,
+                 pretty_print: bool = False, compression: int = 0) -> None:
+        """
+        Stream the libvirt XML of the named domain to a file as UTF-8.
+
+        Parameters:
+          name: name of the domain
+          file: binary file-like object or path to write to
+          pretty_print: whether or not to pretty print the result
+          compression: gzip compression level, or 0 for none
+        """
+        write_tree(file, self.tree(name), pretty_print=pretty_print,
+                   compression=compression)
+
+    @property
+    def fragments(self) -> int:
+        """The number of distinct nodes stored, not counting the roots."""
+        return len(self._ids)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._roots
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._roots)
+
+    def __len__(self) -> int:
+        return len(self._roots)
+
+    def __repr__(self):
+        return (f"FleetStore(domains={len(self._roots)}, "
+                f"fragments={len(self._ids)})")
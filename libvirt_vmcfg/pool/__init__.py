@@ -0,0 +1,167 @@
+from enum import Enum
+from typing import BinaryIO, Optional, Sequence, Union
+
+from lxml import etree
+
+from libvirt_vmcfg.common.util import write_tree
+
+
+class LogicalFormat(Enum):
+    LVM2 = "lvm2"
+
+
+class NetFSFormat(Enum):
+    AUTO = "auto"
+    NFS = "nfs"
+    GLUSTERFS = "glusterfs"
+    CIFS = "cifs"
+
+
+class Pool:
+    """
+    Base class for libvirt storage pools. Subclasses set type.
+
+    Attributes:
+      name: name of the pool
+      path: target path of the pool on the host
+    """
+    type: str
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+
+    def _source_xml(self, pool_tag: etree._Element) -> None:
+        """Add the pool's source tag, if it has one."""
+
+    def xml_tree(self) -> etree._Element:
+        """
+        Build the libvirt XML tree for the pool.
+        """
+        pool_tag = etree.Element("pool", type=self.type)
+
+        name_tag = etree.SubElement(pool_tag, "name")
+        name_tag.text = self.name
+
+        self._source_xml(pool_tag)
+
+        target_tag = etree.SubElement(pool_tag, "target")
+        path_tag = etree.SubElement(target_tag, "path")
+        path_tag.text = self.path
+
+        return pool_tag
+
+    def emit_xml(self, *, pretty_print: bool = False,
+                 encoding: str = "unicode") -> Union[str, bytes]:
+        """
+        Emit libvirt XML document for the pool.
+
+        Parameters:
+          pretty_print: whether or not to pretty print the result
+          encoding: encoding of the resulting data, set to "unicode" for UTF-8
+        """
+        return etree.tostring(self.xml_tree(), pretty_print=pretty_print,
+                              encoding=encoding)
+
+    def write_to(self, file: Union[str, BinaryIO], *,
+                 pretty_print: bool = False, compression: int = 0) -> None:
+        """
+        Stream libvirt XML document for the pool to a file as UTF-8.
+
+        Parameters:
+          file: binary file-like object or path to write to
+          pretty_print: whether or not to pretty print the result
+          compression: gzip compression level, or 0 for none
+        """
+        write_tree(file, self.xml_tree(), pretty_print=pretty_print,
+                   compression=compression)
+
+    def __repr__(self):
+        return (f"{type(self).__name__}(name={self.name!r}, "
+                f"path={self.path!r})")
+
+
+class DirPool(Pool):
+    """A pool of image files in a directory on the host."""
+    type = "dir"
+
+
+class LogicalPool(Pool):
+    """
+    A pool backed by an LVM volume group.
+
+    Attributes:
+      vg_name: name of the volume group, defaults to the pool name
+      devices: physical volumes to build the group from, if it's to be built
+    """
+    type = "logical"
+
+    def __init__(self, name: str, *, vg_name: Optional[str] = None,
+                 devices: Sequence[str] = (), path: Optional[str] = None):
+        """
+        Create a logical pool object.
+
+        Parameters:
+          name: name of the pool
+          vg_name: name of the volume group, defaults to the pool name
+          devices: physical volumes, only needed to build the group
+          path: target path, defaults to /dev/<vg_name>
+        """
+        self.vg_name = name if vg_name is None else vg_name
+        self.devices = list(devices)
+        super().__init__(name, (f"/dev/{self.vg_name}" if path is None
+                                else path))
+
+    def _source_xml(self, pool_tag: etree._Element) -> None:
+        source_tag = etree.SubElement(pool_tag, "source")
+        for device in self.devices:
+            etree.SubElement(source_tag, "device", path=device)
+
+        vg_tag = etree.SubElement(source_tag, "name")
+        vg_tag.text = self.vg_name
+        etree.SubElement(source_tag, "format",
+                         type=LogicalFormat.LVM2.value)
+
+    def __repr__(self):
+        return (f"LogicalPool(name={self.name!r}, vg_name={self.vg_name!r}, "
+                f"devices={self.devices!r}, path={self.path!r})")
+
+
+class NetFSPool(Pool):
+    """
+    A pool on a network filesystem, mounted by libvirt.
+
+    Attributes:
+      host: the file server
+      source_path: the exported directory on the server
+      format: the network filesystem type
+    """
+    type = "netfs"
+
+    def __init__(self, name: str, host: str, source_path: str, path: str, *,
+                 format: NetFSFormat = NetFSFormat.NFS):
+        """
+        Create a network filesystem pool object.
+
+        Parameters:
+          name: name of the pool
+          host: the file server
+          source_path: the exported directory on the server
+          path: where to mount it on the host
+          format: the network filesystem type
+        """
+        super().__init__(name, path)
+        self.host = host
+        self.source_path = source_path
+        self.format = format
+
+    def _source_xml(self, pool_tag: etree._Element) -> None:
+        source_tag = etree.SubElement(pool_tag, "source")
+        etree.SubElement(source_tag, "host", name=self.host)
+        etree.SubElement(source_tag, "dir", path=self.source_path)
+        etree.SubElement(source_tag, "format", type=self.format.value)
+
+    def __repr__(self):
+        return (f"NetFSPool(name={self.name!r}, host={self.host!r}, "
+                f"source_path={self.source_path!r}, path={self.path!r}, "
+                f"format={self.format!r})")
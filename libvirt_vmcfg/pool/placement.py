@@ -0,0 +1,139 @@
+"""Place volumes on storage pools by free capacity."""
+
+import heapq
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from libvirt_vmcfg.pool import Pool
+from libvirt_vmcfg.vol import Volume, emit_volumes
+
+
+def _allocation(volume: Volume) -> int:
+    # libvirt allocates the whole capacity if no allocation is given.
+    if volume.allocation is None:
+        return volume.capacity
+
+    return volume.allocation
+
+
+@dataclass
+class PoolSpace:
+    """How much space a pool has for new volumes.
+
+    pool: the pool
+    capacity: size of the pool in bytes, as reported by libvirt
+    allocated: bytes allocated in the pool, as reported by libvirt
+    overcommit: how many times over the pool's unallocated bytes may be
+                promised to the sparse parts of volumes (their capacity less
+                their allocation), for thin provisioned pools; 1.0 means no
+                overcommit
+    sparse: bytes the existing volumes may still grow by, if known
+    """
+    pool: Pool
+    capacity: int
+    allocated: int = 0
+    overcommit: float = 1.0
+    sparse: int = 0
+
+    def __post_init__(self):
+        if self.overcommit <= 0:
+            raise ValueError("overcommit must be positive", self.overcommit)
+
+    @property
+    def free(self) -> float:
+        """Bytes left for new volumes, counting sparse bytes at their cost.
+
+        See cost.
+        """
+        return self.capacity - self.allocated - self.sparse / self.overcommit
+
+    def cost(self, volume: Volume) -> float:
+        """How much of the free space a volume takes in this pool.
+
+        Allocated bytes cost their size, and only the sparse part is
+        overcommitted, costing its size divided by the overcommit ratio.
+        """
+        allocation = _allocation(volume)
+        return allocation + (volume.capacity - allocation) / self.overcommit
+
+
+@dataclass
+class Placement:
+    """Where each volume goes.
+
+    batches: the volumes for each pool, by pool name, in input order
+    unplaced: volumes that didn't fit anywhere, in input order
+    """
+    batches: Dict[str, List[Volume]] = field(default_factory=dict)
+    unplaced: List[Volume] = field(default_factory=list)
+
+    def emit_xml(self, *, pretty_print: bool = False
+                 ) -> Dict[str, List[bytes]]:
+        """Return the UTF-8 XML of each pool's volumes, by pool name."""
+        return {name: list(emit_volumes(volumes, pretty_print=pretty_print))
+                for name, volumes in self.batches.items()}
+
+
+def plan_placement(volumes: Iterable[Volume],
+                   pools: Sequence[PoolSpace]) -> Placement:
+    """Spread volumes over pools, keeping the pools' free space even.
+
+    A volume fits in a pool if its allocation fits in the bytes the pool
+    has unallocated, and its cost (see PoolSpace.cost) fits in the pool's
+    free space; so preallocated bytes are never overcommitted, but sparse
+    ones are, by each pool's overcommit ratio. A volume without an
+    allocation is fully allocated, as libvirt does.
+
+    The largest volumes are placed first, each on the pool with the most free
+    space left that it fits in (worst fit decreasing), which balances the
+    pools. The pools are kept in a heap, so this usually takes
+    O((volumes + pools) log pools) time rather than O(volumes * pools); a
+    volume only looks past the emptiest pool when that one, overcommitting
+    less than the others, has no room for it.
+    """
+    if len({p.pool.name for p in pools}) != len(pools):
+        raise ValueError("Pool names must be unique")
+
+    indexed = list(enumerate(volumes))
+    # Largest first; the index keeps it stable.
+    indexed.sort(key=lambda item: -item[1].capacity)
+
+    # Max-heap on free space; ties go to the pool listed first.
+    heap: List[Tuple[float, int]] = [(-p.free, i)
+                                     for i, p in enumerate(pools)]
+    heapq.heapify(heap)
+    unallocated = [p.capacity - p.allocated for p in pools]
+
+    placed: List[List[Tuple[int, Volume]]] = [[] for _ in pools]
+    unplaced: List[Tuple[int, Volume]] = []
+    for index, volume in indexed:
+        allocation = _allocation(volume)
+        skipped: List[Tuple[float, int]] = []
+        while heap and -heap[0][0] >= allocation:
+            # Pools further down have less free space than this, which can't
+            # fit the allocation either.
+            free, pool_index = heapq.heappop(heap)
+            cost = pools[pool_index].cost(volume)
+            if allocation <= unallocated[pool_index] and cost <= -free:
+                heapq.heappush(heap, (free + cost, pool_index))
+                unallocated[pool_index] -= allocation
+                placed[pool_index].append((index, volume))
+                break
+
+            skipped.append((free, pool_index))
+        else:
+            # No pool has room.
+            unplaced.append((index, volume))
+
+        for item in skipped:
+            heapq.heappush(heap, item)
+
+    placement = Placement()
+    for space, batch in zip(pools, placed):
+        if batch:
+            batch.sort(key=lambda item: item[0])
+            placement.batches[space.pool.name] = [v for _, v in batch]
+
+    unplaced.sort(key=lambda item: item[0])
+    placement.unplaced = [v for _, v in unplaced]
+    return placement
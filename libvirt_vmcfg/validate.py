@@ -0,0 +1,116 @@
+"""Validate generated XML against libvirt's RelaxNG schemas."""
+
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Union
+
+from lxml import etree
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.vol import Volume
+
+
+# Where libvirt installs its schemas; the first one found is used.
+SCHEMA_DIRS = (
+    "/usr/share/libvirt/schemas",
+    "/usr/local/share/libvirt/schemas",
+)
+
+# Overrides SCHEMA_DIRS, for schemas kept elsewhere.
+SCHEMA_DIR_ENV = "LIBVIRT_VMCFG_SCHEMA_DIR"
+
+# Schema file (without .rng) by root tag
+_schema_names = {
+    "domain": "domain",
+    "volume": "storagevol",
+    "pool": "storagepool",
+}
+
+Validatable = Union[Domain, Volume, etree._Element]
+
+
+def schema_dir() -> str:
+    """Return the directory the schemas are loaded from.
+
+    Raises FileNotFoundError if libvirt's schemas can't be found.
+    """
+    env = os.environ.get(SCHEMA_DIR_ENV)
+    candidates = (env,) if env else SCHEMA_DIRS
+    for directory in candidates:
+        if os.path.isfile(os.path.join(directory, "domain.rng")):
+            return directory
+
+    raise FileNotFoundError("libvirt RelaxNG schemas not found in "
+                            f"{', '.join(candidates)}; install libvirt or "
+                            f"set {SCHEMA_DIR_ENV}")
+
+
+@lru_cache(maxsize=None)
+def _load_schema(path: str) -> etree.RelaxNG:
+    return etree.RelaxNG(file=path)
+
+
+def load_schema(name: str, directory: Optional[str] = None) -> etree.RelaxNG:
+    """Return the compiled schema with the given name, such as "domain".
+
+    Each schema is only compiled once per process, as compiling libvirt's
+    domain schema takes far longer than validating against it.
+    """
+    if directory is None:
+        directory = schema_dir()
+
+    return _load_schema(os.path.join(directory, f"{name}.rng"))
+
+
+def _tree(obj: Validatable) -> etree._Element:
+    if isinstance(obj, Domain):
+        # Validated in place, no serializing and parsing back.
+        return obj.root
+    elif isinstance(obj, Volume):
+        return obj.xml_tree()
+
+    return obj
+
+
+def validation_errors(obj: Validatable, *,
+                      directory: Optional[str] = None) -> List[str]:
+    """Return why a domain, volume or tree is invalid, or [] if it's valid.
+
+    The schema is chosen by the root tag. Each error looks like
+    "path: message", where path is where in the tree the error is, such as
+    "/domain/devices".
+    """
+    root = _tree(obj)
+    try:
+        name = _schema_names[str(root.tag)]
+    except KeyError:
+        raise ValueError("No schema for tag", root.tag) from None
+
+    schema = load_schema(name, directory)
+    if schema.validate(root):
+        return []
+
+    return [f"{error.path}: {error.message}" for error in schema.error_log]
+
+
+def validate(obj: Validatable, *, directory: Optional[str] = None) -> None:
+    """Raise ValueError if a domain, volume or tree is invalid."""
+    errors = validation_errors(obj, directory=directory)
+    if errors:
+        raise ValueError("XML does not match libvirt's schema", errors)
+
+
+def validate_all(objs: Iterable[Validatable], *,
+                 directory: Optional[str] = None) -> Dict[int, List[str]]:
+    """Validate many domains, volumes or trees.
+
+    Returns the errors of each invalid one, keyed by its position in objs.
+    An empty result means everything is valid.
+    """
+    failures: Dict[int, List[str]] = {}
+    for i, obj in enumerate(objs):
+        errors = validation_errors(obj, directory=directory)
+        if errors:
+            failures[i] = errors
+
+    return failures
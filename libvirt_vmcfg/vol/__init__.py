@@ -1,7 +1,44 @@
-from typing import Union
+from dataclasses import dataclass
+from enum import Enum
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
 
 from lxml import etree
 
+from libvirt_vmcfg.common.util import write_tree
+
+
+# virStorageVolCreateFlags, for the flags argument of createXML
+VIR_STORAGE_VOL_CREATE_PREALLOC_METADATA = 1
+
+
+class VolumeFormat(Enum):
+    RAW = "raw"
+    QCOW2 = "qcow2"
+
+
+class Preallocation(Enum):
+    # Only the qcow2 metadata; libvirt takes this as a createXML flag.
+    METADATA = "metadata"
+    # All of the capacity, which is expressed as the allocation.
+    FULL = "full"
+
+
+class Compat(Enum):
+    """qcow2 compatibility level."""
+    V0_10 = "0.10"
+    V1_1 = "1.1"
+
+
+@dataclass
+class BackingStore:
+    """The image a copy-on-write volume is based on, for linked clones.
+
+    path: path to the backing image
+    format: format of the backing image
+    """
+    path: str
+    format: Optional[VolumeFormat] = None
+
 
 class Volume:
     """
@@ -10,18 +47,138 @@ class Volume:
     Attributes:
       name: name of the volume
       capacity: capacity of the volume in bytes
+      allocation: bytes to allocate up front, None for the pool's default
+      format: format of the volume, None for the pool's default
+      preallocation: preallocation mode, if any
+      lazy_refcounts: whether or not qcow2 lazy refcounts are enabled
+      extended_l2: whether or not qcow2 extended L2 entries are enabled
+      cluster_size: qcow2 cluster size in bytes
+      compat: qcow2 compatibility level
+      backing_store: image this volume is a copy-on-write overlay of
     """
 
-    def __init__(self, name: str, capacity: int):
+    def __init__(self, name: str, capacity: int, *,
+                 allocation: Optional[int] = None,
+                 format: Optional[VolumeFormat] = None,
+                 preallocation: Optional[Preallocation] = None,
+                 lazy_refcounts: bool = False, extended_l2: bool = False,
+                 cluster_size: Optional[int] = None,
+                 compat: Optional[Compat] = None,
+                 backing_store: Optional[BackingStore] = None):
         """
         Create a volume object.
 
         Parameters:
           name: name of the volume
           capacity: capacity of the volume in bytes
+          allocation: bytes to allocate up front; 0 gives a sparse volume
+          format: format of the volume, such as VolumeFormat.QCOW2
+          preallocation: Preallocation.FULL allocates the whole capacity,
+                         Preallocation.METADATA only qcow2 metadata (pass
+                         create_flags to createXML for this)
+          lazy_refcounts: enable qcow2 lazy refcounts (needs compat 1.1)
+          extended_l2: enable qcow2 extended L2 entries (needs compat 1.1)
+          cluster_size: qcow2 cluster size in bytes, a power of two
+          compat: qcow2 compatibility level
+          backing_store: image to base this volume on, for linked clones
         """
+        qcow2_only = {
+            "lazy_refcounts": lazy_refcounts,
+            "extended_l2": extended_l2,
+            "cluster_size": cluster_size is not None,
+            "compat": compat is not None,
+            "preallocation=METADATA":
+                preallocation == Preallocation.METADATA,
+        }
+        if format != VolumeFormat.QCOW2:
+            used = [k for k, v in qcow2_only.items() if v]
+            if used:
+                raise ValueError("Options only valid for qcow2", used)
+
+        if (lazy_refcounts or extended_l2) and compat == Compat.V0_10:
+            raise ValueError("lazy_refcounts and extended_l2 need compat 1.1")
+
+        if cluster_size is not None and (cluster_size <= 0 or
+                                         cluster_size & (cluster_size - 1)):
+            raise ValueError("cluster_size must be a power of two",
+                             cluster_size)
+
+        if preallocation == Preallocation.FULL:
+            if allocation not in (None, capacity):
+                raise ValueError("Full preallocation allocates the capacity",
+                                 allocation, capacity)
+
+            allocation = capacity
+
+        if allocation is not None and not 0 <= allocation <= capacity:
+            raise ValueError("allocation must be between 0 and capacity",
+                             allocation, capacity)
+
         self.name = name
         self.capacity = capacity
+        self.allocation = allocation
+        self.format = format
+        self.preallocation = preallocation
+        self.lazy_refcounts = lazy_refcounts
+        self.extended_l2 = extended_l2
+        self.cluster_size = cluster_size
+        self.compat = compat
+        self.backing_store = backing_store
+
+    @property
+    def create_flags(self) -> int:
+        """The flags to pass to createXML along with this volume's XML."""
+        if self.preallocation == Preallocation.METADATA:
+            return VIR_STORAGE_VOL_CREATE_PREALLOC_METADATA
+
+        return 0
+
+    def xml_tree(self) -> etree._Element:
+        """
+        Build the libvirt XML tree for the volume.
+        """
+        volume_tag = etree.Element("volume")
+
+        name_tag = etree.SubElement(volume_tag, "name")
+        name_tag.text = self.name
+
+        capacity_tag = etree.SubElement(volume_tag, "capacity")
+        capacity_tag.text = str(self.capacity)
+
+        if self.allocation is not None:
+            allocation_tag = etree.SubElement(volume_tag, "allocation")
+            allocation_tag.text = str(self.allocation)
+
+        if self.format is not None:
+            target_tag = etree.SubElement(volume_tag, "target")
+            etree.SubElement(target_tag, "format", type=self.format.value)
+
+            if self.compat is not None:
+                compat_tag = etree.SubElement(target_tag, "compat")
+                compat_tag.text = self.compat.value
+
+            if self.cluster_size is not None:
+                cluster_tag = etree.SubElement(target_tag, "clusterSize",
+                                               unit="B")
+                cluster_tag.text = str(self.cluster_size)
+
+            if self.lazy_refcounts or self.extended_l2:
+                features_tag = etree.SubElement(target_tag, "features")
+                if self.lazy_refcounts:
+                    etree.SubElement(features_tag, "lazy_refcounts")
+
+                if self.extended_l2:
+                    etree.SubElement(features_tag, "extended_l2")
+
+        if self.backing_store is not None:
+            backing_tag = etree.SubElement(volume_tag, "backingStore")
+            path_tag = etree.SubElement(backing_tag, "path")
+            path_tag.text = self.backing_store.path
+            if self.backing_store.format is not None:
+                etree.SubElement(backing_tag, "format",
+                                 type=self.backing_store.format.value)
+
+        return volume_tag
 
     def emit_xml(self, *, pretty_print: bool = False,
                  encoding: str = "unicode") -> Union[str, bytes]:
@@ -32,14 +189,65 @@ class Volume:
           pretty_print: whether or not to pretty print the result
           encoding: encoding of the resulting data, set to "unicode" for UTF-8
         """
-        volume_tag = etree.Element("volume")
+        return etree.tostring(self.xml_tree(), pretty_print=pretty_print,
+                              encoding=encoding)
 
-        name_tag = etree.SubElement(volume_tag, "name")
-        name_tag.text = self.name
+    def write_to(self, file: Union[str, BinaryIO], *,
+                 pretty_print: bool = False, compression: int = 0) -> None:
+        """
+        Stream libvirt XML document for the volume to a file as UTF-8.
 
-        capacity_tag = etree.SubElement(volume_tag, "capacity")
-        capacity_tag.text = str(self.capacity)
+        Parameters:
+          file: binary file-like object or path to write to
+          pretty_print: whether or not to pretty print the result
+          compression: gzip compression level, or 0 for none
+        """
+        write_tree(file, self.xml_tree(), pretty_print=pretty_print,
+                   compression=compression)
 
-        return etree.tostring(volume_tag, pretty_print=pretty_print,
-                              encoding=encoding)
+    def __repr__(self):
+        return (f"Volume(name={self.name!r}, capacity={self.capacity!r}, "
+                f"allocation={self.allocation!r}, format={self.format!r}, "
+                f"backing_store={self.backing_store!r})")
+
+
+def emit_volumes(volumes: Iterable[Volume], *,
+                 pretty_print: bool = False) -> Iterator[bytes]:
+    """
+    Emit the XML of many volumes, one UTF-8 document each.
+
+    Volumes are rendered as the iterator is consumed, so thousands of them
+    can be streamed to createXML without holding all the XML at once.
+
+    Parameters:
+      volumes: the volumes to emit
+      pretty_print: whether or not to pretty print the result
+    """
+    tostring = etree.tostring
+    for volume in volumes:
+        yield tostring(volume.xml_tree(), pretty_print=pretty_print,
+                       encoding="utf-8")
+
+
+def write_volumes(file: Union[str, BinaryIO], volumes: Iterable[Volume], *,
+                  pretty_print: bool = False) -> None:
+    """
+    Stream the XML of many volumes into one file, one document per line.
+
+    Pretty printed documents span several lines each, so they can't be split
+    back up by line; each still ends with a newline.
+
+    Parameters:
+      file: binary file-like object or path to write to
+      volumes: the volumes to write
+      pretty_print: whether or not to pretty print the result
+    """
+    if isinstance(file, str):
+        with open(file, "wb") as f:
+            write_volumes(f, volumes, pretty_print=pretty_print)
+        return
 
+    for xml in emit_volumes(volumes, pretty_print=pretty_print):
+        file.write(xml)
+        if not xml.endswith(b"\n"):
+            file.write(b"\n")
@@ -0,0 +1,72 @@
+import pytest
+from lxml import etree
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Name
+from libvirt_vmcfg.dom.elements.devices import (Disk, DiskSource,
+                                                DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus)
+
+
+class FailingSource(DiskSource):
+    """Source that fails after adding to the disk tag."""
+    __slots__ = ()
+
+    def attach_xml(self, disk_tag: etree._Element) -> None:
+        etree.SubElement(disk_tag, "source", dev="/dev/broken")
+        raise RuntimeError("broken source")
+
+
+def make_disk(source: DiskSource) -> Disk:
+    target = DiskTargetDisk(None, bus=TargetBus.VIRTIO)
+    return Disk(source, target, DriverOptions(Driver.QEMU))
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_failing_disk_leaves_domain_unchanged(lazy):
+    domain = Domain(elements=[Name("test")], lazy=lazy)
+    domain.attach_disks([make_disk(DiskSourceBlockPath("/dev/sda"))])
+    before = domain.emit_xml()
+    elements = domain.elements
+
+    disks = [make_disk(DiskSourceBlockPath("/dev/sdb")),
+             make_disk(FailingSource())]
+    with pytest.raises(RuntimeError):
+        domain.attach_disks(disks)
+
+    assert domain.elements == elements
+    assert domain.emit_xml() == before
+    assert domain.disk_targets() == {"vda"}
+
+    # The names the failed disks would have had are free again.
+    data = domain.attach_disks([make_disk(DiskSourceBlockPath("/dev/sdb"))])
+    assert data[0].element.target.path == "vdb"
+    assert len(domain.root.findall("devices/disk")) == 2
+
+
+def test_attach_disks_names_and_claims_targets():
+    domain = Domain(elements=[Name("test")])
+    domain.attach_disks([make_disk(DiskSourceBlockPath(f"/dev/sd{c}"))
+                         for c in "ab"])
+    targets = [t.get("dev") for t in domain.root.iterfind("devices/disk/"
+                                                          "target")]
+    assert targets == ["vda", "vdb"]
+
+    # Claims made while building apart from the tree still count.
+    disk = make_disk(DiskSourceBlockPath("/dev/sdc")).with_target_path("vdb")
+    with pytest.raises(ValueError):
+        domain.attach_element(disk)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_opaque_disk_target_is_claimed(lazy):
+    xml = ('<domain type="kvm"><name>test</name><devices>'
+           '<disk type="file" device="disk"><source file="/a" extra="1"/>'
+           '<target dev="vda" bus="virtio"/></disk>'
+           '</devices></domain>')
+    domain = Domain.from_xml(xml, lazy=lazy)
+    disk = make_disk(DiskSourceBlockPath("/dev/sdb")).with_target_path("vda")
+    with pytest.raises(ValueError):
+        domain.attach_element(disk)
+        domain.materialize()
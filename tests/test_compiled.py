@@ -0,0 +1,123 @@
+from uuid import UUID
+
+import pytest
+
+from libvirt_vmcfg.dom import CompiledDomain, Domain, Slot, SlotType
+from libvirt_vmcfg.dom.elements import Description, Name
+from libvirt_vmcfg.dom.elements.devices import (BridgedInterface, Disk,
+                                                DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus)
+from libvirt_vmcfg.dom.profiles.linux_virtio import (kvm_default_compiled,
+                                                     kvm_default_hardware)
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+UUID_VALUE = "6f1c1a4a-3c1f-4b8e-9d1e-2c5b7a0e9f11"
+AWKWARD = "a&b<c>d\"e'f\ng\th\ri é ü 漢字"
+
+
+def disk(path: str, target: str) -> Disk:
+    return Disk(DiskSourceBlockPath(path),
+                DiskTargetDisk(target, bus=TargetBus.VIRTIO),
+                DriverOptions(Driver.QEMU))
+
+
+def devices(path: str, target: str, bridge: str, mac: str):
+    return [disk(path, target), BridgedInterface(bridge, mac=mac)]
+
+
+def emit(elements, pretty_print: bool) -> bytes:
+    xml = Domain(elements=elements).emit_xml(pretty_print=pretty_print,
+                                              encoding="utf-8")
+    assert isinstance(xml, bytes)
+    return xml
+
+
+@pytest.mark.parametrize("pretty_print", [False, True])
+def test_default_slots(pretty_print):
+    compiled = kvm_default_compiled(pretty_print=pretty_print)
+    values = {"name": "vm1", "uuid": UUID_VALUE, "memory": 2 * 1024**3,
+              "vcpus": 2}
+
+    assert (compiled.render(**values)
+            == emit(kvm_default_hardware(**values), pretty_print))
+
+
+@pytest.mark.parametrize("pretty_print", [False, True])
+def test_escaping_in_text_and_attributes(pretty_print):
+    name, description = Slot("name"), Slot("description")
+    path, bridge = Slot("path"), Slot("bridge")
+    slots = [name, description, path, bridge]
+    elements = [Name(name), Description(description),
+                *devices(path, "vda", bridge, "52:54:00:00:00:01")]
+    compiled = CompiledDomain(Domain(elements=elements), slots,
+                              pretty_print=pretty_print)
+
+    values = {"name": AWKWARD, "description": AWKWARD * 2,
+              "path": "/dev/" + AWKWARD, "bridge": AWKWARD}
+    expected = [Name(values["name"]), Description(values["description"]),
+                *devices(values["path"], "vda", values["bridge"],
+                         "52:54:00:00:00:01")]
+    assert compiled.render(**values) == emit(expected, pretty_print)
+
+
+@pytest.mark.parametrize("pretty_print", [False, True])
+def test_uuid_and_int_slots(pretty_print):
+    compiled = kvm_default_compiled(name="vm1", pretty_print=pretty_print)
+    assert compiled.slots == {"uuid": SlotType.UUID,
+                              "memory": SlotType.INT,
+                              "vcpus": SlotType.INT}
+
+    # UUIDs are normalised, as DomainUUID does.
+    rendered = compiled.render(uuid=UUID(UUID_VALUE).hex.upper(),
+                               memory=1024, vcpus=4)
+    expected = kvm_default_hardware(name="vm1", uuid=UUID_VALUE,
+                                    memory=1024, vcpus=4)
+    assert rendered == emit(expected, pretty_print)
+
+    with pytest.raises(TypeError):
+        compiled.render(uuid=UUID_VALUE, memory="1024", vcpus=4)
+
+    with pytest.raises(ValueError):
+        compiled.render(uuid="not a uuid", memory=1024, vcpus=4)
+
+
+@pytest.mark.parametrize("pretty_print", [False, True])
+def test_mac_and_disk_target_slots(pretty_print):
+    mac, target = Slot("mac"), Slot("target")
+    compiled = kvm_default_compiled(
+        devices("/dev/vg/disk", target, "br0", mac), [mac, target],
+        name="vm1", namespace=NAMESPACE, memory=1024, vcpus=2,
+        pretty_print=pretty_print)
+
+    rendered = compiled.render(mac="52:54:00:12:34:56", target="vdb")
+    expected = kvm_default_hardware(name="vm1", namespace=NAMESPACE,
+                                    memory=1024, vcpus=2)
+    expected += devices("/dev/vg/disk", "vdb", "br0", "52:54:00:12:34:56")
+    assert rendered == emit(expected, pretty_print)
+
+
+@pytest.mark.parametrize("pretty_print", [False, True])
+def test_no_slots(pretty_print):
+    values = {"name": "vm1", "namespace": NAMESPACE, "memory": 1024,
+              "vcpus": 2}
+    compiled = kvm_default_compiled(pretty_print=pretty_print, **values)
+
+    assert compiled.slots == {}
+    assert compiled.order == []
+    assert compiled.render() == emit(kvm_default_hardware(**values),
+                                     pretty_print)
+
+
+def test_missing_slots():
+    name = Slot("name")
+    with pytest.raises(ValueError):
+        CompiledDomain(Domain(elements=[Name("vm1")]), [name])
+
+    compiled = CompiledDomain(Domain(elements=[Name(name)]), [name])
+    with pytest.raises(ValueError):
+        compiled.render()
+
+    with pytest.raises(ValueError):
+        compiled.render(name="bad\x00name")
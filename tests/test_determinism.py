@@ -0,0 +1,100 @@
+from uuid import UUID, uuid5
+
+import pytest
+
+from libvirt_vmcfg.dom import Domain, DomainTemplate
+from libvirt_vmcfg.dom.elements import DomainUUID, Name
+from libvirt_vmcfg.dom.elements.devices import BridgedInterface, derive_mac
+from libvirt_vmcfg.dom.profiles.linux_virtio import (kvm_default_hardware,
+                                                     kvm_default_template)
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+OTHER_NAMESPACE = "a3d1c6b0-2f4e-4d8a-9b7c-1e5f3a2d4c60"
+
+
+def uuid_of(domain: Domain) -> str:
+    return domain.find(DomainUUID).element.uuid
+
+
+def mac_of(domain: Domain) -> str:
+    return domain.find(BridgedInterface).element.mac
+
+
+def test_derive_mac():
+    mac = derive_mac(NAMESPACE, "vm1")
+    assert derive_mac(UUID(NAMESPACE), "vm1", 0) == mac
+    assert derive_mac(NAMESPACE.upper(), "vm1") == mac
+
+    others = {derive_mac(NAMESPACE, "vm2"), derive_mac(NAMESPACE, "vm1", 1),
+              derive_mac(OTHER_NAMESPACE, "vm1")}
+    assert mac not in others and len(others) == 3
+
+    first = int(mac.split(":")[0], 16)
+    assert first & 0x03 == 0x02
+
+
+def test_derive_mac_prefix():
+    mac = derive_mac(NAMESPACE, "vm1", prefix="52:54:00")
+    assert mac.startswith("52:54:00:")
+    assert derive_mac(NAMESPACE, "vm1", prefix="52:54:00") == mac
+    assert derive_mac(NAMESPACE, "vm2", prefix="52:54:00") != mac
+
+
+def test_namespace_uuid():
+    def hardware(name: str, namespace: str = NAMESPACE) -> Domain:
+        return Domain(elements=kvm_default_hardware(
+            name=name, namespace=namespace, memory=1024, vcpus=2))
+
+    vm1 = hardware("vm1")
+    assert uuid_of(vm1) == str(uuid5(UUID(NAMESPACE), "vm1"))
+    assert hardware("vm1").emit_xml() == vm1.emit_xml()
+    assert uuid_of(hardware("vm2")) != uuid_of(vm1)
+    assert uuid_of(hardware("vm1", OTHER_NAMESPACE)) != uuid_of(vm1)
+
+
+def test_random_uuid_without_namespace():
+    def hardware() -> Domain:
+        return Domain(elements=kvm_default_hardware(name="vm1", memory=1024,
+                                                    vcpus=2))
+
+    assert uuid_of(hardware()) != uuid_of(hardware())
+
+
+@pytest.fixture
+def template() -> DomainTemplate:
+    # Like kvm_default_template, plus an interface with a derived address.
+    def derive_interface(domain: Domain) -> BridgedInterface:
+        name = domain.find(Name).element.name
+        return BridgedInterface("br0", mac=derive_mac(NAMESPACE, name))
+
+    base = kvm_default_template(name="template", namespace=NAMESPACE,
+                                memory=1024, vcpus=2)
+    return DomainTemplate(kvm_default_hardware(name="template",
+                                               namespace=NAMESPACE,
+                                               memory=1024, vcpus=2),
+                          derived=list(base.derived) + [derive_interface])
+
+
+def test_template(template):
+    vm1 = template.instantiate([Name("vm1")])
+    again = template.instantiate([Name("vm1")])
+    vm2 = template.instantiate([Name("vm2")])
+
+    assert uuid_of(vm1) == str(uuid5(UUID(NAMESPACE), "vm1"))
+    assert mac_of(vm1) == derive_mac(NAMESPACE, "vm1")
+    assert again.emit_xml() == vm1.emit_xml()
+    assert again.fingerprint() == vm1.fingerprint()
+
+    assert uuid_of(vm2) != uuid_of(vm1)
+    assert mac_of(vm2) != mac_of(vm1)
+
+
+def test_template_matches_per_instance_build():
+    template = kvm_default_template(name="template", namespace=NAMESPACE,
+                                    memory=1024, vcpus=2)
+    for name in ("vm1", "vm2"):
+        built = Domain(elements=kvm_default_hardware(
+            name=name, namespace=NAMESPACE, memory=1024, vcpus=2))
+        stamped = template.instantiate([Name(name)])
+        assert stamped.fingerprint() == built.fingerprint()
@@ -0,0 +1,118 @@
+from typing import List
+
+from libvirt_vmcfg.dom import Domain, DomainType, diff_domains
+from libvirt_vmcfg.dom.elements import Description, Element, Name
+from libvirt_vmcfg.dom.elements.devices import (BridgedInterface, Disk,
+                                                DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus)
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+
+def make_disk(path: str, target: str) -> Disk:
+    return Disk(DiskSourceBlockPath(path),
+                DiskTargetDisk(target, bus=TargetBus.VIRTIO),
+                DriverOptions(Driver.QEMU))
+
+
+def base_elements() -> List[Element]:
+    return kvm_default_hardware(name="vm1", namespace=NAMESPACE,
+                                memory=1024, vcpus=2)
+
+
+def disks() -> List[Element]:
+    return [make_disk("/dev/sda", "vda"), make_disk("/dev/sdb", "vdb"),
+            BridgedInterface("br0", mac="52:54:00:00:00:01"),
+            BridgedInterface("br1", mac="52:54:00:00:00:02")]
+
+
+def test_identical_domains():
+    current = Domain(elements=base_elements() + disks())
+    desired = Domain(elements=base_elements() + disks(), lazy=True)
+
+    diff = diff_domains(current, desired)
+    assert not diff
+    assert (diff.added, diff.removed, diff.changed) == ([], [], {})
+    assert not diff.type_changed
+
+
+def test_attribute_change():
+    current = Domain(elements=base_elements() + disks())
+    changed = disks()
+    changed[1] = make_disk("/dev/sdz", "vdb")
+    desired = Domain(elements=base_elements() + changed)
+
+    diff = diff_domains(current, desired)
+    assert diff
+    assert diff.added == [] and diff.removed == []
+    [(old, new)] = diff.changed.items()
+    assert old.element.source.path == "/dev/sdb"
+    assert new.element.source.path == "/dev/sdz"
+
+
+def test_text_change():
+    current = Domain(elements=[Name("vm1"), Description("old")])
+    desired = Domain(elements=[Name("vm1"), Description("new")])
+
+    diff = diff_domains(current, desired)
+    [(old, new)] = diff.changed.items()
+    assert (old.element.description, new.element.description) == ("old",
+                                                                   "new")
+
+
+def test_added_and_removed_devices():
+    current = Domain(elements=base_elements() + disks())
+    desired = Domain(elements=base_elements() + disks())
+    added = desired.attach_element(make_disk("/dev/sdc", "vdc"))
+
+    diff = diff_domains(current, desired)
+    assert diff.added == [added]
+    assert diff.removed == [] and diff.changed == {}
+
+    diff = diff_domains(desired, current)
+    assert diff.removed == [added]
+    assert diff.added == [] and diff.changed == {}
+
+
+def test_replacing_a_device_under_another_identity():
+    current = Domain(elements=base_elements() + disks())
+    desired = Domain(elements=base_elements() + disks())
+    old = current.find_all(BridgedInterface)[0]
+    new = desired.replace_element(
+        desired.find_all(BridgedInterface)[0],
+        BridgedInterface("br0", mac="52:54:00:00:00:03"))
+
+    diff = diff_domains(current, desired)
+    assert diff.added == [new]
+    assert diff.removed == [old]
+    assert diff.changed == {}
+
+
+def test_reordered_siblings():
+    current = Domain(elements=base_elements() + disks())
+    desired = Domain(elements=base_elements() + disks()[::-1])
+    assert current.emit_xml() != desired.emit_xml()
+
+    assert not diff_domains(current, desired)
+
+    # A change is still paired with the right sibling.
+    reordered = disks()[::-1]
+    reordered[3] = make_disk("/dev/sdz", "vda")
+    desired = Domain(elements=base_elements() + reordered)
+
+    diff = diff_domains(current, desired)
+    assert diff.added == [] and diff.removed == []
+    [(old, new)] = diff.changed.items()
+    assert old.element.target.path == new.element.target.path == "vda"
+
+
+def test_type_change():
+    current = Domain(DomainType.KVM, elements=[Name("vm1")])
+    desired = Domain(DomainType.UNKNOWN, elements=[Name("vm1")])
+
+    diff = diff_domains(current, desired)
+    assert diff and diff.type_changed
+    assert (diff.added, diff.removed, diff.changed) == ([], [], {})
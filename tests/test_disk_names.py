@@ -0,0 +1,66 @@
+import sys
+
+import pytest
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.util.disk import (DiskNameAllocator, base26,
+                                         parse_disk_name)
+
+
+def test_allocates_lowest_free_name():
+    names = DiskNameAllocator(["vda", "vdc", "sr0"])
+    assert names.allocate("vd") == "vdb"
+    assert names.allocate("vd") == "vdd"
+
+    names.release("vda")
+    assert "vda" not in names
+    assert names.allocate("vd") == "vda"
+    assert len(names) == 5
+
+    with pytest.raises(ValueError):
+        names.claim("sr0")
+
+    with pytest.raises(ValueError):
+        names.release("vdz")
+
+
+def test_huge_target_is_not_kept_in_bitmap():
+    huge = "vd" + "z" * 64
+    names = DiskNameAllocator(["vda", huge])
+
+    assert huge in names
+    assert all(sys.getsizeof(bits) < 1024
+               for bits in names._bitmaps.values())
+    assert names.allocate("vd") == "vdb"
+
+    with pytest.raises(ValueError):
+        names.claim(huge)
+
+    names.release(huge)
+    assert huge not in names
+    assert len(names) == 2
+
+
+def test_allocates_past_bitmap_when_full():
+    names = DiskNameAllocator()
+    for _ in range(1024):
+        names.allocate("vd")
+
+    beyond = "vd" + base26(1024)
+    names.claim("vd" + base26(1025))
+    assert names.allocate("vd") == beyond
+    assert names.allocate("vd") == "vd" + base26(1026)
+    assert parse_disk_name(beyond) == ("vd", 1024)
+
+
+def test_huge_target_from_xml():
+    huge = "vd" + "z" * 64
+    xml = ('<domain type="kvm"><name>test</name><devices>'
+           '<disk type="file" device="disk"><source file="/a" extra="1"/>'
+           f'<target dev="{huge}" bus="virtio"/></disk>'
+           '</devices></domain>')
+    domain = Domain.from_xml(xml)
+
+    names = DiskNameAllocator.from_domain(domain)
+    assert huge in names
+    assert names.allocate("vd") == "vda"
@@ -0,0 +1,22 @@
+import pytest
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Description, Name
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_elements_is_read_only(lazy):
+    domain = Domain(elements=[Name("vm1")], lazy=lazy)
+    elements = domain.elements
+    assert isinstance(elements, tuple)
+
+    with pytest.raises(AttributeError):
+        elements.append(elements[0])  # type: ignore
+
+    with pytest.raises(TypeError):
+        elements[0] = elements[0]  # type: ignore
+
+    # A snapshot, which later changes don't affect.
+    data = domain.attach_element(Description("text"))
+    assert domain.elements == elements + (data,)
+    assert len(elements) == 1
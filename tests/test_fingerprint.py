@@ -0,0 +1,104 @@
+from typing import List
+
+import pytest
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Description, Element, Name
+from libvirt_vmcfg.dom.elements.devices import (BridgedInterface, Disk,
+                                                DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus)
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+
+def make_disk(path: str, target: str) -> Disk:
+    return Disk(DiskSourceBlockPath(path),
+                DiskTargetDisk(target, bus=TargetBus.VIRTIO),
+                DriverOptions(Driver.QEMU))
+
+
+def make_elements(name: str, memory: int, vcpus: int, path: str,
+                  mac: str) -> List[Element]:
+    elements = kvm_default_hardware(name=name, namespace=NAMESPACE,
+                                    memory=memory, vcpus=vcpus,
+                                    emulator_path=f"/usr/bin/qemu-{name}")
+    return elements + [Description(f"{name} vm"), make_disk(path, "vda"),
+                       BridgedInterface("br0", mac=mac)]
+
+
+def first() -> List[Element]:
+    return make_elements("vm1", 1024, 2, "/dev/sda", "52:54:00:00:00:01")
+
+
+def second() -> List[Element]:
+    return make_elements("vm2", 2048, 4, "/dev/sdb", "52:54:00:00:00:02")
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_stable(lazy):
+    domain = Domain(elements=first(), lazy=lazy)
+    fingerprint = domain.fingerprint()
+
+    assert domain.fingerprint() == fingerprint
+    domain.emit_xml()
+    domain.emit_xml(pretty_print=True)
+    assert domain.fingerprint() == fingerprint
+
+    assert domain.clone().fingerprint() == fingerprint
+    assert Domain(elements=first(), lazy=not lazy).fingerprint() == fingerprint
+    assert Domain.from_xml(domain.emit_xml(pretty_print=True),
+                           lazy=lazy).fingerprint() == fingerprint
+
+    # Attach order of elements with different tags doesn't matter.
+    assert Domain(elements=first()[::-1]).fingerprint() == fingerprint
+
+
+def test_clone_is_independent():
+    domain = Domain(elements=first())
+    fingerprint = domain.fingerprint()
+
+    clone = domain.clone()
+    clone.replace_element(clone.find(Name), Name("other"))
+
+    assert clone.fingerprint() != fingerprint
+    assert domain.fingerprint() == fingerprint
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("index", range(len(first())))
+def test_changes_with_each_element(lazy, index):
+    domain = Domain(elements=first(), lazy=lazy)
+    fingerprint = domain.fingerprint()
+
+    data = domain.elements[index]
+    replacement = second()[index]
+    assert type(replacement) is type(data.element)
+    domain.replace_element(data, replacement)
+
+    mixed = first()
+    mixed[index] = replacement
+    expected = Domain(elements=mixed)
+
+    # The replaced element's digest must not be reused.
+    assert domain.fingerprint() == expected.fingerprint()
+    if expected.emit_xml() != Domain(elements=first()).emit_xml():
+        assert domain.fingerprint() != fingerprint
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_changes_with_attach_and_detach(lazy):
+    domain = Domain(elements=first(), lazy=lazy)
+    fingerprint = domain.fingerprint()
+
+    data = domain.attach_element(make_disk("/dev/sdc", "vdb"))
+    with_disk = domain.fingerprint()
+    assert with_disk != fingerprint
+
+    domain.detach_element(data)
+    assert domain.fingerprint() == fingerprint
+
+    domain.detach_element(domain.find(Description))
+    assert domain.fingerprint() not in (fingerprint, with_disk)
@@ -0,0 +1,114 @@
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.fleet import render_fleet, spec_elements
+from libvirt_vmcfg.fleet.cli import main
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+
+def spec(i: int) -> dict:
+    return {"name": f"vm{i}", "namespace": NAMESPACE, "memory": 1024 * i,
+            "vcpus": 1 + i % 4,
+            "disks": [{"target": "vda", "bus": "virtio",
+                       "path": f"/dev/vg/vm{i}", "format": "raw"}],
+            "interfaces": [{"bridge": "br0"}]}
+
+
+def spec_lines(count: int):
+    return [json.dumps(spec(i)) + "\n" for i in range(1, count + 1)]
+
+
+def expected_xml(i: int, pretty_print: bool = False) -> bytes:
+    domain = Domain(elements=spec_elements(spec(i)))
+    return domain.emit_xml(pretty_print=pretty_print, encoding="utf-8")
+
+
+def test_ordered_across_windows():
+    # jobs=2 and chunksize=1 give a window of 8 lines, so 50 lines go
+    # through several windows.
+    with ThreadPoolExecutor(4) as executor:
+        results = list(render_fleet(spec_lines(50), jobs=2, chunksize=1,
+                                    executor=executor))
+
+    assert [r.line for r in results] == list(range(1, 51))
+    assert [r.name for r in results] == [f"vm{i}" for i in range(1, 51)]
+    for i, result in enumerate(results, 1):
+        assert result.error is None
+        assert result.xml == expected_xml(i)
+
+
+def test_in_process_matches_pool():
+    lines = spec_lines(5)
+    serial = list(render_fleet(lines, jobs=1, pretty_print=True))
+    with ThreadPoolExecutor(2) as executor:
+        pooled = list(render_fleet(lines, jobs=2, chunksize=2,
+                                   pretty_print=True, executor=executor))
+
+    assert serial == pooled
+    assert serial[0].xml == expected_xml(1, pretty_print=True)
+
+
+def test_failures_are_reported_per_line():
+    lines = spec_lines(3)
+    lines[1:1] = ["\n", "not json\n", json.dumps({"name": "bad"}) + "\n",
+                  "[1, 2]\n"]
+
+    results = list(render_fleet(lines, jobs=1))
+    assert [r.line for r in results] == [1, 3, 4, 5, 6, 7]
+    assert [r.error is None for r in results] == [True, False, False, False,
+                                                  True, True]
+    assert results[1].error.startswith("JSONDecodeError")
+    assert results[2].name == "bad"
+    assert "memory" in results[2].error
+    assert "JSON object" in results[3].error
+    assert results[5].xml == expected_xml(3)
+
+
+def test_directory(tmp_path):
+    lines = spec_lines(2) + [json.dumps(dict(spec(3), name="../x")) + "\n"]
+    results = list(render_fleet(lines, jobs=1, directory=str(tmp_path)))
+
+    assert results[0].xml is None
+    assert results[0].path == str(tmp_path / "vm1.xml")
+    assert (tmp_path / "vm2.xml").read_bytes() == expected_xml(2)
+    assert results[2].error is not None
+    assert sorted(os.listdir(tmp_path)) == ["vm1.xml", "vm2.xml"]
+
+
+def test_cli(tmp_path, capsys):
+    spec_path = tmp_path / "fleet.jsonl"
+    spec_path.write_text("".join(spec_lines(3)), encoding="utf-8")
+    out_path = tmp_path / "out.xml"
+
+    assert main([str(spec_path), "-j", "1", "-o", str(out_path)]) == 0
+    assert out_path.read_bytes() == b"".join(expected_xml(i) + b"\n"
+                                             for i in range(1, 4))
+
+    spec_path.write_text("".join(spec_lines(1)) + "{}\n", encoding="utf-8")
+    assert main([str(spec_path), "-j", "1", "-d",
+                 str(tmp_path / "out")]) == 1
+    assert os.listdir(tmp_path / "out") == ["vm1.xml"]
+    assert f"{spec_path}:2: ?: " in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_cli_module(jobs):
+    proc = subprocess.run([sys.executable, "-m", "libvirt_vmcfg.fleet",
+                           "-j", jobs, "--chunksize", "1"],
+                          input="".join(spec_lines(4)).encode("utf-8"),
+                          env=dict(os.environ, PYTHONPATH=ROOT),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          check=True)
+
+    assert proc.stdout == b"".join(expected_xml(i) + b"\n"
+                                   for i in range(1, 5))
+    assert proc.stderr == b""
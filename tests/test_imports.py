@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = [
+    "libvirt_vmcfg.dom.elements.devices.disk",
+    "libvirt_vmcfg.dom.elements.devices.clock",
+    "libvirt_vmcfg.dom.elements.features.kvm",
+]
+
+# Our own modules' share of the import, in seconds; generous, so only real
+# regressions (such as importing every element up front) trip it.
+OWN_IMPORT_BUDGET = 0.25
+
+
+def import_fresh(*modules: str) -> Tuple[List[str], Dict[str, float]]:
+    """Import modules in a new interpreter.
+
+    Returns the names of the modules loaded, and the self time of each
+    module as reported by -X importtime, in seconds.
+    """
+    code = "; ".join([f"import {module}" for module in modules] +
+                     ["import sys", "print('\\n'.join(sys.modules))"])
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          env=env, check=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[0].startswith("import time:"):
+            try:
+                self_time = int(fields[0].split(":")[1]) / 1e6
+            except ValueError:
+                # The header line
+                continue
+
+            times[fields[2].strip()] = self_time
+
+    return proc.stdout.splitlines(), times
+
+
+def test_element_modules_load_lazily():
+    loaded, _ = import_fresh("libvirt_vmcfg.dom",
+                             "libvirt_vmcfg.dom.elements")
+    assert "libvirt_vmcfg.dom.elements" in loaded
+    for module in LAZY_MODULES:
+        assert module not in loaded
+
+
+def test_lazy_modules_load_on_first_use():
+    loaded, _ = import_fresh("libvirt_vmcfg.dom.elements.devices")
+    assert "libvirt_vmcfg.dom.elements.devices.disk" not in loaded
+
+    code = ("from libvirt_vmcfg.dom.elements.devices import Disk; "
+            "import sys; "
+            "print('libvirt_vmcfg.dom.elements.devices.disk' in sys.modules)")
+    proc = subprocess.run([sys.executable, "-c", code],
+                          env=dict(os.environ, PYTHONPATH=ROOT), check=True,
+                          stdout=subprocess.PIPE, universal_newlines=True)
+    assert proc.stdout.strip() == "True"
+
+
+def test_import_time_budget():
+    _, times = import_fresh("libvirt_vmcfg.dom",
+                            "libvirt_vmcfg.dom.elements")
+    own = sum(seconds for module, seconds in times.items()
+              if module.split(".")[0] == "libvirt_vmcfg")
+    assert own < OWN_IMPORT_BUDGET
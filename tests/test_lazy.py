@@ -0,0 +1,90 @@
+import pytest
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Description, Name
+from libvirt_vmcfg.dom.elements.devices import (BridgedInterface, Disk,
+                                                DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus)
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+
+def make_disk(path: str) -> Disk:
+    target = DiskTargetDisk(None, bus=TargetBus.VIRTIO)
+    return Disk(DiskSourceBlockPath(path), target, DriverOptions(Driver.QEMU))
+
+
+def build_pair():
+    domains = []
+    for lazy in (False, True):
+        elements = kvm_default_hardware(name="vm1", namespace=NAMESPACE,
+                                        memory=1024, vcpus=2)
+        domain = Domain(elements=elements, lazy=lazy)
+        domain.attach_element(BridgedInterface("br0",
+                                               mac="52:54:00:00:00:01"))
+        domain.attach_disks([make_disk(f"/dev/sd{c}") for c in "abc"])
+        domains.append(domain)
+
+    return domains
+
+
+def assert_same(eager: Domain, lazy: Domain) -> None:
+    for pretty_print in (False, True):
+        assert (lazy.emit_xml(pretty_print=pretty_print)
+                == eager.emit_xml(pretty_print=pretty_print))
+
+    assert lazy.fingerprint() == eager.fingerprint()
+    assert ([type(d.element) for d in lazy.elements]
+            == [type(d.element) for d in eager.elements])
+
+
+def test_initial_build():
+    assert_same(*build_pair())
+
+
+def test_find_and_replace():
+    eager, lazy = build_pair()
+    assert_same(eager, lazy)
+
+    for domain in (eager, lazy):
+        data = domain.find(Name)
+        assert data is not None
+        new = domain.replace_element(data, Name("vm2"))
+        assert domain.find(Name) is new
+        assert domain.find(Description) is None
+
+    assert_same(eager, lazy)
+    assert "<name>vm2</name>" in lazy.emit_xml()
+
+
+@pytest.mark.parametrize("index", [0, 1, 2])
+def test_detach(index):
+    eager, lazy = build_pair()
+
+    for domain in (eager, lazy):
+        domain.detach_element(domain.find_all(Disk)[index])
+        assert len(domain.find_all(Disk)) == 2
+
+    assert_same(eager, lazy)
+
+    # Freed target names get reused the same way.
+    for domain in (eager, lazy):
+        domain.attach_disks([make_disk("/dev/sdd")])
+
+    assert_same(eager, lazy)
+
+
+def test_changes_before_first_materialize():
+    eager, lazy = build_pair()
+
+    for domain in (eager, lazy):
+        domain.detach_element(domain.find_all(Disk)[1])
+        domain.replace_element(domain.find(Name), Name("vm3"))
+        domain.attach_element(Description("changed"))
+
+    assert lazy._dirty
+    assert_same(eager, lazy)
+    assert not lazy._dirty
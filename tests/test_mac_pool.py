@@ -0,0 +1,75 @@
+import pytest
+
+from libvirt_vmcfg.dom.elements.devices import BridgedInterface, MacPool
+
+
+def octets(mac: str):
+    return [int(o, 16) for o in mac.split(":")]
+
+
+def test_unique_across_batch_refills():
+    pool = MacPool(batch=4)
+    macs = [pool.allocate() for _ in range(1000)]
+
+    assert len(set(macs)) == len(macs) == len(pool)
+    for mac in macs:
+        first = octets(mac)[0]
+        # Locally administered unicast
+        assert first & 0x01 == 0
+        assert first & 0x02 == 0x02
+
+
+def test_prefix():
+    pool = MacPool("52:54:00", batch=16)
+    macs = [pool.allocate() for _ in range(100)]
+
+    assert all(mac.startswith("52:54:00:") for mac in macs)
+    assert len(set(macs)) == 100
+    assert all(len(octets(mac)) == 6 for mac in macs)
+
+
+@pytest.mark.parametrize("prefix", ["01:00:5e", "52:54:00:00:00:00", "5254",
+                                    "52:54:0"])
+def test_bad_prefix(prefix):
+    with pytest.raises(ValueError):
+        MacPool(prefix)
+
+
+def test_exhaustion_at_capacity():
+    pool = MacPool("52:54:00:00:00", batch=7)
+    macs = {pool.allocate() for _ in range(256)}
+    assert len(macs) == 256
+
+    with pytest.raises(ValueError):
+        pool.allocate()
+
+    # Releasing one makes exactly that one available again.
+    pool.release("52:54:00:00:00:2a")
+    assert pool.allocate() == "52:54:00:00:00:2a"
+
+
+def test_preloaded_and_added_addresses_are_skipped():
+    preload = [f"52:54:00:00:00:{i:02x}" for i in range(255)]
+    pool = MacPool("52:54:00:00:00", preload=preload)
+    # Addresses outside the prefix don't use up its capacity.
+    pool.add("02:00:00:00:00:01")
+
+    assert pool.allocate() == "52:54:00:00:00:ff"
+    with pytest.raises(ValueError):
+        pool.allocate()
+
+
+def test_explicit_duplicate_mac_is_rejected():
+    pool = MacPool("52:54:00")
+    mac = pool.allocate()
+
+    with pytest.raises(ValueError):
+        BridgedInterface("br0", mac=mac, pool=pool)
+
+    # Explicit addresses are claimed too.
+    BridgedInterface("br0", mac="52:54:00:aa:bb:cc", pool=pool)
+    assert "52:54:00:aa:bb:cc" in pool
+    with pytest.raises(ValueError):
+        BridgedInterface("br1", mac="52:54:00:AA:BB:CC", pool=pool)
+
+    assert BridgedInterface("br0", pool=pool).mac in pool
@@ -0,0 +1,92 @@
+import pytest
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Description, Opaque
+from libvirt_vmcfg.dom.elements.devices import (BridgedInterface, Disk,
+                                                DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus)
+from libvirt_vmcfg.dom.elements.opaque import OpaqueDevice
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+
+def make_disk(path: str) -> Disk:
+    target = DiskTargetDisk(None, bus=TargetBus.VIRTIO)
+    return Disk(DiskSourceBlockPath(path), target, DriverOptions(Driver.QEMU))
+
+
+def generated(name: str, vcpus: int, disks: int) -> Domain:
+    elements = kvm_default_hardware(name=name, namespace=NAMESPACE,
+                                    memory=vcpus * 1024**3, vcpus=vcpus)
+    elements.append(Description(f"{name} & <friends> 漢字"))
+    elements.append(BridgedInterface("br0", mac="52:54:00:00:00:01"))
+    domain = Domain(elements=elements)
+    domain.attach_disks([make_disk(f"/dev/vg/{name}-{i}")
+                         for i in range(disks)])
+    return domain
+
+
+@pytest.mark.parametrize("pretty_print", [False, True])
+@pytest.mark.parametrize("name,vcpus,disks", [("vm1", 1, 0), ("vm2", 4, 1),
+                                              ("vm3", 16, 30)])
+def test_generated_round_trip(name, vcpus, disks, pretty_print):
+    xml = generated(name, vcpus, disks).emit_xml(pretty_print=pretty_print)
+    parsed = Domain.from_xml(xml)
+
+    assert parsed.emit_xml(pretty_print=pretty_print) == xml
+    assert not any(isinstance(d.element, Opaque) for d in parsed.elements)
+    assert len(parsed.find_all(Disk)) == disks
+
+
+def test_lazy_parse_round_trip():
+    xml = generated("vm1", 2, 3).emit_xml()
+    assert Domain.from_xml(xml, lazy=True).emit_xml() == xml
+
+
+def test_unknown_elements_stay_opaque():
+    xml = ('<domain type="kvm"><name>vm1</name>'
+           '<frobnicate level="3"><knob/></frobnicate>'
+           '<devices><watchdog model="i6300esb" action="reset"/></devices>'
+           '</domain>')
+    parsed = Domain.from_xml(xml)
+    kinds = {type(d.element): d.element for d in parsed.elements}
+
+    assert kinds[Opaque].node.tag == "frobnicate"
+    assert kinds[OpaqueDevice].node.tag == "watchdog"
+    assert parsed.emit_xml() == xml
+
+
+def test_ignored_tags_are_dropped():
+    xml = ('<domain type="kvm"><devices>'
+           '<disk type="block" device="disk"><driver name="qemu"/>'
+           '<source dev="/dev/sda"/><target dev="vda" bus="virtio"/>'
+           '<address type="pci" bus="0x00" slot="0x04"/></disk>'
+           '</devices></domain>')
+
+    kept = Domain.from_xml(xml)
+    assert [type(d.element) for d in kept.elements] == [OpaqueDevice]
+
+    dropped = Domain.from_xml(xml, ignore=["address"])
+    assert [type(d.element) for d in dropped.elements] == [Disk]
+    assert "<address" not in dropped.emit_xml()
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_opaque_disks_claim_their_targets(lazy):
+    xml = ('<domain type="kvm"><name>vm1</name><devices>'
+           '<disk type="file" device="disk"><source file="/a" extra="1"/>'
+           '<target dev="vda" bus="virtio"/></disk>'
+           '<disk type="file" device="disk"><source file="/b" extra="1"/>'
+           '<target dev="vdb" bus="virtio"/></disk>'
+           '</devices></domain>')
+    domain = Domain.from_xml(xml, lazy=lazy)
+
+    assert len(domain.find_all(OpaqueDevice)) == 2
+    assert domain.disk_targets() == {"vda", "vdb"}
+
+    data = domain.attach_disks([make_disk("/dev/sdc")])
+    assert data[0].element.target.path == "vdc"
+    assert domain.emit_xml().count("<disk ") == 3
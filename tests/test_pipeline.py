@@ -0,0 +1,174 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+import pytest
+from lxml import etree
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Element, Name
+from libvirt_vmcfg.dom.stats import instrument
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+from libvirt_vmcfg.fleet.fake import FakeLibvirt
+from libvirt_vmcfg.fleet.pipeline import define_domains
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+
+class Broken(Element):
+    __slots__ = ()
+
+    def attach_xml(self, root: etree._Element):
+        raise RuntimeError("broken element")
+
+
+def make_domain(i: int, lazy: bool = False) -> Domain:
+    return Domain(elements=kvm_default_hardware(
+        name=f"vm{i}", namespace=NAMESPACE, memory=1024, vcpus=2), lazy=lazy)
+
+
+def collect(domains, consumer, **kwargs) -> List:
+    async def run():
+        return [r async for r in define_domains(domains, consumer, **kwargs)]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_every_domain_is_defined(ordered):
+    conn = FakeLibvirt()
+    domains = [make_domain(i) for i in range(20)]
+    results = collect(domains, conn.define_xml, concurrency=4,
+                      ordered=ordered)
+
+    assert sorted(r.index for r in results) == list(range(20))
+    for result in results:
+        assert result.error is None
+        assert result.domain is domains[result.index]
+        assert result.xml == result.domain.emit_xml(encoding="utf-8")
+        assert result.result == f"vm{result.index}"
+
+    assert sorted(conn.domains) == sorted(f"vm{i}" for i in range(20))
+
+
+def test_ordered():
+    # Later domains finish first, so only ordered mode keeps input order.
+    async def consumer(xml: bytes) -> str:
+        name = etree.fromstring(xml).findtext("name")
+        await asyncio.sleep(0.002 * (10 - int(name[2:])))
+        return name
+
+    domains = [make_domain(i) for i in range(10)]
+    ordered = collect(domains, consumer, concurrency=10, ordered=True)
+    assert [r.index for r in ordered] == list(range(10))
+
+    unordered = collect(domains, consumer, concurrency=10)
+    assert [r.index for r in unordered] != list(range(10))
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_backpressure(ordered):
+    conn = FakeLibvirt(latency=0.001)
+    pulled = 0
+
+    def domains() -> Iterator[Domain]:
+        nonlocal pulled
+        for i in range(30):
+            pulled += 1
+            yield make_domain(i)
+
+    async def run():
+        seen = []
+        async for result in define_domains(domains(), conn.define_xml,
+                                           concurrency=3, ordered=ordered):
+            # Nothing more is taken from the input than can be in flight.
+            assert pulled - len(seen) <= 3
+            seen.append(result)
+            await asyncio.sleep(0.002)
+
+        return seen
+
+    assert len(asyncio.run(run())) == 30
+    assert conn.max_in_flight <= 3
+    assert conn.calls == 30
+
+
+def test_async_iterable_input():
+    async def domains():
+        for i in range(5):
+            await asyncio.sleep(0)
+            yield make_domain(i)
+
+    conn = FakeLibvirt()
+    results = collect(domains(), conn.define_xml, ordered=True)
+    assert [r.result for r in results] == [f"vm{i}" for i in range(5)]
+
+
+def test_errors_are_reported():
+    conn = FakeLibvirt()
+    broken = Domain(elements=[Name("broken"), Broken()], lazy=True)
+    # Same name as vm1, but a different UUID.
+    clash = Domain(elements=[Name("vm1")])
+    domains = [make_domain(0), broken, make_domain(1), clash,
+               make_domain(2)]
+
+    results = collect(domains, conn.define_xml, concurrency=1, ordered=True)
+    errors = [r.error for r in results]
+
+    assert isinstance(errors[1], RuntimeError) and results[1].xml is None
+    assert isinstance(errors[3], ValueError) and results[3].xml is not None
+    assert [errors[i] for i in (0, 2, 4)] == [None] * 3
+    assert sorted(conn.domains) == ["vm0", "vm1", "vm2"]
+
+
+def test_bad_concurrency():
+    with pytest.raises(ValueError):
+        collect([make_domain(0)], FakeLibvirt().define_xml, concurrency=0)
+
+
+def test_closing_early_cancels():
+    conn = FakeLibvirt(latency=0.05)
+
+    async def run():
+        results = define_domains((make_domain(i) for i in range(10)),
+                                 conn.define_xml, concurrency=4)
+        first = await results.__anext__()
+        await results.aclose()
+        return first
+
+    assert asyncio.run(run()).error is None
+    assert conn.calls <= 4
+    assert len(conn.domains) < 10
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_instrumentation_reaches_executor_threads(lazy):
+    # Lazy domains are built in the executor's threads too.
+    domains = [make_domain(i, lazy) for i in range(8)]
+
+    async def run():
+        with ThreadPoolExecutor(4) as executor:
+            with instrument() as stats:
+                async for _ in define_domains(domains,
+                                              FakeLibvirt().define_xml,
+                                              executor=executor):
+                    pass
+
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats.emit_calls == 8
+    if lazy:
+        assert stats.elements[Name].attach_calls == 8
+    else:
+        assert Name not in stats.elements
+
+    for domain in domains:
+        assert domain.stats().emit_calls == 1
+
+
+def test_not_instrumented_outside_instrument():
+    domains = [make_domain(i, lazy=True) for i in range(4)]
+    collect(domains, FakeLibvirt().define_xml)
+    assert all(d.stats().emit_calls == 0 for d in domains)
@@ -0,0 +1,52 @@
+from libvirt_vmcfg.pool import DirPool
+from libvirt_vmcfg.pool.placement import PoolSpace, plan_placement
+from libvirt_vmcfg.vol import Preallocation, Volume
+
+
+def make_space(name: str, capacity: int, **kwargs) -> PoolSpace:
+    return PoolSpace(DirPool(name, f"/srv/{name}"), capacity, **kwargs)
+
+
+def names(volumes):
+    return [volume.name for volume in volumes]
+
+
+def test_preallocated_volumes_are_not_overcommitted():
+    space = make_space("pool", 100, overcommit=4.0)
+    volumes = [Volume("full-1", 60, preallocation=Preallocation.FULL),
+               Volume("full-2", 60, preallocation=Preallocation.FULL)]
+    placement = plan_placement(volumes, [space])
+
+    assert names(placement.batches["pool"]) == ["full-1"]
+    assert names(placement.unplaced) == ["full-2"]
+
+
+def test_mixed_preallocated_and_sparse_volumes():
+    space = make_space("pool", 100, allocated=10, overcommit=4.0)
+    volumes = [Volume("sparse", 200, allocation=0),
+               Volume("full", 20, preallocation=Preallocation.FULL),
+               Volume("partial", 60, allocation=4),
+               Volume("default", 3),
+               Volume("tiny", 8, allocation=0)]
+    placement = plan_placement(volumes, [space])
+
+    # Of the 90 bytes free, the sparse volume takes 200 / 4, the full one
+    # 20, the partial one 4 + 56 / 4 and the tiny one 8 / 4, which leaves
+    # nothing for the smallest volume, allocated in full.
+    assert names(placement.batches["pool"]) == ["sparse", "full", "partial",
+                                                "tiny"]
+    assert names(placement.unplaced) == ["default"]
+
+
+def test_sparse_volume_goes_to_pool_overcommitting_more():
+    thick = make_space("thick", 100)
+    thin = make_space("thin", 90, overcommit=4.0)
+    volumes = [Volume("sparse", 200, allocation=0),
+               Volume("full", 80)]
+    placement = plan_placement(volumes, [thick, thin])
+
+    # The thick pool is emptier, but only the thin one fits the sparse
+    # volume.
+    assert names(placement.batches["thin"]) == ["sparse"]
+    assert names(placement.batches["thick"]) == ["full"]
+    assert placement.unplaced == []
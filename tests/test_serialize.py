@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional, Union
+
+import pytest
+from lxml import etree
+
+from libvirt_vmcfg.common.util.serialize import FieldSerializer
+from libvirt_vmcfg.dom.elements.devices import (Disk, DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus)
+from libvirt_vmcfg.dom.elements.devices.disk import (DriverCache,
+                                                     DriverDetectZeroes,
+                                                     DriverDiscard,
+                                                     DriverErrorPolicy,
+                                                     DriverIO, DriverType,
+                                                     IOTuneOptions)
+
+
+class Colour(Enum):
+    RED = "red"
+
+
+@dataclass
+class Fields:
+    flag: Optional[bool] = None
+    colour: Optional[Colour] = None
+    count: Optional[int] = None
+    label: Optional[str] = None
+
+
+def disk_tag(driver_opts: DriverOptions,
+             iotune_opts: Optional[IOTuneOptions] = None) -> etree._Element:
+    disk = Disk(DiskSourceBlockPath("/dev/sda"),
+                DiskTargetDisk("vda", bus=TargetBus.VIRTIO), driver_opts,
+                iotune_opts=iotune_opts)
+    root = etree.Element("domain")
+    [tag] = disk.attach_xml(root)
+    return tag
+
+
+def test_coercion_by_hint():
+    serializer = FieldSerializer(Fields)
+    obj = Fields(flag=False, colour=Colour.RED, count=0, label="x")
+    assert list(serializer.items(obj)) == [("flag", "no"),
+                                           ("colour", "red"),
+                                           ("count", "0"),
+                                           ("label", "x")]
+    assert list(serializer.items(Fields())) == []
+    assert serializer.values(Fields(count=3)) == [3]
+
+
+def test_exclude_and_bool_format():
+    serializer = FieldSerializer(Fields, exclude=("label",),
+                                 bool_format=lambda b: "on" if b else "off")
+    tag = etree.Element("tag")
+    serializer.set_attributes(Fields(flag=True, label="x"), tag)
+    assert dict(tag.attrib) == {"flag": "on"}
+
+
+@pytest.mark.parametrize("hint", [Union[int, str], Optional[Union[int, str]],
+                                  List[int], Optional[List[Colour]]])
+def test_unsupported_hints_are_rejected(hint):
+    @dataclass
+    class Bad:
+        value: hint = None  # type: ignore
+
+    with pytest.raises(TypeError):
+        FieldSerializer(Bad)
+
+
+def test_driver_attributes():
+    driver = disk_tag(DriverOptions(
+        Driver.QEMU, type=DriverType.QCOW2, cache=DriverCache.NONE,
+        io=DriverIO.NATIVE, error_policy=DriverErrorPolicy.STOP,
+        rerror_policy=DriverErrorPolicy.REPORT, ioeventfd=True,
+        event_idx=False, copy_on_read=True, discard=DriverDiscard.UNMAP,
+        detect_zeroes=DriverDetectZeroes.UNMAP, queues=4,
+    )).find("driver")
+
+    assert list(driver.items()) == [
+        ("name", "qemu"), ("type", "qcow2"), ("cache", "none"),
+        ("io", "native"), ("error_policy", "stop"),
+        ("rerror_policy", "report"), ("ioeventfd", "on"),
+        ("event_idx", "off"), ("copy_on_read", "on"), ("discard", "unmap"),
+        ("detect_zeroes", "unmap"), ("queues", "4"),
+    ]
+
+
+def test_driver_unset_attributes_are_omitted():
+    driver = disk_tag(DriverOptions(Driver.QEMU)).find("driver")
+    assert dict(driver.attrib) == {"name": "qemu"}
+
+
+def test_iotune_elements():
+    iotune = disk_tag(DriverOptions(Driver.QEMU), IOTuneOptions(
+        total_bytes_sec=1000, read_iops_sec_max=50,
+        read_iops_sec_max_length=10, group_name="grp",
+    )).find("iotune")
+
+    assert [(child.tag, child.text) for child in iotune] == [
+        ("total_bytes_sec", "1000"), ("read_iops_sec_max", "50"),
+        ("read_iops_sec_max_length", "10"), ("group_name", "grp"),
+    ]
+
+
+def test_iotune_omitted_when_empty():
+    tag = disk_tag(DriverOptions(Driver.QEMU), IOTuneOptions())
+    assert tag.find("iotune") is None
+    assert disk_tag(DriverOptions(Driver.QEMU)).find("iotune") is None
+
+
+def test_every_serialized_dataclass_is_supported():
+    from libvirt_vmcfg.dom.elements.features.kvm import (HyperVFeatureSet,
+                                                         KVMFeatureSet)
+
+    for cls in (DriverOptions, IOTuneOptions, KVMFeatureSet,
+                HyperVFeatureSet):
+        FieldSerializer(cls)
@@ -0,0 +1,90 @@
+import io
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Description, Name
+from libvirt_vmcfg.dom.elements.devices import (Disk, DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus)
+from libvirt_vmcfg.dom.stats import RenderStats, current_stats, instrument
+
+
+def make_disk(path: str, target: str) -> Disk:
+    return Disk(DiskSourceBlockPath(path),
+                DiskTargetDisk(target, bus=TargetBus.VIRTIO),
+                DriverOptions(Driver.QEMU))
+
+
+def make_domain() -> Domain:
+    return Domain(elements=[Name("vm1"), make_disk("/dev/sda", "vda"),
+                            make_disk("/dev/sdb", "vdb")])
+
+
+def test_per_element_type():
+    hooked = []
+    with instrument(hook=hooked.append) as stats:
+        assert current_stats() is stats
+        domain = make_domain()
+        domain.detach_element(domain.find_all(Disk)[1])
+        domain.emit_xml()
+        domain.write_to(io.BytesIO())
+
+    assert current_stats() is None
+    assert hooked == [stats]
+    assert set(stats.elements) == {Name, Disk}
+
+    name, disk = stats.elements[Name], stats.elements[Disk]
+    assert (name.attach_calls, name.detach_calls, name.nodes) == (1, 0, 1)
+    # <disk> with <driver>, <source> and <target>, twice
+    assert (disk.attach_calls, disk.detach_calls, disk.nodes) == (2, 1, 8)
+    assert disk.attach_time > 0 and disk.detach_time > 0
+    assert name.attach_time > 0 and name.detach_time == 0
+    assert stats.emit_calls == 2 and stats.emit_time > 0
+
+    assert domain.stats() == stats
+    metrics = stats.as_metrics(prefix="test")
+    assert metrics["test.element.Disk.attach_calls"] == 2
+    assert metrics["test.emit_calls"] == 2
+
+
+def test_nothing_recorded_outside_instrument():
+    domain = make_domain()
+    domain.attach_element(Description("text"))
+    domain.emit_xml()
+
+    assert current_stats() is None
+    assert domain.stats() == RenderStats()
+
+    with instrument() as stats:
+        domain.emit_xml()
+
+    assert stats.elements == {}
+    assert stats.emit_calls == 1
+
+    # Only what happened inside the block is kept.
+    domain.emit_xml()
+    assert domain.stats().emit_calls == 1
+
+
+def test_lazy_domains_record_when_built():
+    domain = Domain(elements=[Name("vm1"), make_disk("/dev/sda", "vda")],
+                    lazy=True)
+    with instrument() as stats:
+        domain.emit_xml()
+
+    assert stats.elements[Disk].attach_calls == 1
+    assert stats.elements[Name].attach_calls == 1
+
+
+def test_nested_blocks():
+    with instrument() as outer:
+        make_domain().emit_xml()
+        with instrument() as inner:
+            make_domain().emit_xml()
+
+        with instrument(merge=False) as separate:
+            make_domain().emit_xml()
+
+    assert inner.emit_calls == separate.emit_calls == 1
+    assert inner.elements[Disk].attach_calls == 2
+    assert outer.emit_calls == 2
+    assert outer.elements[Disk].attach_calls == 4
@@ -0,0 +1,129 @@
+import io
+
+import pytest
+from lxml import etree
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements.devices import (BridgedInterface, Disk,
+                                                DiskSourceBlockPath,
+                                                DiskTargetDisk, Driver,
+                                                DriverOptions, TargetBus,
+                                                derive_mac)
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+from libvirt_vmcfg.fleet.store import FleetStore
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+# Comments, processing instructions, namespaces and odd whitespace
+AWKWARD = b"""<domain xmlns:x="urn:x" type="kvm">
+  <!-- a comment -->
+  <name>odd</name>
+  <?pi some data?>
+  <metadata>
+    <app:info xmlns:app="urn:app" app:n="3">a &amp; b<x:y/></app:info>
+    <x:z x:a="1">tail follows</x:z>   trailing
+  </metadata>
+  <devices><emulator>/usr/bin/qemu</emulator></devices>
+</domain>"""
+
+
+def make_domain(i: int, memory: int = 1024) -> Domain:
+    elements = kvm_default_hardware(name=f"vm{i}", namespace=NAMESPACE,
+                                    memory=memory, vcpus=2)
+    elements += [
+        Disk(DiskSourceBlockPath(f"/dev/vg/vm{i}"),
+             DiskTargetDisk("vda", bus=TargetBus.VIRTIO),
+             DriverOptions(Driver.QEMU)),
+        BridgedInterface("br0", mac=derive_mac(NAMESPACE, f"vm{i}")),
+    ]
+    return Domain(elements=elements)
+
+
+@pytest.mark.parametrize("cache_size", [0, 2, 256])
+@pytest.mark.parametrize("pretty_print", [False, True])
+def test_generated_round_trip(cache_size, pretty_print):
+    store = FleetStore(cache_size=cache_size)
+    domains = [make_domain(i) for i in range(20)]
+    for i, domain in enumerate(domains):
+        assert store.add(domain) == f"vm{i}"
+
+    for i, domain in enumerate(domains):
+        expected = domain.emit_xml(pretty_print=pretty_print)
+        assert store.emit_xml(f"vm{i}", pretty_print=pretty_print) == \
+            expected
+
+        out = io.BytesIO()
+        store.write_to(f"vm{i}", out, pretty_print=pretty_print)
+        assert out.getvalue() == domain.emit_xml(pretty_print=pretty_print,
+                                                 encoding="utf-8")
+
+    # Most of each domain is shared.
+    nodes = sum(1 for d in domains for _ in d.root.iter())
+    assert store.fragments < nodes // 4
+
+
+@pytest.mark.parametrize("cache_size", [0, 256])
+def test_awkward_round_trip(cache_size):
+    store = FleetStore(cache_size=cache_size)
+    # Twice, so the subtrees are shared and come from the cache.
+    store.add(etree.fromstring(AWKWARD))
+    store.add(etree.fromstring(AWKWARD.replace(b"odd", b"odd2")))
+
+    assert etree.tostring(store.tree("odd")) == AWKWARD
+    assert store.emit_xml("odd2", encoding="utf-8") == \
+        AWKWARD.replace(b"odd", b"odd2")
+
+
+def test_replace_under_same_name():
+    store = FleetStore()
+    store.add(make_domain(1))
+    fragments = store.fragments
+
+    store.add(make_domain(1))
+    assert len(store) == 1 and store.fragments == fragments
+
+    bigger = make_domain(1, memory=4096)
+    store.add(bigger)
+    assert len(store) == 1
+    assert store.emit_xml("vm1") == bigger.emit_xml()
+    assert store.fragments == fragments
+
+    store.add(make_domain(2))
+    store.add(make_domain(1))
+    assert store.emit_xml("vm1") == make_domain(1).emit_xml()
+    assert store.emit_xml("vm2") == make_domain(2).emit_xml()
+
+
+def test_fragments_freed():
+    store = FleetStore()
+    names = [store.add(make_domain(i)) for i in range(10)]
+    store.add(etree.fromstring(AWKWARD))
+    # Built, so some are cached as trees.
+    store.tree("vm3")
+    assert store.fragments > 0
+
+    for name in names[::2] + names[1::2] + ["odd"]:
+        store.remove(name)
+
+    assert len(store) == 0
+    assert store.fragments == 0
+    assert store._trees == {} and not any(store._refs)
+
+    # Freed slots are reused.
+    store.add(make_domain(0))
+    assert store.emit_xml("vm0") == make_domain(0).emit_xml()
+
+
+def test_bad_domains():
+    store = FleetStore()
+    with pytest.raises(ValueError):
+        store.add(etree.fromstring("<network><name>n</name></network>"))
+
+    with pytest.raises(ValueError):
+        store.add(etree.fromstring("<domain type='kvm'/>"))
+
+    with pytest.raises(KeyError):
+        store.remove("missing")
+
+    assert store.fragments == 0
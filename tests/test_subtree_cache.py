@@ -0,0 +1,81 @@
+import pytest
+from lxml import etree
+
+from libvirt_vmcfg.common.util import bool_to_str
+from libvirt_vmcfg.dom.elements import subtree_cache
+from libvirt_vmcfg.dom.elements.devices import Clock, TimerPIT, TimerRTC
+from libvirt_vmcfg.dom.elements.features import (FeatureBooleanState,
+                                                 Features)
+from libvirt_vmcfg.dom.elements.features.common import ACPI, PAE, HAP
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    subtree_cache.clear()
+    yield
+    subtree_cache.clear()
+
+
+def attach(element) -> bytes:
+    root = etree.Element("domain")
+    element.attach_xml(root)
+    return etree.tostring(root)
+
+
+class ValuedPIT(TimerPIT):
+    __slots__ = ("value",)
+
+    def __init__(self, value: str):
+        super().__init__()
+        self.value = value
+
+    def attach_xml(self, clock_tag: etree._Element) -> None:
+        timer_tag, _ = self.setup_timer_common(clock_tag)
+        timer_tag.set("value", self.value)
+
+
+class ValuedHAP(HAP):
+    __slots__ = ("value",)
+
+    def __init__(self, state: bool, value: str):
+        super().__init__(state)
+        self.value = value
+
+    def xml_tag(self) -> etree._Element:
+        return etree.Element(self.name, state=bool_to_str(self.state),
+                             value=self.value)
+
+
+def test_builtin_clock_is_cached():
+    first = attach(Clock(timers=[TimerRTC(), TimerPIT()]))
+    assert attach(Clock(timers=[TimerRTC(), TimerPIT()])) == first
+    assert (subtree_cache.hits, subtree_cache.misses) == (1, 1)
+
+
+def test_clock_with_subclassed_timer_is_not_cached():
+    assert b'value="aaa"' in attach(Clock(timers=[ValuedPIT("aaa")]))
+    assert b'value="bbb"' in attach(Clock(timers=[ValuedPIT("bbb")]))
+    assert len(subtree_cache) == 0
+
+
+def test_builtin_features_are_cached():
+    first = attach(Features([PAE(), ACPI(), HAP(True)]))
+    assert attach(Features([PAE(), ACPI(), HAP(True)])) == first
+    assert b'state="no"' in attach(Features([PAE(), ACPI(), HAP(False)]))
+    assert (subtree_cache.hits, subtree_cache.misses) == (1, 2)
+
+
+def test_features_with_subclassed_feature_are_not_cached():
+    assert b'value="aaa"' in attach(Features([ValuedHAP(True, "aaa")]))
+    assert b'value="bbb"' in attach(Features([ValuedHAP(True, "bbb")]))
+    assert len(subtree_cache) == 0
+
+
+def test_unmarked_feature_subclass_is_not_keyed():
+    class Custom(FeatureBooleanState):
+        __slots__ = ()
+
+        name = "custom"
+
+    assert Custom(True).subtree_key() is None
+    assert HAP(True).subtree_key() is not None
@@ -0,0 +1,78 @@
+import pytest
+from lxml import etree
+
+from libvirt_vmcfg import validate as validate_module
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Description, Name
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+from libvirt_vmcfg.validate import (SCHEMA_DIR_ENV, load_schema, schema_dir,
+                                    validate, validate_all,
+                                    validation_errors)
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+# Just a name, nothing else.
+TINY_SCHEMA = """\
+<element name="domain" xmlns="http://relaxng.org/ns/structure/1.0">
+  <attribute name="type"/>
+  <element name="name"><text/></element>
+</element>
+"""
+
+
+@pytest.fixture
+def tiny_schema(tmp_path, monkeypatch):
+    (tmp_path / "domain.rng").write_text(TINY_SCHEMA, encoding="utf-8")
+    monkeypatch.setenv(SCHEMA_DIR_ENV, str(tmp_path))
+    return tmp_path
+
+
+def test_libvirt_schemas():
+    try:
+        schema_dir()
+    except FileNotFoundError:
+        pytest.skip("libvirt's schemas aren't installed")
+
+    domain = Domain(elements=kvm_default_hardware(
+        name="vm1", namespace=NAMESPACE, memory=1024, vcpus=2))
+    assert validation_errors(domain) == []
+
+
+def test_env_dir_and_cache(tiny_schema):
+    assert schema_dir() == str(tiny_schema)
+
+    before = validate_module._load_schema.cache_info()
+    schema = load_schema("domain")
+    assert load_schema("domain", str(tiny_schema)) is schema
+    after = validate_module._load_schema.cache_info()
+    assert after.hits - before.hits >= 1
+
+
+def test_valid_and_invalid(tiny_schema):
+    good = Domain(elements=[Name("vm1")])
+    bad = Domain(elements=[Name("vm1"), Description("extra")], lazy=True)
+
+    assert validation_errors(good) == []
+    validate(good)
+
+    errors = validation_errors(bad)
+    assert len(errors) == 1
+    assert errors[0].startswith("/domain")
+
+    with pytest.raises(ValueError) as info:
+        validate(bad)
+    assert info.value.args[1] == errors
+
+    assert validate_all([good, bad, good.root]) == {1: errors}
+
+
+def test_unknown_root_tag(tiny_schema):
+    with pytest.raises(ValueError):
+        validation_errors(etree.Element("network"))
+
+
+def test_env_dir_without_schemas(tmp_path, monkeypatch):
+    monkeypatch.setenv(SCHEMA_DIR_ENV, str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        schema_dir()
@@ -0,0 +1,131 @@
+import io
+
+import pytest
+from lxml import etree
+
+from libvirt_vmcfg.vol import (VIR_STORAGE_VOL_CREATE_PREALLOC_METADATA,
+                               BackingStore, Compat, Preallocation, Volume,
+                               VolumeFormat, emit_volumes, write_volumes)
+
+
+GIB = 1024**3
+
+
+def tree(volume: Volume) -> etree._Element:
+    return etree.fromstring(volume.emit_xml(encoding="utf-8"))
+
+
+def test_minimal():
+    volume = Volume("disk.img", GIB)
+    assert volume.emit_xml() == ("<volume><name>disk.img</name>"
+                                 "<capacity>1073741824</capacity></volume>")
+    assert volume.create_flags == 0
+
+
+@pytest.mark.parametrize("allocation", [0, GIB // 2, GIB])
+def test_allocation(allocation):
+    root = tree(Volume("disk.img", GIB, allocation=allocation))
+    assert root.findtext("allocation") == str(allocation)
+
+
+@pytest.mark.parametrize("allocation", [-1, GIB + 1])
+def test_allocation_out_of_range(allocation):
+    with pytest.raises(ValueError):
+        Volume("disk.img", GIB, allocation=allocation)
+
+
+def test_full_preallocation():
+    volume = Volume("disk.img", GIB, preallocation=Preallocation.FULL)
+    assert volume.allocation == GIB
+    assert tree(volume).findtext("allocation") == str(GIB)
+    assert volume.create_flags == 0
+
+    with pytest.raises(ValueError):
+        Volume("disk.img", GIB, allocation=0,
+               preallocation=Preallocation.FULL)
+
+
+@pytest.mark.parametrize("format", list(VolumeFormat))
+def test_format(format):
+    root = tree(Volume("disk.img", GIB, format=format))
+    assert root.find("target/format").get("type") == format.value
+    assert root.find("target/compat") is None
+    assert root.find("target/features") is None
+
+
+def test_qcow2_features():
+    volume = Volume("disk.qcow2", GIB, format=VolumeFormat.QCOW2,
+                    compat=Compat.V1_1, cluster_size=64 * 1024,
+                    lazy_refcounts=True, extended_l2=True,
+                    preallocation=Preallocation.METADATA)
+    target = tree(volume).find("target")
+
+    assert target.findtext("compat") == "1.1"
+    cluster = target.find("clusterSize")
+    assert (cluster.text, cluster.get("unit")) == ("65536", "B")
+    assert [f.tag for f in target.find("features")] == ["lazy_refcounts",
+                                                        "extended_l2"]
+    assert volume.create_flags == VIR_STORAGE_VOL_CREATE_PREALLOC_METADATA
+    # Metadata preallocation is a flag, not part of the XML.
+    assert volume.allocation is None
+    assert tree(volume).find("allocation") is None
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"lazy_refcounts": True},
+    {"extended_l2": True},
+    {"cluster_size": 65536},
+    {"compat": Compat.V1_1},
+    {"preallocation": Preallocation.METADATA},
+    {"format": VolumeFormat.RAW, "compat": Compat.V1_1},
+    {"format": VolumeFormat.QCOW2, "compat": Compat.V0_10,
+     "lazy_refcounts": True},
+    {"format": VolumeFormat.QCOW2, "cluster_size": 3000},
+    {"format": VolumeFormat.QCOW2, "cluster_size": 0},
+])
+def test_invalid_options(kwargs):
+    with pytest.raises(ValueError):
+        Volume("disk.img", GIB, **kwargs)
+
+
+@pytest.mark.parametrize("format", [None, VolumeFormat.QCOW2])
+def test_backing_store(format):
+    volume = Volume("clone.qcow2", GIB, format=VolumeFormat.QCOW2,
+                    backing_store=BackingStore("/images/base.qcow2", format))
+    backing = tree(volume).find("backingStore")
+
+    assert backing.findtext("path") == "/images/base.qcow2"
+    if format is None:
+        assert backing.find("format") is None
+    else:
+        assert backing.find("format").get("type") == "qcow2"
+
+
+def test_write_to_matches_emit_xml():
+    volume = Volume("disk.qcow2", GIB, format=VolumeFormat.QCOW2,
+                    backing_store=BackingStore("/images/base.qcow2"))
+    out = io.BytesIO()
+    volume.write_to(out, pretty_print=True)
+    assert out.getvalue() == volume.emit_xml(pretty_print=True,
+                                             encoding="utf-8")
+
+
+def test_write_volumes(tmp_path):
+    volumes = [Volume(f"disk{i}.img", GIB, allocation=0) for i in range(3)]
+    path = tmp_path / "volumes.xml"
+    write_volumes(str(path), volumes)
+
+    lines = path.read_bytes().splitlines()
+    assert lines == list(emit_volumes(volumes))
+    assert [etree.fromstring(line).findtext("name") for line in lines] == [
+        "disk0.img", "disk1.img", "disk2.img"]
+
+
+def test_write_volumes_pretty_print():
+    volumes = [Volume(f"disk{i}.img", GIB) for i in range(2)]
+    out = io.BytesIO()
+    write_volumes(out, volumes, pretty_print=True)
+
+    documents = list(emit_volumes(volumes, pretty_print=True))
+    assert all(d.endswith(b"\n") for d in documents)
+    assert out.getvalue() == b"".join(documents)
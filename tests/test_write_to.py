@@ -0,0 +1,67 @@
+import gzip
+import io
+
+import pytest
+
+from libvirt_vmcfg.dom import Domain
+from libvirt_vmcfg.dom.elements import Description
+from libvirt_vmcfg.dom.profiles.linux_virtio import kvm_default_hardware
+
+
+NAMESPACE = "0b7c3d46-9f3e-4a8e-8c1d-5d6f2a9b4e10"
+
+
+def make_domain(name: str) -> Domain:
+    elements = kvm_default_hardware(name=name, namespace=NAMESPACE,
+                                    memory=1024, vcpus=2)
+    elements.append(Description("a&b<c>d\"e\n漢字"))
+    return Domain(elements=elements)
+
+
+def expected(domain: Domain, pretty_print: bool) -> bytes:
+    xml = domain.emit_xml(pretty_print=pretty_print, encoding="utf-8")
+    assert isinstance(xml, bytes)
+    return xml
+
+
+@pytest.mark.parametrize("compression", [0, 6])
+@pytest.mark.parametrize("pretty_print", [False, True])
+def test_file_object(pretty_print, compression):
+    domain = make_domain("vm1")
+    out = io.BytesIO()
+    domain.write_to(out, pretty_print=pretty_print, compression=compression)
+
+    data = out.getvalue()
+    if compression:
+        data = gzip.decompress(data)
+
+    assert data == expected(domain, pretty_print)
+
+
+@pytest.mark.parametrize("compression", [0, 6])
+@pytest.mark.parametrize("pretty_print", [False, True])
+def test_path(tmp_path, pretty_print, compression):
+    domain = make_domain("vm1")
+    path = tmp_path / "vm1.xml"
+    domain.write_to(str(path), pretty_print=pretty_print,
+                    compression=compression)
+
+    data = path.read_bytes()
+    if compression:
+        data = gzip.decompress(data)
+
+    assert data == expected(domain, pretty_print)
+
+
+@pytest.mark.parametrize("compression", [0, 6])
+def test_several_domains_into_one_stream(compression):
+    domains = [make_domain(f"vm{i}") for i in range(3)]
+    out = io.BytesIO()
+    for domain in domains:
+        domain.write_to(out, compression=compression)
+
+    data = out.getvalue()
+    if compression:
+        data = gzip.decompress(data)
+
+    assert data == b"".join(expected(d, False) for d in domains)